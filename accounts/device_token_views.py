@@ -34,6 +34,8 @@ def register_device_token(request):
             existing_token.device_type = device_type
             existing_token.app_version = app_version
             existing_token.is_active = True
+            existing_token.failure_count = 0
+            existing_token.last_error = None
             existing_token.updated_at = timezone.now()
             existing_token.save()
             
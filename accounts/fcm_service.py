@@ -1,18 +1,151 @@
 # accounts/fcm_service.py
 
+"""
+Firebase Cloud Messaging delivery.
+
+Pushes go through the legacy HTTP API (fcm/send): every device of a user is
+reached by one multicast request (registration_ids, up to 1000 tokens), and
+the requests of several users run concurrently on a shared thread pool.
+Each worker thread keeps its own keep-alive session, so connections to FCM
+are reused instead of being opened for every token. Requests have a
+timeout and the whole send a deadline (FCM_TIMEOUT, FCM_DEADLINE), and
+last_used is updated for every delivered token in one UPDATE.
+
+Per-token results are applied in bulk as well: tokens FCM reports as dead
+(NotRegistered, InvalidRegistration, MismatchSenderId) are deactivated,
+canonical registration IDs replace the tokens they supersede, and transient
+per-token errors are counted on the token (failure_count, last_error) until
+FCM_MAX_TOKEN_FAILURES consecutive failures deactivate it.
+"""
+
 import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import requests
 from django.conf import settings
+from django.db.models import Case, Count, F, Max, Q, Value, When
 from django.utils import timezone
-from .models import DeviceToken, User
+from .models import DeviceToken
+
+logger = logging.getLogger(__name__)
+
+FCM_URL = 'https://fcm.googleapis.com/fcm/send'
+# Tokens per multicast request (limit of the legacy API)
+MAX_MULTICAST_TOKENS = 1000
+
+# Per-token errors meaning the token will never work again
+DEAD_TOKEN_ERRORS = ('NotRegistered', 'InvalidRegistration', 'MismatchSenderId')
+# Per-token errors worth retrying; counted in DeviceToken.failure_count
+TRANSIENT_TOKEN_ERRORS = ('Unavailable', 'InternalServerError')
+
+
+class FCMDeliveryEngine:
+    """Thread pool of keep-alive sessions posting multicast requests to FCM"""
+    
+    def __init__(self, url=None, server_key=None, workers=None, timeout=None, deadline=None):
+        self.url = url or getattr(settings, 'FCM_URL', FCM_URL)
+        self.server_key = server_key if server_key is not None else getattr(settings, 'FCM_SERVER_KEY', None)
+        self.workers = workers or getattr(settings, 'FCM_WORKERS', 16)
+        self.timeout = timeout or getattr(settings, 'FCM_TIMEOUT', 5)
+        self.deadline = deadline or getattr(settings, 'FCM_DEADLINE', 10)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+    
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fcm')
+        return self._executor
+    
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                'Authorization': f'key={self.server_key}',
+                'Content-Type': 'application/json',
+            })
+            self._local.session = session
+        return session
+    
+    def post(self, tokens, notification, data):
+        """
+        Send one multicast request.
+        
+        Returns:
+            list: one FCM result per token ({'message_id': ...} or {'error': ...})
+        """
+        payload = {
+            'registration_ids': tokens,
+            'notification': notification,
+            'data': data,
+            'priority': 'high',
+        }
+        try:
+            response = self._session().post(self.url, data=json.dumps(payload), timeout=(3, self.timeout))
+        except Exception as e:
+            logger.error(f"Error sending FCM notification: {e}")
+            return [{'error': 'ConnectionError'}] * len(tokens)
+        if response.status_code != 200:
+            logger.error(f"FCM request failed with status {response.status_code}: {response.text[:200]}")
+            return [{'error': f'HTTP {response.status_code}'}] * len(tokens)
+        results = response.json().get('results') or []
+        if len(results) != len(tokens):
+            logger.error(f"FCM returned {len(results)} results for {len(tokens)} tokens")
+            return [{'error': 'InvalidResponse'}] * len(tokens)
+        return results
+    
+    def deliver(self, jobs):
+        """
+        Post jobs concurrently, each split into multicast requests.
+        
+        Args:
+            jobs: list of (tokens, notification, data)
+        
+        Returns:
+            list: for each job, one FCM result per token; requests still running
+                  at the deadline count as {'error': 'Timeout'}
+        """
+        batches = []
+        for index, (tokens, notification, data) in enumerate(jobs):
+            for start in range(0, len(tokens), MAX_MULTICAST_TOKENS):
+                batches.append((index, tokens[start:start + MAX_MULTICAST_TOKENS], notification, data))
+        
+        if len(batches) == 1:
+            index, tokens, notification, data = batches[0]
+            return [self.post(tokens, notification, data)]
+        
+        futures = [
+            (index, tokens, self.executor.submit(self.post, tokens, notification, data))
+            for index, tokens, notification, data in batches
+        ]
+        wait([future for _, _, future in futures], timeout=self.deadline)
+        results = [[] for _ in jobs]
+        for index, tokens, future in futures:
+            if future.done():
+                results[index].extend(future.result())
+            else:
+                future.cancel()
+                logger.warning(f"FCM request for {len(tokens)} tokens missed the {self.deadline}s deadline")
+                results[index].extend([{'error': 'Timeout'}] * len(tokens))
+        return results
+
 
 class FCMService:
     """Service for sending Firebase Cloud Messaging notifications"""
     
-    def __init__(self):
-        self.server_key = getattr(settings, 'FCM_SERVER_KEY', None)
-        self.fcm_url = 'https://fcm.googleapis.com/fcm/send'
+    def __init__(self, engine=None):
+        self.engine = engine or FCMDeliveryEngine()
         
+    @property
+    def server_key(self):
+        return self.engine.server_key
+    
     def send_notification(self, user_id, title, body, data=None, notification_type='generic'):
         """
         Send push notification to a user
@@ -25,88 +158,137 @@ class FCMService:
             notification_type: Type of notification for routing
         """
         try:
-            user = User.objects.get(id=user_id)
-            device_tokens = user.get_active_device_tokens()
-            
-            if not device_tokens.exists():
-                print(f"No active device tokens found for user {user_id}")
-                return False
-            
-            # Prepare notification payload
-            notification_payload = {
-                'title': title,
-                'body': body,
-            }
-            
+            sent = self.send_many([(user_id, title, body, data, notification_type)])
+            return sent.get(user_id, 0) > 0
+        except Exception as e:
+            logger.error(f"Error sending notification to user {user_id}: {e}")
+            return False
+    
+    def send_many(self, notifications):
+        """
+        Send notifications to several users at once.
+        
+        Active tokens of every user are read in one query, the multicast
+        requests run concurrently and last_used is updated in one UPDATE.
+        
+        Args:
+            notifications: iterable of (user_id, title, body, data, notification_type)
+        
+        Returns:
+            dict: {user_id: number of devices reached}
+        """
+        notifications = list(notifications)
+        if not self.server_key:
+            logger.error("FCM server key not configured")
+            return {}
+        
+        tokens = {}
+        for token_id, user_id, device_token in DeviceToken.objects.filter(
+            user_id__in={notification[0] for notification in notifications}, is_active=True
+        ).order_by('id').values_list('id', 'user_id', 'device_token'):
+            tokens.setdefault(user_id, []).append((token_id, device_token))
+        
+        timestamp = timezone.now().isoformat()
+        jobs, owners = [], []
+        for user_id, title, body, data, notification_type in notifications:
+            if user_id not in tokens:
+                logger.info(f"No active device tokens found for user {user_id}")
+                continue
             # Prepare data payload
             data_payload = {
                 'type': notification_type,
-                'timestamp': timezone.now().isoformat(),
+                'timestamp': timestamp,
                 'user_id': str(user_id),
             }
-            
             if data:
                 data_payload.update(data)
-            
-            # Send to each device token
-            success_count = 0
-            for device_token in device_tokens:
-                if self._send_to_device(device_token.device_token, notification_payload, data_payload):
-                    success_count += 1
-                    # Update last_used timestamp
-                    device_token.last_used = timezone.now()
-                    device_token.save(update_fields=['last_used'])
-            
-            print(f"Sent notification to {success_count}/{device_tokens.count()} devices for user {user_id}")
-            return success_count > 0
-            
-        except User.DoesNotExist:
-            print(f"User {user_id} not found")
-            return False
-        except Exception as e:
-            print(f"Error sending notification to user {user_id}: {e}")
-            return False
+            jobs.append(([token for _, token in tokens[user_id]], {'title': title, 'body': body}, data_payload))
+            owners.append(user_id)
+        
+        sent = {user_id: 0 for user_id in owners}
+        delivered, dead, failing, canonical = [], {}, {}, {}
+        for user_id, results in zip(owners, self.engine.deliver(jobs)):
+            for (token_id, token), result in zip(tokens[user_id], results):
+                error = result.get('error')
+                if 'message_id' in result:
+                    sent[user_id] += 1
+                    delivered.append(token_id)
+                    if result.get('registration_id') and result['registration_id'] != token:
+                        canonical[token_id] = result['registration_id']
+                elif error in DEAD_TOKEN_ERRORS:
+                    dead[token_id] = error
+                elif error in TRANSIENT_TOKEN_ERRORS:
+                    failing.setdefault(error, []).append(token_id)
+            logger.info(f"Sent notification to {sent[user_id]}/{len(results)} devices for user {user_id}")
+        
+        self._apply_results(delivered, dead, failing, canonical)
+        return sent
     
-    def _send_to_device(self, device_token, notification, data):
-        """Send notification to a specific device token"""
-        if not self.server_key:
-            print("FCM server key not configured")
-            return False
+    def _apply_results(self, delivered, dead, failing, canonical):
+        """
+        Record per-token results with a few bulk queries.
         
-        headers = {
-            'Authorization': f'key={self.server_key}',
-            'Content-Type': 'application/json',
-        }
+        Args:
+            delivered: ids of the tokens that received the message
+            dead: {token id: FCM error} of tokens to deactivate
+            failing: {FCM error: [token ids]} of transient failures
+            canonical: {token id: canonical registration ID}
+        """
+        if delivered:
+            DeviceToken.objects.filter(id__in=delivered).update(
+                last_used=timezone.now(), failure_count=0, last_error=None
+            )
         
-        payload = {
-            'to': device_token,
-            'notification': notification,
-            'data': data,
-            'priority': 'high',
-        }
+        if failing:
+            for error, token_ids in failing.items():
+                DeviceToken.objects.filter(id__in=token_ids).update(
+                    failure_count=F('failure_count') + 1, last_error=error
+                )
+            retired = DeviceToken.objects.filter(
+                id__in=[token_id for token_ids in failing.values() for token_id in token_ids],
+                failure_count__gte=getattr(settings, 'FCM_MAX_TOKEN_FAILURES', 10),
+            ).update(is_active=False)
+            if retired:
+                logger.info(f"Deactivated {retired} device tokens after repeated FCM failures")
         
-        try:
-            response = requests.post(
-                self.fcm_url,
-                headers=headers,
-                data=json.dumps(payload),
-                timeout=10
+        if canonical:
+            # A canonical ID already registered makes the old token a duplicate
+            registered = set(
+                DeviceToken.objects.filter(device_token__in=canonical.values()).values_list('device_token', flat=True)
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success', 0) > 0:
-                    return True
+            replaced = []
+            for token_id, new_token in canonical.items():
+                if new_token in registered:
+                    dead[token_id] = 'CanonicalDuplicate'
                 else:
-                    print(f"FCM send failed: {result}")
-                    return False
-            else:
-                print(f"FCM request failed with status {response.status_code}: {response.text}")
-                return False
-                
-        except Exception as e:
-            print(f"Error sending FCM notification: {e}")
-            return False
+                    registered.add(new_token)
+                    replaced.append(DeviceToken(id=token_id, device_token=new_token))
+            if replaced:
+                DeviceToken.objects.bulk_update(replaced, ['device_token'])
+                logger.info(f"Replaced {len(replaced)} device tokens by their canonical ID")
+        
+        if dead:
+            DeviceToken.objects.filter(id__in=dead).update(
+                is_active=False,
+                last_error=Case(*[When(id=token_id, then=Value(error)) for token_id, error in dead.items()]),
+            )
+            logger.info(f"Deactivated {len(dead)} device tokens reported dead by FCM")
+    
+    def token_health(self, user_ids):
+        """
+        Device token health of a set of users, in one query.
+        
+        Returns:
+            dict: {user_id: {'active', 'inactive', 'failing', 'last_error', 'last_used'}}
+        """
+        rows = DeviceToken.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+            active=Count('id', filter=Q(is_active=True)),
+            inactive=Count('id', filter=Q(is_active=False)),
+            failing=Count('id', filter=Q(is_active=True, failure_count__gt=0)),
+            last_error=Max('last_error'),
+            last_used=Max('last_used'),
+        ).order_by()
+        return {row.pop('user_id'): row for row in rows}
     
     def send_message_notification(self, user_id, sender_name, message_content, conversation_id):
         """Send new message notification"""
@@ -172,18 +354,27 @@ class FCMService:
             notification_type='system'
         )
     
-    def cleanup_inactive_tokens(self, days_inactive=30):
-        """Remove device tokens that haven't been used for specified days"""
+    def cleanup_inactive_tokens(self, days_inactive=30, batch_size=1000):
+        """
+        Deactivate device tokens that haven't been used for specified days.
+        
+        Dead tokens are already deactivated as pushes report them, so this
+        only sweeps stale ones: short UPDATEs of at most batch_size rows,
+        found through the (is_active, last_used) index.
+        """
         cutoff_date = timezone.now() - timezone.timedelta(days=days_inactive)
-        inactive_tokens = DeviceToken.objects.filter(
-            last_used__lt=cutoff_date,
-            is_active=True
-        )
+        stale = DeviceToken.objects.filter(is_active=True, last_used__lt=cutoff_date).order_by('last_used')
         
-        count = inactive_tokens.count()
-        inactive_tokens.update(is_active=False)
+        count = 0
+        while True:
+            token_ids = list(stale.values_list('id', flat=True)[:batch_size])
+            if not token_ids:
+                break
+            count += DeviceToken.objects.filter(id__in=token_ids, is_active=True).update(is_active=False)
+            if len(token_ids) < batch_size:
+                break
         
-        print(f"Deactivated {count} inactive device tokens")
+        logger.info(f"Deactivated {count} inactive device tokens")
         return count
 
 # Global FCM service instance
@@ -0,0 +1,268 @@
+# accounts/image_ingestion.py
+
+"""
+Profile picture ingestion.
+
+The request thread parses the image header (format, size, mode), checks
+the body at the lowest cost the format allows (see check_body) and hashes
+the bytes (SHA-256). Content already ingested is reused right away.
+Otherwise the original is stored and acknowledged; the image is decoded
+once, in a bounded thread pool (Pillow releases the GIL while it works),
+and encoded as every rendition (accounts/renditions.py) under its SHA-256.
+Only identical bytes share renditions: a look-alike picture is never
+served in place of another user's upload. The user's picture is then
+switched with a conditional UPDATE, so a newer upload is never overwritten
+by an older one, along with a tiny placeholder and the dominant color that
+clients show while the picture loads.
+
+The original is deleted once processed. If processing fails, the user's
+previous picture is restored.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .image_processing import SUPPORTED_FORMATS, decode_image, image_placeholder, render_renditions
+from .models import ImageContent
+from .renditions import CANONICAL_WIDTH, DEFAULT_FORMAT, rendition_base, rendition_name
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+class IngestedImage:
+    """An upload whose header has been parsed; pixels are decoded later, once"""
+
+    def __init__(self, data, name):
+        self.data = data
+        self.name = name
+        self.image = Image.open(io.BytesIO(data))
+        self.sha256 = hashlib.sha256(data).hexdigest()
+
+    @property
+    def info(self):
+        return {
+            'format': self.image.format,
+            'mode': self.image.mode,
+            'size': self.image.size,
+            'has_transparency': self.image.mode in ('RGBA', 'LA', 'P'),
+        }
+
+
+def check_body(data):
+    """
+    Check that the whole image can be read, without a full decode when possible.
+
+    JPEG is decoded at its smallest scale (1/8), PNG chunks are checked
+    against their CRC, other formats are decoded.
+
+    Raises:
+        Exception: if the image is truncated or corrupt
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        if img.format == 'JPEG':
+            img.draft('RGB', (max(1, img.width // 8), max(1, img.height // 8)))
+            img.load()
+        elif img.format == 'PNG':
+            img.verify()
+        else:
+            img.load()
+
+
+def open_upload(file):
+    """
+    Read an uploaded file, parse its header and check its body.
+
+    Raises:
+        ValueError: if the file is not a readable JPEG, PNG or WEBP image
+    """
+    data = file.read()
+    try:
+        upload = IngestedImage(data, os.path.basename(file.name or 'upload'))
+    except Exception as e:
+        raise ValueError(f"Could not read image: {e}")
+    if upload.image.format not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported image format: {upload.image.format}")
+    try:
+        check_body(data)
+    except Exception as e:
+        raise ValueError(f"Corrupt image: {e}")
+    return upload
+
+
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'IMAGE_INGESTION_WORKERS', 2)
+                _slots = threading.BoundedSemaphore(workers + getattr(settings, 'IMAGE_INGESTION_QUEUE_SIZE', 32))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-ingestion')
+    return _executor
+
+
+def _store_renditions(image, sha256):
+    """
+    Encode and store every rendition under the content's SHA-256.
+
+    Files already present are kept as they are: same key, same bytes.
+    """
+    field = User._meta.get_field('profile_picture')
+    base = rendition_base(field.upload_to, sha256)
+    for (width, ext), data in render_renditions(image).items():
+        name = rendition_name(base, width, ext)
+        if not field.storage.exists(name):
+            field.storage.save(name, ContentFile(data))
+    return rendition_name(base, CANONICAL_WIDTH, DEFAULT_FORMAT)
+
+
+def _record_content(upload, size, name, preview):
+    """Index an ingested content; a concurrent ingestion of the same bytes wins the race"""
+    width, height = size
+    placeholder, color = preview
+    try:
+        with transaction.atomic():
+            ImageContent.objects.create(
+                sha256=upload.sha256, width=width, height=height, name=name,
+                placeholder=placeholder, color=color
+            )
+    except IntegrityError:
+        pass
+
+
+def _delete_original(name):
+    """Originals are only kept until their renditions replace them"""
+    try:
+        User._meta.get_field('profile_picture').storage.delete(name)
+    except Exception as e:
+        logger.error(f"Could not delete original picture {name}: {e}")
+
+
+def process_profile_picture(user_id, original_name, upload):
+    """
+    Decode an upload, store its renditions, then switch the user's picture to them.
+
+    The original is deleted afterwards, whether or not the switch happened.
+
+    Returns:
+        str: the new file name, or None if the user uploaded another picture meanwhile
+    """
+    # Original size: decoding may resize upload.image in place
+    width, height = upload.image.size
+    image = decode_image(upload.image, (CANONICAL_WIDTH, CANONICAL_WIDTH))
+    # Before the renditions, which resize the decoded image in place
+    preview = image_placeholder(image)
+
+    # Keyed by the SHA-256 of the bytes: files already stored are kept
+    name = _store_renditions(image, upload.sha256)
+    _record_content(upload, (width, height), name, preview)
+
+    # Atomic switch: only if the original is still the current picture
+    swapped = User.objects.filter(id=user_id, profile_picture=original_name).update(
+        profile_picture=name, profile_picture_placeholder=preview[0], profile_picture_color=preview[1]
+    )
+    _delete_original(original_name)
+    if not swapped:
+        logger.info(f"Profile picture of user {user_id} changed during processing, {original_name} dropped")
+        return None
+    logger.info(f"Profile picture of user {user_id} processed: {original_name} -> {name}")
+    return name
+
+
+def restore_previous_picture(user_id, original_name, previous):
+    """
+    Put back the picture an unprocessable upload replaced, then delete the original.
+
+    `previous` is the (name, placeholder, color) of the user before the upload.
+    Nothing is restored if the user uploaded another picture meanwhile.
+    """
+    name, placeholder, color = previous
+    User.objects.filter(id=user_id, profile_picture=original_name).update(
+        profile_picture=name, profile_picture_placeholder=placeholder, profile_picture_color=color
+    )
+    _delete_original(original_name)
+
+
+def _run(user_id, original_name, upload, previous, in_worker):
+    try:
+        if in_worker:
+            close_old_connections()
+        try:
+            process_profile_picture(user_id, original_name, upload)
+        except Exception as e:
+            logger.error(f"Profile picture processing failed for user {user_id}, restoring previous picture: {e}")
+            restore_previous_picture(user_id, original_name, previous)
+    except Exception as e:
+        logger.error(f"Could not restore previous picture of user {user_id}: {e}")
+    finally:
+        if in_worker:
+            close_old_connections()
+            _slots.release()
+
+
+def schedule_processing(user_id, original_name, upload, previous):
+    """
+    Hand the upload to the worker pool.
+
+    `previous` is restored if processing fails (see restore_previous_picture).
+
+    When the pool and its queue are full, the upload is processed on the
+    calling thread instead (backpressure rather than an unbounded queue).
+
+    Returns:
+        bool: True if the processing was deferred to the pool
+    """
+    if not getattr(settings, 'IMAGE_INGESTION_ASYNC', True):
+        _run(user_id, original_name, upload, previous, in_worker=False)
+        return False
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        logger.warning(f"Image ingestion queue full, processing upload of user {user_id} inline")
+        _run(user_id, original_name, upload, previous, in_worker=False)
+        return False
+    executor.submit(_run, user_id, original_name, upload, previous, True)
+    return True
+
+
+def ingest_profile_picture(user, upload):
+    """
+    Set the user's picture from an upload.
+
+    Content already ingested (same SHA-256) is assigned at once. Otherwise the
+    original is stored as the user's picture and processed after commit.
+
+    Returns:
+        tuple: (stored file name, True if processing is pending)
+    """
+    fields = ['profile_picture', 'profile_picture_placeholder', 'profile_picture_color']
+    known = ImageContent.objects.filter(sha256=upload.sha256).values_list('name', 'placeholder', 'color').first()
+    if known is not None:
+        name, placeholder, color = known
+        user.profile_picture.name = name
+        user.profile_picture_placeholder, user.profile_picture_color = placeholder or None, color or None
+        user.save(update_fields=fields)
+        return name, False
+
+    previous = (user.profile_picture.name or None, user.profile_picture_placeholder, user.profile_picture_color)
+    # The previous picture's placeholder no longer applies
+    user.profile_picture_placeholder = user.profile_picture_color = None
+    user.profile_picture.save(upload.name, ContentFile(upload.data), save=False)
+    user.save(update_fields=fields)
+    original_name = user.profile_picture.name
+    transaction.on_commit(lambda: schedule_processing(user.id, original_name, upload, previous))
+    return original_name, True
@@ -1,12 +1,103 @@
 import os
 import io
-from PIL import Image
+import base64
+from PIL import Image, ImageOps
 from django.core.files.base import ContentFile
 from django.conf import settings
 import logging
 
+from .renditions import RENDITION_FORMATS, RENDITION_WIDTHS
+
 logger = logging.getLogger(__name__)
 
+SUPPORTED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+PLACEHOLDER_SIZE = 20
+
+
+def decode_image(img, max_size):
+    """Decode an opened image once, flattened to RGB and no larger than max_size"""
+    # JPEG sources can be decoded at a reduced scale (1/2, 1/4, 1/8)
+    # when they are much larger than the target
+    if img.format == 'JPEG':
+        img.draft('RGB', max_size)
+    
+    # Convert to RGB if necessary (handles RGBA, P, etc.)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        # Create a white background
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Resize if too large
+    if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        logger.info(f"Image resized to {img.size}")
+    return img
+
+def recode_image(img, max_size=(1024, 1024), quality=85):
+    """
+    Convert an opened image to an RGB JPEG no larger than max_size.
+    
+    Args:
+        img: A PIL image, opened but not necessarily decoded yet
+        max_size: Maximum dimensions (width, height)
+        quality: JPEG quality (1-100)
+    
+    Returns:
+        bytes: The encoded JPEG
+    """
+    img = decode_image(img, max_size)
+    
+    # Save as JPEG with specified quality
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+def image_placeholder(img, size=PLACEHOLDER_SIZE):
+    """
+    Low-quality placeholder of a decoded RGB image, shown before the picture loads.
+    
+    Returns:
+        tuple: (data URI of a JPEG at most `size` pixels wide, dominant color '#rrggbb')
+    """
+    thumb = ImageOps.contain(img, (size, size), Image.Resampling.BOX)
+    output = io.BytesIO()
+    thumb.save(output, format='JPEG', quality=50)
+    data_uri = 'data:image/jpeg;base64,' + base64.b64encode(output.getvalue()).decode('ascii')
+    
+    # Most frequent color of a 4-color palette of the thumbnail
+    quantized = thumb.quantize(colors=4)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return data_uri, f'#{red:02x}{green:02x}{blue:02x}'
+
+def render_renditions(img, widths=RENDITION_WIDTHS, formats=RENDITION_FORMATS):
+    """
+    Encode an opened image at every rendition width and format.
+    
+    The image is decoded once at the largest width (a no-op if it already
+    is, see decode_image); each smaller width is resized from the previous one.
+    
+    Returns:
+        dict: {(width, extension): encoded bytes}
+    """
+    widths = sorted(widths, reverse=True)
+    current = decode_image(img, (widths[0], widths[0]))
+    renditions = {}
+    for width in widths:
+        if current.size[0] > width or current.size[1] > width:
+            current.thumbnail((width, width), Image.Resampling.LANCZOS)
+        for ext, (format, options) in formats.items():
+            output = io.BytesIO()
+            current.save(output, format=format, **options)
+            renditions[(width, ext)] = output.getvalue()
+    return renditions
+
 def process_and_recode_image(image_file, max_size=(1024, 1024), quality=85):
     """
     Process and recode an image to ensure it's in a Flutter-compatible format.
@@ -20,33 +111,9 @@ def process_and_recode_image(image_file, max_size=(1024, 1024), quality=85):
         Processed image file ready for upload
     """
     try:
-        # Open the image
         with Image.open(image_file) as img:
-            # Convert to RGB if necessary (handles RGBA, P, etc.)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create a white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Resize if too large
-            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                logger.info(f"Image resized to {img.size}")
-            
-            # Save as JPEG with specified quality
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            output.seek(0)
-            
-            # Create a new file object
-            processed_file = ContentFile(output.getvalue())
-            
-            logger.info(f"Image processed successfully: {img.size}, quality: {quality}")
+            processed_file = ContentFile(recode_image(img, max_size=max_size, quality=quality))
+            logger.info(f"Image processed successfully, quality: {quality}")
             return processed_file
             
     except Exception as e:
@@ -66,8 +133,7 @@ def validate_image_format(image_file):
     try:
         with Image.open(image_file) as img:
             # Check if it's a supported format
-            supported_formats = ['JPEG', 'PNG', 'WEBP']
-            return img.format in supported_formats
+            return img.format in SUPPORTED_FORMATS
     except Exception as e:
         logger.error(f"Error validating image format: {e}")
         return False
@@ -0,0 +1,166 @@
+# accounts/image_repair.py
+
+"""
+Repair of remote images that clients cannot decode (validate-and-fix-image).
+
+The source is streamed with a hard byte cap and its format is sniffed from
+the first bytes, so an oversized or non-image response is dropped before it
+is read in full. The image is decoded at a reduced scale when the format
+allows it (see decode_image) and stored as a JPEG under profil/ with the
+process' shared S3 client.
+
+Results are memoized in the Django cache by source URL and by SHA-256 of the
+downloaded bytes: a URL already fixed is answered without any download, and
+the same bytes behind another URL are answered without any image work.
+"""
+
+import hashlib
+import io
+import logging
+
+from PIL import Image, UnidentifiedImageError
+from django.conf import settings
+from django.core.cache import cache
+
+from .image_processing import recode_image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_CACHE_TTL = 7 * 24 * 3600
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 12
+
+CACHE_KEY_PREFIX = 'fixed_image'
+
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+
+class ImageFetchError(ValueError):
+    """The source could not be fetched as an image; `error` is the API error code"""
+
+    def __init__(self, detail, error):
+        super().__init__(detail)
+        self.error = error
+
+
+def sniff_format(head):
+    """Image format from the first bytes of a file, or None"""
+    for signature, format in _SIGNATURES:
+        if head.startswith(signature):
+            return format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def fetch_image(url, max_bytes=None, timeout=10):
+    """
+    Download an image, at most max_bytes of it.
+
+    Raises:
+        ImageFetchError: if the source is unreachable, too large or not an image
+    """
+    import requests
+
+    max_bytes = max_bytes or getattr(settings, 'IMAGE_FIX_MAX_BYTES', DEFAULT_MAX_BYTES)
+    try:
+        response = requests.get(url, timeout=timeout, stream=True)
+    except requests.RequestException as e:
+        raise ImageFetchError(f'Image not accessible: {e}', 'not_accessible')
+
+    with response:
+        if response.status_code != 200:
+            raise ImageFetchError('Image not accessible', 'not_accessible')
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > max_bytes:
+            raise ImageFetchError(f'Image larger than {max_bytes} bytes', 'too_large')
+
+        data = bytearray()
+        sniffed = False
+        for chunk in response.iter_content(CHUNK_SIZE):
+            data += chunk
+            if len(data) > max_bytes:
+                raise ImageFetchError(f'Image larger than {max_bytes} bytes', 'too_large')
+            if not sniffed and len(data) >= SNIFF_BYTES:
+                if sniff_format(bytes(data[:SNIFF_BYTES])) is None:
+                    raise ImageFetchError('Not a supported image', 'invalid_format')
+                sniffed = True
+        if not sniffed and sniff_format(bytes(data)) is None:
+            raise ImageFetchError('Not a supported image', 'invalid_format')
+    return bytes(data)
+
+
+def fixed_image_key(url):
+    """S3 key of the fixed copy: profil/<source file name>.jpg"""
+    filename = url.split('/')[-1].split('?')[0]
+    if not filename.lower().endswith('.jpg'):
+        filename += '.jpg'
+    return f'profil/{filename}'
+
+
+def _cache_key(kind, value):
+    return f"{CACHE_KEY_PREFIX}:{kind}:{hashlib.sha256(value).hexdigest()}"
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.error(f"Fixed image cache unavailable: {e}")
+        return None
+
+
+def _cache_set(key, value):
+    try:
+        cache.set(key, value, timeout=getattr(settings, 'IMAGE_FIX_CACHE_TTL', DEFAULT_CACHE_TTL))
+    except Exception as e:
+        logger.error(f"Fixed image cache unavailable: {e}")
+
+
+def _store(key, data):
+    from matching.presign import get_signer
+
+    signer = get_signer()
+    signer.client.put_object(Bucket=signer.bucket, Key=key, Body=data, ContentType='image/jpeg')
+
+
+def fix_image(url):
+    """
+    Fix the image at `url`, or return the memoized result.
+
+    Returns:
+        tuple: ({'fixed_url': ..., 's3_key': ...}, True if served from the cache)
+
+    Raises:
+        ImageFetchError: if the source cannot be fetched or decoded
+        Exception: if the fixed image cannot be stored
+    """
+    url_key = _cache_key('url', url.encode())
+    result = _cache_get(url_key)
+    if result is not None:
+        return result, True
+
+    data = fetch_image(url)
+    content_key = _cache_key('sha256', data)
+    result = _cache_get(content_key)
+    cached = result is not None
+    if not cached:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                fixed = recode_image(img, max_size=(1024, 1024), quality=95)
+        except (UnidentifiedImageError, OSError) as e:
+            raise ImageFetchError(f'Image processing failed: {e}', 'processing_failed')
+        s3_key = fixed_image_key(url)
+        _store(s3_key, fixed)
+        domain = getattr(settings, 'CLOUDFRONT_DOMAIN', None) or 'd2czzsmpeluuz5.cloudfront.net'
+        result = {'fixed_url': f'https://{domain}/{s3_key}', 's3_key': s3_key}
+        _cache_set(content_key, result)
+        logger.info(f"Fixed image {url} -> {s3_key} ({len(data)} -> {len(fixed)} bytes)")
+    _cache_set(url_key, result)
+    return result, cached
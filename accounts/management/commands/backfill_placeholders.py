@@ -0,0 +1,79 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.image_processing import PLACEHOLDER_SIZE, decode_image, image_placeholder
+from accounts.models import ImageContent
+from accounts.renditions import RENDITION_WIDTHS, rendition_key
+from matching.presign import profile_object_key
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def _compute(storage, name):
+    """Placeholder and dominant color of a stored picture, read from its smallest rendition"""
+    key = rendition_key(name, RENDITION_WIDTHS[0])
+    if key == name:
+        key = profile_object_key(name)
+    with storage.open(key) as f, Image.open(f) as img:
+        # Reduced-scale decode: the placeholder is only PLACEHOLDER_SIZE pixels wide
+        return image_placeholder(decode_image(img, (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4)))
+
+
+class Command(BaseCommand):
+    help = 'Compute the profile picture placeholder and dominant color of users that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Users read per query')
+        parser.add_argument('--workers', type=int, default=8, help='Threads downloading and decoding pictures')
+        parser.add_argument('--limit', type=int, default=None, help='Limit number of users to process')
+        parser.add_argument('--force', action='store_true', help='Recompute placeholders that already exist')
+
+    def handle(self, *args, **options):
+        storage = User._meta.get_field('profile_picture').storage
+        users = User.objects.exclude(profile_picture__isnull=True).exclude(profile_picture='')
+        if not options['force']:
+            users = users.filter(Q(profile_picture_placeholder__isnull=True) | Q(profile_picture_placeholder=''))
+
+        updated = failed = seen = 0
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='placeholders') as pool:
+            while options['limit'] is None or seen < options['limit']:
+                size = options['batch_size']
+                if options['limit'] is not None:
+                    size = min(size, options['limit'] - seen)
+                batch = list(
+                    users.filter(id__gt=last_id).order_by('id').values_list('id', 'profile_picture')[:size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+                seen += len(batch)
+
+                results = pool.map(lambda row: self._safe_compute(storage, row[1]), batch)
+                for (user_id, name), preview in zip(batch, results):
+                    if preview is None:
+                        failed += 1
+                        continue
+                    placeholder, color = preview
+                    # Only if the user did not change picture meanwhile
+                    updated += User.objects.filter(id=user_id, profile_picture=name).update(
+                        profile_picture_placeholder=placeholder, profile_picture_color=color
+                    )
+                    ImageContent.objects.filter(name=name, placeholder='').update(placeholder=placeholder, color=color)
+                self.stdout.write(f'  {seen} users read, {updated} updated, {failed} failed')
+
+        self.stdout.write(self.style.SUCCESS(f'Placeholders computed for {updated} user(s), {failed} failed'))
+
+    def _safe_compute(self, storage, name):
+        try:
+            return _compute(storage, name)
+        except Exception as e:
+            logger.error(f"Placeholder failed for {name}: {e}")
+            return None
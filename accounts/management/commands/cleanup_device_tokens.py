@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from accounts.fcm_service import fcm_service
+
+
+class Command(BaseCommand):
+    help = 'Deactivate device tokens that have not received a push for a number of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Days without a delivered push')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deactivated per UPDATE')
+
+    def handle(self, *args, **options):
+        count = fcm_service.cleanup_inactive_tokens(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deactivated {count} inactive device token(s)'))
@@ -1,14 +1,123 @@
+import json
 import os
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from io import BytesIO
+from itertools import islice
+
 import boto3
-from django.core.management.base import BaseCommand
+from botocore.config import Config
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
 import logging
 
+from accounts.image_processing import decode_image, recode_image
+
 logger = logging.getLogger(__name__)
 
+# Each key is re-encoded in the format its extension announces
+IMAGE_FORMATS = {
+    '.jpg': ('JPEG', 'image/jpeg'),
+    '.jpeg': ('JPEG', 'image/jpeg'),
+    '.png': ('PNG', 'image/png'),
+    '.webp': ('WEBP', 'image/webp'),
+}
+IMAGE_EXTENSIONS = tuple(IMAGE_FORMATS)
+
+# Marker stored as S3 object metadata on reprocessed images; bump it when
+# _process_image changes so that every image is processed again
+PROCESSED_METADATA_KEY = 'fortifun-processed'
+PROCESSED_VERSION = '1'
+
+
+def image_format(key):
+    """(PIL format, Content-Type) of an image key, from its extension"""
+    return IMAGE_FORMATS[os.path.splitext(key)[1].lower()]
+
+
+def _process_image(image_data, format='JPEG'):
+    """Process image data to ensure Flutter compatibility (runs in the process pool)"""
+    with Image.open(BytesIO(image_data)) as img:
+        if format == 'JPEG':
+            return recode_image(img, max_size=(1024, 1024), quality=95)
+        img = decode_image(img, (1024, 1024))
+    output = BytesIO()
+    img.save(output, format=format, quality=95, optimize=True)
+    return output.getvalue()
+
+
+class Checkpoint:
+    """
+    Append-only record of finished objects: one JSON line {"key": ..., "etag": ...}.
+
+    An object whose listed ETag matches its checkpoint entry was already
+    processed and is skipped without being downloaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.etags = {}
+        self._file = None
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # last line of an interrupted run
+                    self.etags[entry['key']] = entry['etag']
+        return self
+
+    def done(self, key, etag):
+        return key in self.etags and self.etags[key] == etag
+
+    def record(self, key, etag):
+        self.etags[key] = etag
+        if not self.path:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps({'key': key, 'etag': etag}) + '\n')
+        self._file.flush()
+
+    def reset(self):
+        self.etags = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Stats:
+    """Counters and throughput of a run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.listed = 0
+        self.processed = 0
+        self.skipped_checkpoint = 0
+        self.skipped_metadata = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f'{self.listed} listed, {self.processed} processed, '
+            f'{self.skipped_checkpoint + self.skipped_metadata} skipped '
+            f'({self.skipped_checkpoint} checkpoint, {self.skipped_metadata} metadata), {self.errors} errors '
+            f'in {elapsed:.1f}s: {self.processed / elapsed:.1f} images/s, '
+            f'{self.bytes_in / elapsed / 1e6:.2f} MB/s in, {self.bytes_out / elapsed / 1e6:.2f} MB/s out'
+        )
+
+
 class Command(BaseCommand):
     help = 'Reprocess all existing images to fix EncodingError issues'
 
@@ -24,126 +133,153 @@ class Command(BaseCommand):
             default=None,
             help='Limit number of images to process',
         )
+        parser.add_argument('--prefix', default='profil/', help='S3 prefix to reprocess')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes decoding and encoding images (0: in the I/O threads)',
+        )
+        parser.add_argument('--io-threads', type=int, default=16, help='Threads downloading and uploading')
+        parser.add_argument('--page-size', type=int, default=1000, help='Keys per list_objects_v2 page')
+        parser.add_argument(
+            '--checkpoint', default='reprocess_images.checkpoint',
+            help='Progress file used to resume an interrupted run',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore and clear the checkpoint file')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Reprocess images already marked as processed in their metadata',
+        )
+        parser.add_argument(
+            '--endpoint-url', default=getattr(settings, 'AWS_S3_ENDPOINT_URL', None),
+            help='S3-compatible endpoint (MinIO, local stand-in)',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         limit = options['limit']
-        
+
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
-        
-        # Initialize S3 client
-        s3_client = boto3.client(
+
+        self.s3_client = self._s3_client(options)
+        self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+        self.force = options['force']
+
+        checkpoint = Checkpoint(options['checkpoint'])
+        if options['restart']:
+            checkpoint.reset()
+        checkpoint.load()
+        if checkpoint.etags:
+            self.stdout.write(f'Resuming: {len(checkpoint.etags)} images already processed')
+
+        stats = Stats()
+        pool = ProcessPoolExecutor(max_workers=options['workers']) if options['workers'] > 0 and not dry_run else None
+        try:
+            objects = self._list_images(options['prefix'], options['page_size'], checkpoint, stats)
+            if limit:
+                objects = islice(objects, limit)
+            if dry_run:
+                count = 0
+                for key, _ in objects:
+                    count += 1
+                    self.stdout.write(f'  [DRY RUN] Would process: {key}')
+                self.stdout.write(self.style.SUCCESS(f'Dry run complete: Would process {count} images'))
+                return
+            self._run(objects, options['io_threads'], pool, checkpoint, stats)
+        except Exception as e:
+            raise CommandError(f'Reprocessing failed: {e} ({stats.summary()})') from e
+        finally:
+            checkpoint.close()
+            if pool is not None:
+                pool.shutdown()
+
+        if not stats.listed:
+            self.stdout.write(self.style.WARNING(f"No images found in {options['prefix']} folder"))
+        elif not dry_run:
+            self.stdout.write(self.style.SUCCESS(f'Reprocessing complete: {stats.summary()}'))
+
+    def _s3_client(self, options):
+        return boto3.client(
             's3',
             region_name=settings.AWS_S3_REGION_NAME,
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-        )
-        
-        bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-        
-        try:
-            # List all images in the profil/ folder
-            response = s3_client.list_objects_v2(
-                Bucket=bucket_name,
-                Prefix='profil/'
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            endpoint_url=options['endpoint_url'],
+            config=Config(
+                s3={'addressing_style': 'path'},
+                max_pool_connections=max(options['io_threads'], 10),
+                retries={'max_attempts': 5, 'mode': 'adaptive'},
             )
-            
-            images = []
-            for obj in response.get('Contents', []):
-                if obj['Key'].lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                    images.append(obj['Key'])
-            
-            if not images:
-                self.stdout.write(self.style.WARNING('No images found in profil/ folder'))
-                return
-            
-            if limit:
-                images = images[:limit]
-            
-            self.stdout.write(f'Found {len(images)} images to process')
-            
-            processed_count = 0
-            error_count = 0
-            
-            for i, image_key in enumerate(images, 1):
-                try:
-                    self.stdout.write(f'Processing {i}/{len(images)}: {image_key}')
-                    
-                    if dry_run:
-                        self.stdout.write(f'  [DRY RUN] Would process: {image_key}')
-                        continue
-                    
-                    # Download the image
-                    response = s3_client.get_object(Bucket=bucket_name, Key=image_key)
-                    image_data = response['Body'].read()
-                    
-                    # Process the image
-                    processed_data = self._process_image(image_data)
-                    
-                    if processed_data:
-                        # Upload the processed image back to S3
-                        s3_client.put_object(
-                            Bucket=bucket_name,
-                            Key=image_key,
-                            Body=processed_data,
-                            ContentType='image/jpeg'
-                        )
-                        
-                        processed_count += 1
-                        self.stdout.write(self.style.SUCCESS(f'  ✅ Processed: {image_key}'))
-                    else:
-                        self.stdout.write(self.style.ERROR(f'  ❌ Failed to process: {image_key}'))
-                        error_count += 1
-                        
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'  ❌ Error processing {image_key}: {str(e)}'))
-                    error_count += 1
-            
-            if not dry_run:
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Reprocessing complete: {processed_count} processed, {error_count} errors'
-                    )
-                )
+        )
+
+    def _list_images(self, prefix, page_size, checkpoint, stats):
+        """Yield (key, etag) of every image under the prefix not already in the checkpoint"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, PaginationConfig={'PageSize': page_size})
+        for page in pages:
+            for obj in page.get('Contents', []):
+                if not obj['Key'].lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                stats.listed += 1
+                if checkpoint.done(obj['Key'], obj['ETag']):
+                    stats.skipped_checkpoint += 1
+                    continue
+                yield obj['Key'], obj['ETag']
+
+    def _run(self, objects, io_threads, pool, checkpoint, stats):
+        """Download and upload in the thread pool, process in the process pool, at most 2 x threads in flight"""
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix='reprocess-io') as threads:
+            for key, etag in objects:
+                if len(in_flight) >= 2 * io_threads:
+                    self._collect(in_flight, checkpoint, stats, return_when=FIRST_COMPLETED)
+                in_flight[threads.submit(self._reprocess, key, pool)] = key
+            self._collect(in_flight, checkpoint, stats)
+
+    def _collect(self, in_flight, checkpoint, stats, return_when=ALL_COMPLETED):
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            key = in_flight.pop(future)
+            try:
+                status, etag, bytes_in, bytes_out = future.result()
+            except Exception as e:
+                stats.errors += 1
+                self.stdout.write(self.style.ERROR(f'  ❌ Error processing {key}: {str(e)}'))
+                continue
+            # Main thread only: the checkpoint file has a single writer
+            checkpoint.record(key, etag)
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            if status == 'skipped':
+                stats.skipped_metadata += 1
             else:
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Dry run complete: Would process {len(images)} images'
-                    )
-                )
-                
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
+                stats.processed += 1
+                self.stdout.write(self.style.SUCCESS(f'  ✅ Processed: {key}'))
 
-    def _process_image(self, image_data):
-        """Process image data to ensure Flutter compatibility"""
-        try:
-            # Open image from bytes
-            with Image.open(BytesIO(image_data)) as img:
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    # Create white background
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize if too large
-                max_size = (1024, 1024)
-                if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                # Save as JPEG with high quality
-                output = BytesIO()
-                img.save(output, format='JPEG', quality=95, optimize=True)
-                output.seek(0)
-                
-                return output.getvalue()
-                
-        except Exception as e:
-            logger.error(f'Error processing image: {str(e)}')
-            return None
\ No newline at end of file
+    def _reprocess(self, key, pool):
+        """
+        Download, process and upload one image (I/O thread).
+
+        Returns:
+            tuple: (status, ETag of the stored object, bytes downloaded, bytes uploaded)
+        """
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        if not self.force and response.get('Metadata', {}).get(PROCESSED_METADATA_KEY) == PROCESSED_VERSION:
+            response['Body'].close()
+            return 'skipped', response['ETag'], 0, 0
+        image_data = response['Body'].read()
+
+        format, content_type = image_format(key)
+        if pool:
+            processed_data = pool.submit(_process_image, image_data, format).result()
+        else:
+            processed_data = _process_image(image_data, format)
+
+        result = self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=processed_data,
+            ContentType=content_type,
+            Metadata={PROCESSED_METADATA_KEY: PROCESSED_VERSION},
+        )
+        return 'processed', result['ETag'], len(image_data), len(processed_data)
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+def create_earthdistance_index(apps, schema_editor):
+    # Index GiST utilisé par earth_box() lorsque l'extension earthdistance est installée
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'earthdistance'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS user_ll_to_earth_gist_idx "
+        "ON accounts_user USING gist (ll_to_earth(latitude, longitude))"
+    )
+
+
+def drop_earthdistance_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS user_ll_to_earth_gist_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_devicetoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['latitude', 'longitude'], name='user_lat_lon_idx'),
+        ),
+        migrations.RunPython(create_earthdistance_index, drop_earthdistance_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:44
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_user_lat_lon_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', accounts.models.FortiFunUserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='interest_bits',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
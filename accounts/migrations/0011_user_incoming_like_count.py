@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_user_interest_bits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='incoming_like_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_image_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagecontent',
+            name='color',
+            field=models.CharField(blank=True, default='', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='imagecontent',
+            name='placeholder',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_placeholder',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_user_profile_picture_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicetoken',
+            name='failure_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='devicetoken',
+            name='last_error',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='devicetoken',
+            index=models.Index(fields=['is_active', 'last_used'], name='device_token_active_used_idx'),
+        ),
+    ]
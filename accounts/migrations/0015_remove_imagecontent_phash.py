@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_devicetoken_health'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='imagecontent',
+            name='image_content_phash_idx',
+        ),
+        migrations.RemoveField(
+            model_name='imagecontent',
+            name='phash',
+        ),
+    ]
@@ -1,7 +1,7 @@
-# Add this to the existing User model or create a new DeviceToken model
+# accounts/models.py
 
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 
 class DeviceToken(models.Model):
     """Model to store FCM device tokens for push notifications"""
@@ -17,17 +17,89 @@ class DeviceToken(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_used = models.DateTimeField(null=True, blank=True)
+    # Token health: consecutive transient failures reported by FCM (accounts/fcm_service.py)
+    failure_count = models.PositiveIntegerField(default=0)
+    last_error = models.CharField(max_length=50, blank=True, null=True)
     
     class Meta:
         db_table = 'device_tokens'
         unique_together = ['user', 'device_token']
+        indexes = [
+            # cleanup_inactive_tokens
+            models.Index(fields=['is_active', 'last_used'], name='device_token_active_used_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.device_type} ({self.device_token[:20]}...)"
 
-# Add this method to the existing User model
+class FortiFunUserManager(UserManager):
+    """
+    Gestionnaire par défaut des utilisateurs.
+
+    Le bitset d'intérêts et le compteur de likes reçus sont différés : un
+    save() complet d'une instance chargée avant leur mise à jour n'écrase
+    donc pas ces colonnes dénormalisées (Django n'enregistre que les champs
+    chargés).
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('interest_bits', 'incoming_like_count')
+
 class User(AbstractUser):
-    # ... existing fields ...
+    """Utilisateur FortiFun (profil, localisation et relations de matching)"""
+    GENDER_CHOICES = (
+        ('M', 'Homme'),
+        ('F', 'Femme'),
+        ('O', 'Autre'),
+        ('A', 'Préfère ne pas dire'),
+    )
+    
+    profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    # Aperçu de la photo affiché avant son téléchargement : JPEG ~20 px en
+    # data URI et couleur dominante (voir accounts/image_processing.py)
+    profile_picture_placeholder = models.TextField(blank=True, null=True, editable=False)
+    profile_picture_color = models.CharField(max_length=7, blank=True, null=True, editable=False)
+    bio = models.TextField(blank=True, null=True)
+    date_of_birth = models.DateField(blank=True, null=True)
+    phone_number = models.CharField(max_length=15, blank=True, null=True)
+    gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True, null=True)
+    appwrite_user_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    
+    # Localisation
+    location = models.CharField(max_length=100, blank=True, null=True)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    
+    # Activité
+    is_online = models.BooleanField(default=False, null=True)
+    last_activity = models.DateTimeField(blank=True, null=True)
+    
+    # Relations de matching
+    liked_users = models.ManyToManyField('self', symmetrical=False, related_name='liked_by', blank=True)
+    blocked_users = models.ManyToManyField('self', symmetrical=False, related_name='blocked_by', blank=True)
+    
+    # Intérêts dénormalisés : bit n = intérêt dont UserInterest.bit vaut n (voir matching/interests.py)
+    interest_bits = models.BinaryField(default=b'', blank=True, editable=False)
+    
+    # Likes reçus en attente de réponse (voir matching/incoming.py)
+    incoming_like_count = models.IntegerField(default=0, editable=False)
+    
+    objects = FortiFunUserManager()
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Préfiltre « bounding box » pour la recherche par distance (matching/geo.py)
+            models.Index(fields=['latitude', 'longitude'], name='user_lat_lon_idx'),
+        ]
+    
+    def get_profile_picture_url(self):
+        """Return the public URL of the profile picture, or None"""
+        if not self.profile_picture:
+            return None
+        try:
+            return self.profile_picture.url
+        except Exception:
+            return None
     
     def get_active_device_tokens(self):
         """Get all active device tokens for this user"""
@@ -35,4 +107,24 @@ class User(AbstractUser):
     
     def get_device_tokens_by_type(self, device_type):
         """Get device tokens for a specific device type"""
-        return self.device_tokens.filter(device_type=device_type, is_active=True)
\ No newline at end of file
+        return self.device_tokens.filter(device_type=device_type, is_active=True)
+
+class ImageContent(models.Model):
+    """
+    Image déjà traitée, adressée par le SHA-256 des octets envoyés.
+
+    Un envoi identique (même SHA-256) réutilise les renditions existantes au
+    lieu de les encoder et de les stocker de nouveau (accounts/image_ingestion.py).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # Rendition de référence (1024.jpg), celle enregistrée sur User.profile_picture
+    name = models.CharField(max_length=255)
+    # Aperçu recopié sur l'utilisateur quand le contenu est réutilisé
+    placeholder = models.TextField(blank=True, default='')
+    color = models.CharField(max_length=7, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} -> {self.name}"
@@ -0,0 +1,75 @@
+# accounts/renditions.py
+
+"""
+Profile picture renditions.
+
+A processed upload is stored as a fixed set of files, one per width and
+format, under a directory named after the SHA-256 of the uploaded bytes:
+
+    profile_pictures/r/<sha256>/128.jpg ... profile_pictures/r/<sha256>/1024.webp
+
+The user's profile_picture points to the 1024px JPEG. Any other rendition is
+derived from that name, so readers pick a size without extra columns or
+queries. Pictures stored before renditions existed are served as they are.
+
+Rendition files are never rewritten (same bytes, same key), so they are
+served with an immutable, one-year Cache-Control.
+"""
+
+import re
+
+RENDITION_WIDTHS = (128, 320, 640, 1024)
+RENDITION_FORMATS = {
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+DEFAULT_FORMAT = 'jpg'
+
+# The name stored on the user (largest JPEG)
+CANONICAL_WIDTH = RENDITION_WIDTHS[-1]
+
+RENDITIONS_DIR = 'r'
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_RENDITION_RE = re.compile(r'^(?P<base>(?:.*/)?%s/[^/]+)/(?P<width>\d+)\.(?P<ext>jpg|webp)$' % RENDITIONS_DIR)
+
+
+def rendition_base(upload_dir, content_id):
+    """Directory of the renditions of an upload, e.g. profile_pictures/r/<sha256>"""
+    return f"{upload_dir.rstrip('/')}/{RENDITIONS_DIR}/{content_id}"
+
+
+def rendition_name(base, width, ext=DEFAULT_FORMAT):
+    return f"{base}/{width}.{ext}"
+
+
+def parse_rendition(name):
+    """Base directory of a rendition name, or None for a picture without renditions"""
+    name = str(name or '')
+    if name.startswith('http'):
+        return None
+    match = _RENDITION_RE.match(name)
+    return match.group('base') if match else None
+
+
+def pick_width(hint):
+    """Smallest rendition at least `hint` pixels wide (the largest one if none is)"""
+    for width in RENDITION_WIDTHS:
+        if width >= hint:
+            return width
+    return RENDITION_WIDTHS[-1]
+
+
+def rendition_key(name, width=None, ext=DEFAULT_FORMAT):
+    """
+    Storage key of the rendition of `name` that fits `width`.
+
+    Pictures without renditions (and absolute URLs) are returned unchanged.
+    """
+    base = parse_rendition(name)
+    if base is None:
+        return name
+    if ext not in RENDITION_FORMATS:
+        ext = DEFAULT_FORMAT
+    return rendition_name(base, pick_width(width or CANONICAL_WIDTH), ext)
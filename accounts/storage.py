@@ -0,0 +1,20 @@
+# accounts/storage.py
+
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from .renditions import IMMUTABLE_CACHE_CONTROL, parse_rendition
+
+
+class MediaStorage(S3Boto3Storage):
+    """
+    S3 storage for media files.
+
+    Renditions are content-addressed and never rewritten, so they get a
+    one-year immutable Cache-Control instead of AWS_S3_OBJECT_PARAMETERS'.
+    """
+
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        if parse_rendition(name):
+            params['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+        return params
@@ -0,0 +1,193 @@
+# accounts/tests/test_fcm_delivery.py
+
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.fcm_service import FCMDeliveryEngine, FCMService
+from accounts.models import DeviceToken
+
+User = get_user_model()
+
+
+class MockFCMServer:
+    """
+    Local stand-in for the legacy fcm/send endpoint (HTTP/1.1 keep-alive).
+
+    Every token gets a message_id, except those listed in `errors`
+    ({token: FCM error}) and `canonical` ({token: canonical token}).
+    `max_active` is the peak number of requests handled at once.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.errors = {}
+        self.canonical = {}
+        self.requests = []
+        self.connections = set()
+        self.active = self.max_active = self.completed = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/fcm/send'
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def result(self, token, i):
+        if token in self.errors:
+            return {'error': self.errors[token]}
+        if token in self.canonical:
+            return {'message_id': f'0:{i}', 'registration_id': self.canonical[token]}
+        return {'message_id': f'0:{i}'}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with server.lock:
+                    server.requests.append(payload)
+                    server.connections.add(self.client_address)
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.active -= 1
+                    server.completed += 1
+                tokens = payload['registration_ids']
+                results = [server.result(token, i) for i, token in enumerate(tokens)]
+                body = json.dumps({
+                    'success': sum('message_id' in result for result in results),
+                    'failure': sum('error' in result for result in results),
+                    'results': results,
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+class FCMDeliveryTest(TestCase):
+    """Tests for concurrent, pooled FCM delivery against a local mock server"""
+
+    def setUp(self):
+        self.fcm = MockFCMServer()
+        self.addCleanup(self.fcm.stop)
+
+    def make_service(self, **kwargs):
+        kwargs.setdefault('workers', 8)
+        return FCMService(FCMDeliveryEngine(url=self.fcm.url, server_key='test-key', **kwargs))
+
+    def make_users(self, count, devices):
+        users = []
+        for i in range(count):
+            user = User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com')
+            for d in range(devices):
+                DeviceToken.objects.create(user=user, device_token=f'token-{i}-{d}', device_type='android')
+            users.append(user)
+        return users
+
+    def test_devices_of_a_user_share_one_multicast_request(self):
+        user, = self.make_users(1, 3)
+        self.assertTrue(self.make_service().send_notification(user.id, 'Hi', 'there', {'k': 'v'}))
+        self.assertEqual(len(self.fcm.requests), 1)
+        payload = self.fcm.requests[0]
+        self.assertEqual(payload['registration_ids'], ['token-0-0', 'token-0-1', 'token-0-2'])
+        self.assertEqual(payload['data']['k'], 'v')
+        self.assertEqual(DeviceToken.objects.filter(user=user, last_used__isnull=False).count(), 3)
+
+    def test_many_users_are_sent_concurrently_with_two_queries(self):
+        self.fcm.latency = 0.05
+        users = self.make_users(40, 2)
+        service = self.make_service()
+        with self.assertNumQueries(2):  # jetons actifs, puis un seul UPDATE de last_used
+            sent = service.send_many([(user.id, 'Hi', 'there', None, 'system') for user in users])
+        self.assertEqual(sent, {user.id: 2 for user in users})
+        self.assertEqual(len(self.fcm.requests), 40)
+        self.assertLessEqual(len(self.fcm.connections), 8)  # keep-alive : une connexion par worker
+        self.assertGreater(self.fcm.max_active, 1)
+        self.assertLessEqual(self.fcm.max_active, 8)
+
+    def test_slow_requests_are_cut_at_the_deadline(self):
+        self.fcm.latency = 1.0
+        users = self.make_users(2, 1)
+        service = self.make_service(deadline=0.2)
+        sent = service.send_many([(user.id, 'Hi', 'there', None, 'system') for user in users])
+        self.assertEqual(self.fcm.completed, 0)  # rendu avant la fin des requêtes
+        self.assertEqual(sent, {users[0].id: 0, users[1].id: 0})
+        self.assertFalse(DeviceToken.objects.filter(last_used__isnull=False).exists())
+
+    def test_dead_tokens_are_deactivated_in_bulk(self):
+        users = self.make_users(3, 2)
+        self.fcm.errors = {'token-0-0': 'NotRegistered', 'token-1-1': 'InvalidRegistration', 'token-2-0': 'Unavailable'}
+        service = self.make_service()
+        with self.assertNumQueries(5):  # jetons, last_used, échec transitoire, seuil d'échecs, désactivation
+            sent = service.send_many([(user.id, 'Hi', 'there', None, 'system') for user in users])
+        self.assertEqual(sent, {users[0].id: 1, users[1].id: 1, users[2].id: 1})
+        inactive = dict(DeviceToken.objects.filter(is_active=False).values_list('device_token', 'last_error'))
+        self.assertEqual(inactive, {'token-0-0': 'NotRegistered', 'token-1-1': 'InvalidRegistration'})
+
+        # Les jetons morts ne sont plus sollicités
+        self.fcm.requests.clear()
+        service.send_many([(user.id, 'Hi', 'again', None, 'system') for user in users])
+        sent_tokens = sorted(token for payload in self.fcm.requests for token in payload['registration_ids'])
+        self.assertEqual(sent_tokens, ['token-0-1', 'token-1-0', 'token-2-0', 'token-2-1'])
+
+    @override_settings(FCM_MAX_TOKEN_FAILURES=2)
+    def test_token_health_tracks_transient_failures(self):
+        user, = self.make_users(1, 2)
+        self.fcm.errors = {'token-0-1': 'Unavailable'}
+        service = self.make_service()
+        service.send_notification(user.id, 'Hi', 'there')
+        self.assertEqual(service.token_health([user.id])[user.id]['failing'], 1)
+        service.send_notification(user.id, 'Hi', 'there')
+        health = service.token_health([user.id])[user.id]
+        self.assertEqual((health['active'], health['inactive'], health['failing']), (1, 1, 0))
+        self.assertEqual(health['last_error'], 'Unavailable')
+        self.assertIsNotNone(health['last_used'])
+
+    def test_canonical_ids_replace_tokens(self):
+        user, = self.make_users(1, 3)
+        self.fcm.canonical = {'token-0-0': 'token-new', 'token-0-1': 'token-0-2'}
+        self.make_service().send_notification(user.id, 'Hi', 'there')
+        tokens = dict(DeviceToken.objects.filter(user=user).values_list('device_token', 'is_active'))
+        self.assertEqual(tokens, {'token-new': True, 'token-0-1': False, 'token-0-2': True})
+
+    def test_cleanup_deactivates_stale_tokens_in_batches(self):
+        self.make_users(5, 1)
+        old = timezone.now() - timedelta(days=60)
+        DeviceToken.objects.exclude(device_token='token-4-0').update(last_used=old)
+        DeviceToken.objects.filter(device_token='token-4-0').update(last_used=timezone.now())
+        out = io.StringIO()
+        with self.assertNumQueries(4):  # deux lots (sélection + UPDATE), le second incomplet
+            call_command('cleanup_device_tokens', '--batch-size', '3', stdout=out)
+        self.assertIn('Deactivated 4 inactive device token(s)', out.getvalue())
+        self.assertEqual(list(DeviceToken.objects.filter(is_active=True).values_list('device_token', flat=True)),
+                         ['token-4-0'])
+
+    def test_missing_server_key_sends_nothing(self):
+        user, = self.make_users(1, 1)
+        service = FCMService(FCMDeliveryEngine(url=self.fcm.url, server_key=''))
+        self.assertFalse(service.send_notification(user.id, 'Hi', 'there'))
+        self.assertEqual(self.fcm.requests, [])
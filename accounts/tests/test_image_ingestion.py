@@ -0,0 +1,256 @@
+# accounts/tests/test_image_ingestion.py
+
+import base64
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from unittest import mock, skipUnless
+from rest_framework.test import APIClient
+from accounts.image_ingestion import open_upload
+from accounts.models import ImageContent
+from accounts.storage import MediaStorage
+from cloudfront_config import CloudFrontConfig
+from accounts.image_processing import process_and_recode_image, recode_image
+
+User = get_user_model()
+
+def make_image(size=(2400, 1800), format='JPEG', mode='RGB'):
+    output = io.BytesIO()
+    Image.new(mode, size, (200, 120, 40) if mode == 'RGB' else (200, 120, 40, 128)).save(output, format=format)
+    return output.getvalue()
+
+def make_photo(size=(1600, 1200), quality=90):
+    gradient = Image.linear_gradient('L').rotate(30).resize(size)
+    output = io.BytesIO()
+    Image.merge('RGB', (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), gradient)).save(
+        output, format='JPEG', quality=quality
+    )
+    return output.getvalue()
+
+@override_settings(IMAGE_INGESTION_ASYNC=False)
+class ImageIngestionTest(TestCase):
+    """Tests for the profile picture ingestion pipeline"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage'
+        )
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='me', email='me@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, data, name='photo.jpg'):
+        return self.client.post('/api/v1/accounts/files/profile-picture', {'file': SimpleUploadedFile(name, data)})
+
+    def test_upload_is_acknowledged_then_switched_to_processed_file(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.upload(make_image())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['processing'])
+        self.assertEqual(response.data['original_info']['size'], (2400, 1800))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_picture.name, response.data['filename'])
+
+        for callback in callbacks:
+            callback()
+        self.user.refresh_from_db()
+        self.assertRegex(self.user.profile_picture.name, r'^profile_pictures/r/[^/]+/1024\.jpg$')
+        with Image.open(self.user.profile_picture.path) as img:
+            self.assertEqual((img.format, img.size), ('JPEG', (1024, 768)))
+
+    def test_every_rendition_is_stored(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(make_image())
+        self.user.refresh_from_db()
+        base = os.path.dirname(self.user.profile_picture.path)
+        sizes = {}
+        for filename in sorted(os.listdir(base)):
+            with Image.open(os.path.join(base, filename)) as img:
+                sizes[filename] = (img.format, img.size)
+        self.assertEqual(sizes, {
+            '1024.jpg': ('JPEG', (1024, 768)), '1024.webp': ('WEBP', (1024, 768)),
+            '128.jpg': ('JPEG', (128, 96)), '128.webp': ('WEBP', (128, 96)),
+            '320.jpg': ('JPEG', (320, 240)), '320.webp': ('WEBP', (320, 240)),
+            '640.jpg': ('JPEG', (640, 480)), '640.webp': ('WEBP', (640, 480)),
+        })
+        self.assertEqual(
+            CloudFrontConfig.get_optimized_url(self.user.profile_picture.name, width=300),
+            f'https://{CloudFrontConfig.CLOUDFRONT_DOMAIN}/{os.path.dirname(self.user.profile_picture.name)}/320.jpg'
+        )
+
+    def test_placeholder_and_color_are_stored(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.upload(make_image())
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.profile_picture_placeholder)
+        for callback in callbacks:
+            callback()
+        self.user.refresh_from_db()
+        prefix = 'data:image/jpeg;base64,'
+        self.assertTrue(self.user.profile_picture_placeholder.startswith(prefix))
+        self.assertLess(len(self.user.profile_picture_placeholder), 1000)
+        data = base64.b64decode(self.user.profile_picture_placeholder[len(prefix):])
+        with Image.open(io.BytesIO(data)) as img:
+            self.assertEqual(img.size, (20, 15))
+        red, green, blue = (int(self.user.profile_picture_color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertLess(abs(red - 200) + abs(green - 120) + abs(blue - 40), 12)
+
+    def test_backfill_fills_missing_placeholders(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(make_image())
+        legacy = User.objects.create_user(username='legacy', email='legacy@example.com', password='testpass123')
+        legacy.profile_picture.save('legacy.jpg', ContentFile(make_photo()), save=True)
+        User.objects.filter(id=self.user.id).update(profile_picture_placeholder=None, profile_picture_color=None)
+
+        out = io.StringIO()
+        call_command('backfill_placeholders', '--batch-size', '1', stdout=out)
+        self.assertIn('Placeholders computed for 2 user(s), 0 failed', out.getvalue())
+        for user in User.objects.filter(id__in=[self.user.id, legacy.id]):
+            self.assertTrue(user.profile_picture_placeholder.startswith('data:image/jpeg;base64,'))
+            self.assertRegex(user.profile_picture_color, r'^#[0-9a-f]{6}$')
+
+    def test_identical_upload_reuses_renditions(self):
+        data = make_image()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(data)
+        self.user.refresh_from_db()
+        name = self.user.profile_picture.name
+        self.assertEqual(name, f'profile_pictures/r/{hashlib.sha256(data).hexdigest()}/1024.jpg')
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.force_authenticate(user=other)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.upload(data)
+        self.assertFalse([c for c in callbacks if 'ingest_profile_picture' in c.__qualname__])
+        self.assertFalse(response.data['processing'])
+        self.assertEqual(response.data['filename'], name)
+        self.assertEqual(ImageContent.objects.count(), 1)
+        other.refresh_from_db()
+        self.assertEqual(other.profile_picture_placeholder, self.user.profile_picture_placeholder)
+
+    def test_look_alike_upload_of_another_user_gets_its_own_renditions(self):
+        # Aplats de couleurs différentes : même dHash (0), mêmes dimensions
+        red, blue = io.BytesIO(), io.BytesIO()
+        Image.new('RGB', (800, 600), (255, 0, 0)).save(red, format='JPEG')
+        Image.new('RGB', (800, 600), (0, 0, 255)).save(blue, format='JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(red.getvalue())
+        other = User.objects.create_user(username='other', email='other@example.com')
+        self.client.force_authenticate(user=other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(blue.getvalue())
+
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertNotEqual(other.profile_picture.name, self.user.profile_picture.name)
+        self.assertEqual(other.profile_picture.name,
+                         f'profile_pictures/r/{hashlib.sha256(blue.getvalue()).hexdigest()}/1024.jpg')
+        with Image.open(other.profile_picture.path) as img:
+            red_, green_, blue_ = img.convert('RGB').getpixel((10, 10))
+            self.assertGreater(blue_, red_)
+
+    def test_renditions_are_served_as_immutable(self):
+        storage = MediaStorage()
+        self.assertEqual(
+            storage.get_object_parameters('profile_pictures/r/abc/320.webp')['CacheControl'],
+            'public, max-age=31536000, immutable'
+        )
+        self.assertEqual(storage.get_object_parameters('profile_pictures/photo.jpg')['CacheControl'], 'max-age=86400')
+        self.assertEqual(CloudFrontConfig.get_file_type('profile_pictures/r/abc/320.webp'), 'renditions')
+        self.assertEqual(CloudFrontConfig.get_file_type('profile_pictures/photo.jpg'), 'images')
+        self.assertEqual(
+            CloudFrontConfig.get_cache_headers('renditions')['Cache-Control'], 'max-age=31536000, public, immutable'
+        )
+
+    def test_png_with_transparency_is_flattened(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(make_image((300, 200), 'PNG', 'RGBA'), 'photo.png')
+        self.user.refresh_from_db()
+        with Image.open(self.user.profile_picture.path) as img:
+            self.assertEqual((img.format, img.mode, img.size), ('JPEG', 'RGB', (300, 200)))
+
+    def test_unsupported_format_is_rejected(self):
+        response = self.upload(make_image((50, 50), 'GIF', 'RGB'), 'photo.gif')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'invalid_format')
+        response = self.upload(b'not an image', 'photo.jpg')
+        self.assertEqual(response.status_code, 400)
+
+    def test_corrupt_body_is_rejected_on_the_request(self):
+        for data, name in ((make_photo()[:5000], 'photo.jpg'), (make_image((300, 200), 'PNG')[:-20], 'photo.png')):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = self.upload(data, name)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'invalid_format')
+            self.assertEqual(callbacks, [])
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_picture)
+
+    def test_original_is_deleted_once_processed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(make_image())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, response.data['filename'])))
+        self.user.refresh_from_db()
+        self.assertTrue(os.path.exists(self.user.profile_picture.path))
+
+    def test_failed_processing_restores_previous_picture(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(make_image())
+        self.user.refresh_from_db()
+        previous = (self.user.profile_picture.name, self.user.profile_picture_placeholder)
+
+        with mock.patch('accounts.image_ingestion.decode_image', side_effect=OSError('broken data stream')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.upload(make_image((800, 600)))
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.profile_picture.name, self.user.profile_picture_placeholder), previous)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, response.data['filename'])))
+
+    def test_newer_upload_is_not_overwritten(self):
+        with self.captureOnCommitCallbacks(execute=False) as first:
+            self.upload(make_image())
+        with self.captureOnCommitCallbacks(execute=False):
+            second = self.upload(make_image((800, 600)))
+        first[0]()  # le traitement du premier envoi se termine en retard
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_picture.name, second.data['filename'])
+
+    @skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+    def test_benchmark_upload_latency_and_throughput(self):
+        """Request-thread latency of the old inline path vs the fast path, and pool throughput"""
+        data = make_image()
+        count = 16
+
+        start = time.perf_counter()
+        for _ in range(count):
+            process_and_recode_image(io.BytesIO(data))
+        inline_ms = (time.perf_counter() - start) * 1000 / count
+
+        start = time.perf_counter()
+        uploads = [open_upload(SimpleUploadedFile('photo.jpg', data)) for _ in range(count)]
+        ack_ms = (time.perf_counter() - start) * 1000 / count
+
+        # Décodage unique + redimensionnement + encodage, 4 workers
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda upload: recode_image(upload.image), uploads))
+        throughput = count / (time.perf_counter() - start)
+
+        self.assertLess(ack_ms, inline_ms, f"Upload: inline processing {inline_ms:.1f} ms/request, "
+                                           f"acknowledgement {ack_ms:.2f} ms/request, pool of 4: {throughput:.1f} images/s")
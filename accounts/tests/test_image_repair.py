@@ -0,0 +1,165 @@
+# accounts/tests/test_image_repair.py
+
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+from matching import presign
+
+MAX_BYTES = 1024 * 1024
+
+
+class ImageServer:
+    """Local HTTP server: {path: (body, send Content-Length)}; a callable body streams chunks"""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        self.bytes_sent = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                if self.path not in server.files:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body, with_length = server.files[self.path]
+                self.send_response(200)
+                if with_length:
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                chunks = body() if callable(body) else [body]
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(chunk)
+                        server.bytes_sent += len(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+class FailingS3Client:
+    def put_object(self, **kwargs):
+        raise ConnectionError('S3 unavailable')
+
+
+class RecordingS3Client:
+    def __init__(self):
+        self.puts = []
+
+    def put_object(self, **kwargs):
+        self.puts.append(kwargs)
+
+
+def make_png(size=(2000, 1500)):
+    output = io.BytesIO()
+    Image.new('RGBA', size, (10, 200, 90, 128)).save(output, format='PNG')
+    return output.getvalue()
+
+
+def endless_jpeg():
+    yield b'\xff\xd8\xff\xe0' + b'\0' * 65532
+    for _ in range(800):  # 50 Mo
+        yield b'\0' * 65536
+
+
+@override_settings(IMAGE_FIX_MAX_BYTES=MAX_BYTES)
+class ValidateAndFixImageTest(SimpleTestCase):
+    """Tests for the validate-and-fix-image endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.server = ImageServer()
+        self.addCleanup(self.server.stop)
+        self.s3 = RecordingS3Client()
+        signer = presign.PresignedURLSigner(bucket='test-bucket', access_key='test', secret_key='test')
+        signer._client = self.s3
+        previous, presign._signer = presign._signer, signer
+        self.addCleanup(setattr, presign, '_signer', previous)
+        self.client = APIClient()
+
+    def fix(self, path):
+        return self.client.post('/api/v1/accounts/validate-and-fix-image', {'image_url': self.server.url(path)})
+
+    def test_fixed_image_is_stored_once_then_served_from_cache(self):
+        self.server.files['/photos/broken.png'] = (make_png(), True)
+        response = self.fix('/photos/broken.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['cached'])
+        self.assertEqual(response.data['s3_key'], 'profil/broken.png.jpg')
+        self.assertEqual(len(self.s3.puts), 1)
+        with Image.open(io.BytesIO(self.s3.puts[0]['Body'])) as img:
+            self.assertEqual((img.format, img.mode, img.size), ('JPEG', 'RGB', (1024, 768)))
+
+        response = self.fix('/photos/broken.png')
+        self.assertTrue(response.data['cached'])
+        self.assertEqual(response.data['s3_key'], 'profil/broken.png.jpg')
+        self.assertEqual(self.server.requests, ['/photos/broken.png'])
+        self.assertEqual(len(self.s3.puts), 1)
+
+    def test_same_bytes_behind_another_url_are_not_processed_again(self):
+        data = make_png()
+        self.server.files['/a.png'] = (data, True)
+        self.server.files['/b.png'] = (data, True)
+        first = self.fix('/a.png')
+        second = self.fix('/b.png')
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(second.data['fixed_url'], first.data['fixed_url'])
+        self.assertEqual(len(self.s3.puts), 1)
+
+    def test_declared_oversized_image_is_not_downloaded(self):
+        self.server.files['/huge.png'] = (b'\x89PNG\r\n\x1a\n' + b'\0' * (2 * MAX_BYTES), True)
+        response = self.fix('/huge.png')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'too_large')
+
+    def test_streamed_download_stops_at_the_cap(self):
+        self.server.files['/stream.jpg'] = (endless_jpeg, False)
+        response = self.fix('/stream.jpg')
+        self.assertEqual(response.data['error'], 'too_large')
+        self.assertLess(self.server.bytes_sent, 20 * MAX_BYTES)
+        self.assertEqual(self.s3.puts, [])
+
+    def test_non_image_is_rejected_from_its_first_bytes(self):
+        self.server.files['/page.jpg'] = (b'<html>' + b' ' * (5 * MAX_BYTES), False)
+        response = self.fix('/page.jpg')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'invalid_format')
+
+        response = self.fix('/missing.jpg')
+        self.assertEqual(response.data['error'], 'not_accessible')
+        self.assertEqual(self.s3.puts, [])
+
+    def test_undecodable_image_is_a_client_error_and_storage_failure_a_server_error(self):
+        self.server.files['/truncated.png'] = (make_png()[:200], True)
+        response = self.fix('/truncated.png')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'processing_failed')
+        self.assertEqual(self.s3.puts, [])
+
+        presign._signer._client = FailingS3Client()
+        self.server.files['/broken.png'] = (make_png(), True)
+        response = self.fix('/broken.png')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data['error'], 'validation_failed')
@@ -0,0 +1,226 @@
+# accounts/tests/test_reprocess_images.py
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+from PIL import Image
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+
+BUCKET = 'test-bucket'
+
+class S3StandIn:
+    """
+    Local S3 stand-in: ListObjectsV2, GetObject and PutObject over HTTP
+    (path-style addressing, no authentication), enough for boto3.
+    """
+
+    def __init__(self):
+        self.objects = {}  # key -> (body, metadata)
+        self.content_types = {}
+        self.requests = []
+        self.deny_list = False
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def put(self, key, body, metadata=None):
+        with self.lock:
+            self.objects[key] = (body, dict(metadata or {}))
+
+    @staticmethod
+    def etag(body):
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def _handler(self):
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _parse(self):
+                url = urlparse(self.path)
+                bucket, _, key = url.path.lstrip('/').partition('/')
+                return bucket, unquote(key), parse_qs(url.query)
+
+            def _send(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if 'aws-chunked' in self.headers.get('Content-Encoding', ''):
+                    data, rest = b'', body
+                    while rest:
+                        size_line, _, rest = rest.partition(b'\r\n')
+                        size = int(size_line.split(b';')[0], 16)
+                        if not size:
+                            break
+                        data, rest = data + rest[:size], rest[size + 2:]
+                    body = data
+                return body
+
+            def do_GET(self):
+                bucket, key, query = self._parse()
+                with store.lock:
+                    store.requests.append(('GET', key or 'list'))
+                if not key:
+                    return self._list(query)
+                with store.lock:
+                    entry = store.objects.get(key)
+                if entry is None:
+                    return self._send(404, b'<Error><Code>NoSuchKey</Code></Error>')
+                body, metadata = entry
+                headers = {'ETag': store.etag(body), 'Content-Type': 'image/jpeg'}
+                headers.update({f'x-amz-meta-{name}': value for name, value in metadata.items()})
+                self._send(200, body, headers)
+
+            def do_PUT(self):
+                bucket, key, _ = self._parse()
+                body = self._read_body()
+                metadata = {
+                    name[len('x-amz-meta-'):]: value
+                    for name, value in self.headers.items() if name.lower().startswith('x-amz-meta-')
+                }
+                store.put(key, body, metadata)
+                with store.lock:
+                    store.requests.append(('PUT', key))
+                    store.content_types[key] = self.headers.get('Content-Type')
+                self._send(200, headers={'ETag': store.etag(body)})
+
+            def _list(self, query):
+                if store.deny_list:
+                    return self._send(403, b'<Error><Code>AccessDenied</Code></Error>')
+                prefix = query.get('prefix', [''])[0]
+                max_keys = int(query.get('max-keys', ['1000'])[0])
+                start = query.get('continuation-token', [''])[0]
+                with store.lock:
+                    keys = sorted(key for key in store.objects if key.startswith(prefix) and key > start)
+                    page = [(key, store.etag(store.objects[key][0]), len(store.objects[key][0])) for key in keys[:max_keys]]
+                truncated = len(keys) > max_keys
+                contents = ''.join(
+                    f'<Contents><Key>{escape(key)}</Key><ETag>{escape(etag)}</ETag><Size>{size}</Size>'
+                    f'<LastModified>2024-01-01T00:00:00.000Z</LastModified></Contents>'
+                    for key, etag, size in page
+                )
+                next_token = f'<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>' if truncated else ''
+                xml = (
+                    '<?xml version="1.0" encoding="UTF-8"?>'
+                    '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                    f'<Name>{BUCKET}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>'
+                    f'<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{"true" if truncated else "false"}</IsTruncated>'
+                    f'{contents}{next_token}</ListBucketResult>'
+                )
+                self._send(200, xml.encode(), {'Content-Type': 'application/xml'})
+
+        return Handler
+
+def make_png(size=(1200, 900)):
+    output = io.BytesIO()
+    Image.new('RGBA', size, (10, 200, 90, 255)).save(output, format='PNG')
+    return output.getvalue()
+
+@override_settings(
+    AWS_STORAGE_BUCKET_NAME=BUCKET, AWS_S3_REGION_NAME='us-east-1',
+    AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test'
+)
+class ReprocessImagesCommandTest(SimpleTestCase):
+    """Tests for reprocess_images against a local S3 stand-in"""
+
+    def setUp(self):
+        self.s3 = S3StandIn().start()
+        self.addCleanup(self.s3.stop)
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'reprocess.checkpoint')
+        image = make_png()
+        for i in range(25):
+            self.s3.put(f'profil/user{i:02d}.png', image)
+        self.s3.put('profil/readme.txt', b'not an image')
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command(
+            'reprocess_images', '--endpoint-url', self.s3.url, '--checkpoint', self.checkpoint,
+            '--page-size', '10', '--io-threads', '4', *args, stdout=out
+        )
+        return out.getvalue()
+
+    def count(self, method):
+        return sum(1 for request_method, key in self.s3.requests if request_method == method and key != 'list')
+
+    def test_pages_through_all_keys_and_recodes(self):
+        output = self.run_command('--workers', '2')
+        self.assertIn('25 listed, 25 processed, 0 skipped', output)
+        self.assertIn('images/s', output)
+        self.assertEqual(sum(1 for method, key in self.s3.requests if key == 'list'), 3)
+        body, metadata = self.s3.objects['profil/user07.png']
+        with Image.open(io.BytesIO(body)) as img:
+            self.assertEqual((img.format, img.mode, img.size), ('PNG', 'RGB', (1024, 768)))
+        self.assertEqual(metadata, {'fortifun-processed': '1'})
+        self.assertEqual(self.s3.content_types['profil/user07.png'], 'image/png')
+
+    def test_each_key_keeps_its_format(self):
+        jpeg = io.BytesIO()
+        Image.new('RGB', (1200, 900), (10, 200, 90)).save(jpeg, format='JPEG')
+        self.s3.put('profil/photo.jpg', jpeg.getvalue())
+        self.s3.put('profil/photo.webp', make_png())
+        self.run_command('--workers', '0')
+        for key, format, content_type in (
+            ('profil/photo.jpg', 'JPEG', 'image/jpeg'), ('profil/photo.webp', 'WEBP', 'image/webp')
+        ):
+            with Image.open(io.BytesIO(self.s3.objects[key][0])) as img:
+                self.assertEqual(img.format, format)
+            self.assertEqual(self.s3.content_types[key], content_type)
+
+    def test_failure_raises_command_error(self):
+        self.s3.deny_list = True
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('reprocess_images', '--endpoint-url', self.s3.url, '--checkpoint', self.checkpoint, stdout=out)
+        self.assertNotIn('Reprocessing complete', out.getvalue())
+
+    def test_resume_skips_checkpointed_objects(self):
+        self.run_command('--workers', '0', '--limit', '10')
+        self.s3.requests.clear()
+        output = self.run_command('--workers', '0')
+        self.assertIn('25 listed, 15 processed, 10 skipped (10 checkpoint, 0 metadata)', output)
+        self.assertEqual(self.count('GET'), 15)
+
+        # Un objet remplacé depuis (ETag différent) est traité de nouveau
+        self.s3.put('profil/user03.png', make_png((200, 200)))
+        output = self.run_command('--workers', '0')
+        self.assertIn('1 processed, 24 skipped', output)
+
+    def test_processed_metadata_is_skipped_without_upload(self):
+        self.run_command('--workers', '0', '--restart')
+        os.remove(self.checkpoint)
+        self.s3.requests.clear()
+        output = self.run_command('--workers', '0')
+        self.assertIn('0 processed, 25 skipped (0 checkpoint, 25 metadata)', output)
+        self.assertEqual(self.count('PUT'), 0)
+
+    def test_dry_run_does_not_write(self):
+        output = self.run_command('--dry-run', '--limit', '12')
+        self.assertIn('Would process 12 images', output)
+        self.assertEqual(self.count('PUT'), 0)
@@ -20,7 +20,8 @@ from .serializers import (
     UserSerializer, UserUpdateSerializer
 )
 from matching.models import UserPreference
-from .image_processing import process_and_recode_image, validate_image_format, get_image_info
+from .image_ingestion import ingest_profile_picture, open_upload
+from .image_repair import ImageFetchError, fix_image
 
 User = get_user_model()
 
@@ -136,35 +137,6 @@ def upload_profile_picture(request):
         if not file:
             return Response({'detail': 'file required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Process image if available, otherwise use original
-        if IMAGE_PROCESSING_AVAILABLE:
-            # Validate image format
-            if not validate_image_format(file):
-                return Response({
-                    'detail': 'Unsupported image format. Please use JPEG, PNG, or WEBP.',
-                    'error': 'invalid_format'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Get image info for logging
-            image_info = get_image_info(file)
-            logger.info(f"Original image info: {image_info}")
-            
-            # Process and recode the image
-            try:
-                processed_file = process_and_recode_image(file, max_size=(1024, 1024), quality=85)
-                logger.info("Image processed and recoded successfully")
-            except ValueError as e:
-                logger.error(f"Image processing failed: {e}")
-                return Response({
-                    'detail': f'Image processing failed: {str(e)}',
-                    'error': 'processing_failed'
-                }, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            # Image processing not available, use original file
-            logger.warning("Image processing not available, using original file")
-            processed_file = file
-            image_info = None
-        
         # For testing without authentication, create a test user
         if not request.user.is_authenticated:
             # User is already defined at the top of the file using get_user_model()
@@ -176,17 +148,38 @@ def upload_profile_picture(request):
         else:
             user = request.user
         
-        # Save the processed file to the user's profile_picture field
-        user.profile_picture = processed_file
-        user.save(update_fields=['profile_picture'])
+        if IMAGE_PROCESSING_AVAILABLE:
+            # Parse the header only; decoding and resizing run in the ingestion pool
+            try:
+                upload = open_upload(file)
+            except ValueError as e:
+                logger.error(f"Invalid image upload: {e}")
+                return Response({
+                    'detail': 'Unsupported image format. Please use JPEG, PNG, or WEBP.',
+                    'error': 'invalid_format'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            image_info = upload.info
+            logger.info(f"Original image info: {image_info}")
+            
+            # Known content is reused; otherwise store the original now and
+            # switch to the processed file when ready
+            _, processing = ingest_profile_picture(user, upload)
+        else:
+            # Image processing not available, use original file
+            logger.warning("Image processing not available, using original file")
+            image_info = None
+            processing = False
+            user.profile_picture = file
+            user.save(update_fields=['profile_picture'])
         
         # Get the URL of the uploaded file
         if user.profile_picture:
             return Response({
-                'detail': 'uploaded and processed' if IMAGE_PROCESSING_AVAILABLE else 'uploaded', 
+                'detail': 'uploaded, processing' if processing else 'uploaded',
                 'url': user.get_profile_picture_url(),
                 'filename': user.profile_picture.name,
-                'processed': IMAGE_PROCESSING_AVAILABLE,
+                'processed': IMAGE_PROCESSING_AVAILABLE and not processing,
+                'processing': processing,
                 'original_info': image_info
             })
         else:
@@ -228,79 +221,24 @@ def validate_and_fix_image(request):
         return Response({'detail': 'image_url required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        import requests
-        from PIL import Image
-        from io import BytesIO
-        
-        # Download the image
-        response = requests.get(image_url, timeout=10)
-        if response.status_code != 200:
-            return Response({'detail': 'Image not accessible'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Try to open and process the image
-        try:
-            with Image.open(BytesIO(response.content)) as img:
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize if too large
-                max_size = (1024, 1024)
-                if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                # Save as JPEG
-                output = BytesIO()
-                img.save(output, format='JPEG', quality=95, optimize=True)
-                output.seek(0)
-                
-                # Upload the fixed image back to S3
-                import boto3
-                s3_client = boto3.client('s3', region_name=os.getenv('AWS_S3_REGION_NAME', 'us-west-2'))
-                bucket_name = os.getenv('AWS_STORAGE_BUCKET_NAME')
-                
-                # Extract filename from original URL
-                filename = image_url.split('/')[-1].split('?')[0]
-                if not filename.lower().endswith('.jpg'):
-                    filename += '.jpg'
-                
-                s3_key = f'profil/{filename}'
-                
-                s3_client.put_object(
-                    Bucket=bucket_name,
-                    Key=s3_key,
-                    Body=output.getvalue(),
-                    ContentType='image/jpeg'
-                )
-                
-                # Return the new CloudFront URL
-                cloudfront_domain = os.getenv('CLOUDFRONT_DOMAIN', 'd2czzsmpeluuz5.cloudfront.net')
-                new_url = f'https://{cloudfront_domain}/profil/{filename}'
-                
-                return Response({
-                    'detail': 'Image fixed and uploaded',
-                    'original_url': image_url,
-                    'fixed_url': new_url,
-                    's3_key': s3_key
-                })
-                
-        except Exception as img_error:
-            return Response({
-                'detail': f'Image processing failed: {str(img_error)}',
-                'error': 'processing_failed'
-            }, status=status.HTTP_400_BAD_REQUEST)
-            
+        # Memoized by URL and content hash: a fixed image is not fetched again
+        result, cached = fix_image(image_url)
+    except ImageFetchError as e:
+        return Response({'detail': str(e), 'error': e.error}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
+        logger.error(f"Image fix failed for {image_url}: {e}")
         return Response({
             'detail': f'Validation failed: {str(e)}',
             'error': 'validation_failed'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'detail': 'Image already fixed' if cached else 'Image fixed and uploaded',
+        'original_url': image_url,
+        'fixed_url': result['fixed_url'],
+        's3_key': result['s3_key'],
+        'cached': cached
+    })
 
 class CustomTokenRefreshView(TokenRefreshView):
     """Custom token refresh view that includes user data"""
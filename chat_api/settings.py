@@ -262,6 +262,14 @@ CLOUDFRONT_DOMAIN = os.getenv('CLOUDFRONT_DOMAIN', 'd2czzsmpeluuz5.cloudfront.ne
 # Firebase Cloud Messaging Configuration
 FCM_SERVER_KEY = os.environ.get('FCM_SERVER_KEY', '')
 FCM_PROJECT_ID = os.environ.get('FCM_PROJECT_ID', '')
+# Push delivery (accounts/fcm_service.py): multicast requests sent by a pool
+# of keep-alive sessions, FCM_TIMEOUT per request, FCM_DEADLINE per send
+FCM_URL = os.environ.get('FCM_URL', 'https://fcm.googleapis.com/fcm/send')
+FCM_WORKERS = 16
+FCM_TIMEOUT = 5
+FCM_DEADLINE = 10
+# Consecutive transient per-token FCM errors before a token is deactivated
+FCM_MAX_TOKEN_FAILURES = 10
 
 # AWS S3 Configuration for CloudFront
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
@@ -281,7 +289,7 @@ if CLOUDFRONT_DOMAIN:
     MEDIA_URL = f'https://{CLOUDFRONT_DOMAIN}/media/'
     
     # Use S3 for file storage
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    DEFAULT_FILE_STORAGE = 'accounts.storage.MediaStorage'
     STATICFILES_STORAGE = 'storages.backends.s3boto3.S3StaticStorage'
 else:
     # Fallback to local storage
@@ -361,7 +369,7 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Media files - Use S3 if configured, otherwise local (simplified)
 if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY and AWS_STORAGE_BUCKET_NAME:
     # Use S3 for media files
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    DEFAULT_FILE_STORAGE = 'accounts.storage.MediaStorage'
     MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/media/'
     MEDIA_ROOT = ''
 else:
@@ -389,6 +397,69 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 RATELIMIT_ENABLE = True
 RATELIMIT_USE_CACHE = 'default'
 
+# Message archiving: months older than this are moved to compressed archives
+# (python manage.py archive_messages)
+MESSAGE_ARCHIVE_AFTER_DAYS = int(os.getenv('MESSAGE_ARCHIVE_AFTER_DAYS', '180'))
+
+# Potential matches ranking (matching/ranking.py)
+MATCHING_RANKING_MAX_CANDIDATES = int(os.getenv('MATCHING_RANKING_MAX_CANDIDATES', '5000'))
+# MATCHING_RANKING_WEIGHTS = {'distance': ...} overrides some of the
+# defaults in matching.ranking.DEFAULT_RANKING_WEIGHTS
+
+# Materialized candidate decks (matching/deck.py): Redis sorted sets when
+# REDIS_URL is set, in-memory stand-in otherwise
+MATCHING_DECK_REDIS_URL = os.getenv('REDIS_URL')
+MATCHING_DECK_SIZE = int(os.getenv('MATCHING_DECK_SIZE', '200'))
+MATCHING_DECK_LOW_WATERMARK = int(os.getenv('MATCHING_DECK_LOW_WATERMARK', '40'))
+MATCHING_DECK_TTL = 6 * 3600
+MATCHING_DECK_PAGE_TTL = 15 * 60
+MATCHING_DECK_REFILL_WORKERS = 2
+MATCHING_DECK_REFILL_ASYNC = True
+
+# Per-user Bloom filter of liked/skipped/blocked profiles (matching/seen.py)
+MATCHING_SEEN_FALSE_POSITIVE_RATE = 0.01
+MATCHING_SEEN_INITIAL_CAPACITY = 1000
+
+# Per-process columnar index of discoverable users (matching/user_index.py),
+# ~39 MB per 1M users (39 B/user); fully reloaded after MATCHING_USER_INDEX_MAX_AGE seconds
+MATCHING_USER_INDEX_ENABLED = os.getenv('MATCHING_USER_INDEX_ENABLED', 'True').lower() == 'true'
+MATCHING_USER_INDEX_MAX_AGE = int(os.getenv('MATCHING_USER_INDEX_MAX_AGE', '300'))
+
+# Like pipeline (matching/likes.py): notifications and match conversation are
+# sent after commit by a small thread pool
+MATCHING_LIKE_SIDE_EFFECTS_WORKERS = 4
+MATCHING_LIKE_SIDE_EFFECTS_ASYNC = True
+
+# Largest batch accepted by the swipes/ endpoint (matching/swipes.py)
+MATCHING_SWIPE_BATCH_MAX_SIZE = 100
+
+# Matching throttles (GCRA): one integer per user and scope, updated by a Lua
+# script in Redis when REDIS_URL is set, in-process store otherwise
+MATCHING_THROTTLE_REDIS_URL = os.getenv('REDIS_URL')
+
+# Presigned profile picture URLs (matching/presign.py): one S3 client per
+# process, signed URLs reused until less than REFRESH_MARGIN seconds remain
+MATCHING_PRESIGNED_URL_TTL = int(os.getenv('MATCHING_PRESIGNED_URL_TTL', '3600'))
+MATCHING_PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv('MATCHING_PRESIGNED_URL_REFRESH_MARGIN', '600'))
+MATCHING_PRESIGNED_URL_CACHE_SIZE = 50000
+
+# Profile picture ingestion (accounts/image_ingestion.py): uploads are stored
+# as-is, then resized by a bounded pool; a full queue falls back to inline work
+IMAGE_INGESTION_WORKERS = int(os.getenv('IMAGE_INGESTION_WORKERS', '2'))
+IMAGE_INGESTION_QUEUE_SIZE = 32
+IMAGE_INGESTION_ASYNC = True
+
+# validate-and-fix-image (accounts/image_repair.py): downloads stop at
+# IMAGE_FIX_MAX_BYTES, results are cached by source URL and content hash
+IMAGE_FIX_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_FIX_CACHE_TTL = 7 * 24 * 3600
+
+# CloudFront invalidations (cloudfront_config.InvalidationQueue): paths are
+# coalesced for WINDOW seconds; a directory with COLLAPSE_THRESHOLD queued
+# files is invalidated as /dir/*
+CLOUDFRONT_INVALIDATION_WINDOW = int(os.getenv('CLOUDFRONT_INVALIDATION_WINDOW', '60'))
+CLOUDFRONT_INVALIDATION_COLLAPSE_THRESHOLD = 10
+
 # API configuration
 API_VERSION = 'v1'
 API_PAGE_SIZE = 20
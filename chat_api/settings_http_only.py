@@ -224,7 +224,7 @@ AWS_S3_OBJECT_PARAMETERS = {
 
 # Use S3 for media files in production
 if not DEBUG and AWS_ACCESS_KEY_ID:
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    DEFAULT_FILE_STORAGE = 'accounts.storage.MediaStorage'
     STATICFILES_STORAGE = 'storages.backends.s3boto3.S3StaticStorage'
 
 # Logging
@@ -4,9 +4,14 @@ CloudFront CDN configuration for FortiFun app
 Handles media file serving, caching, and distribution
 """
 
+import atexit
+import logging
 import os
+import threading
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 class CloudFrontConfig:
     """Configuration class for CloudFront CDN"""
     
@@ -23,6 +28,7 @@ class CloudFrontConfig:
         'images': 86400,      # 24 hours for profile pictures
         'media': 3600,        # 1 hour for other media
         'static': 31536000,   # 1 year for static assets
+        'renditions': 31536000,  # 1 year: content-addressed, never rewritten
     }
     
     # File type configurations
@@ -58,9 +64,13 @@ class CloudFrontConfig:
     def get_cache_headers(cls, file_type):
         """Get cache headers for different file types"""
         ttl = cls.CACHE_TTL.get(file_type, cls.CACHE_TTL['media'])
+        cache_control = f'max-age={ttl}, public'
+        if file_type == 'renditions':
+            # Content-addressed: a rendition key never gets new bytes
+            cache_control += ', immutable'
         
         return {
-            'Cache-Control': f'max-age={ttl}, public',
+            'Cache-Control': cache_control,
             'Expires': None,  # Let CloudFront handle expiration
         }
     
@@ -79,6 +89,10 @@ class CloudFrontConfig:
     @classmethod
     def get_file_type(cls, filename):
         """Get file type category"""
+        from accounts.renditions import parse_rendition
+        
+        if parse_rendition(filename):
+            return 'renditions'
         ext = os.path.splitext(filename)[1].lower()
         
         for file_type, extensions in cls.FILE_TYPES.items():
@@ -88,33 +102,206 @@ class CloudFrontConfig:
         return 'media'
     
     @classmethod
-    def get_optimized_url(cls, file_path, width=None, height=None, quality=None):
-        """Get optimized CloudFront URL with image transformations"""
+    def get_optimized_url(cls, file_path, width=None, height=None, quality=None, image_format='jpg'):
+        """
+        Get the CloudFront URL of the stored rendition that fits width x height.
+        
+        Processed profile pictures exist in fixed sizes and formats
+        (accounts/renditions.py); nothing transforms images on the fly, so
+        quality is fixed by the rendition and only the size picks the file.
+        """
         if not cls.is_image_file(file_path):
             return cls.get_cloudfront_url(file_path)
         
-        # For images, we can add transformation parameters
-        # This would work with CloudFront Functions or Lambda@Edge
-        base_url = cls.get_cloudfront_url(file_path)
+        from accounts.renditions import rendition_key
         
-        if width or height or quality:
-            params = []
-            if width:
-                params.append(f'w_{width}')
-            if height:
-                params.append(f'h_{height}')
-            if quality:
-                params.append(f'q_{quality}')
+        size = max(width or 0, height or 0) or None
+        return cls.get_cloudfront_url(rendition_key(file_path, size, image_format))
+
+class InvalidationQueue:
+    """
+    Coalescing CloudFront invalidation queue.
+    
+    Paths are collected for a time window (CLOUDFRONT_INVALIDATION_WINDOW
+    seconds after the first one), deduplicated, then submitted as a few
+    batched invalidations instead of one API call per file. A directory with
+    at least CLOUDFRONT_INVALIDATION_COLLAPSE_THRESHOLD queued files is
+    invalidated as /dir/* (CloudFront bills a wildcard as one path), and
+    batches stay within the provider limits: 3000 paths and 15 wildcards per
+    invalidation. A batch rejected for a transient reason (throttling, too
+    many invalidations in progress) is queued again for the next window; any
+    other error drops the batch and counts its paths as dropped.
+    """
+    
+    MAX_PATHS_PER_BATCH = 3000
+    MAX_WILDCARDS_PER_BATCH = 15
+    # Error codes worth retrying in the next window
+    RETRYABLE_ERRORS = frozenset({'Throttling', 'ThrottlingException', 'TooManyInvalidationsInProgress'})
+    
+    def __init__(self, distribution_id=None, client=None, window=None, collapse_threshold=None, auto_flush=True):
+        self.distribution_id = distribution_id or CloudFrontConfig.DISTRIBUTION_ID
+        self.window = window if window is not None else getattr(settings, 'CLOUDFRONT_INVALIDATION_WINDOW', 60)
+        self.collapse_threshold = collapse_threshold or getattr(
+            settings, 'CLOUDFRONT_INVALIDATION_COLLAPSE_THRESHOLD', 10
+        )
+        self.auto_flush = auto_flush
+        self._client = client
+        self._pending = set()
+        self._timer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Counters (see stats())
+        self.queued = 0
+        self.flushed = 0
+        self.invalidations = 0
+        self.failures = 0
+        self.dropped = 0
+    
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            from botocore.config import Config
             
-            # Add transformation path
-            if params:
-                # Insert transformation before filename
-                parts = base_url.split('/')
-                filename = parts[-1]
-                parts[-1] = f"transform/{'/'.join(params)}/{filename}"
-                base_url = '/'.join(parts)
+            self._client = boto3.client('cloudfront', config=Config(retries={'max_attempts': 5, 'mode': 'adaptive'}))
+        return self._client
+    
+    def add(self, paths):
+        """Queue paths for invalidation; returns the number of distinct pending paths"""
+        paths = {path if path.startswith('/') else f'/{path}' for path in paths}
+        with self._lock:
+            before = len(self._pending)
+            self._pending |= paths
+            self.queued += len(self._pending) - before
+            if self.auto_flush and self._timer is None and self._pending:
+                self._schedule()
+            return len(self._pending)
+    
+    def _schedule(self):
+        self._timer = threading.Timer(self.window, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    @property
+    def pending(self):
+        return len(self._pending)
+    
+    def stats(self):
+        """Pending paths, paths flushed and dropped, invalidations created and failed batches"""
+        return {
+            'pending': self.pending,
+            'queued': self.queued,
+            'flushed': self.flushed,
+            'invalidations': self.invalidations,
+            'failures': self.failures,
+            'dropped': self.dropped,
+        }
+    
+    def flush(self):
+        """
+        Submit every pending path now.
         
-        return base_url
+        Returns:
+            int: the number of invalidations created
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                paths, self._pending = self._pending, set()
+            if not paths:
+                return 0
+            
+            batches = split_batches(
+                collapse_paths(paths, self.collapse_threshold), self.MAX_PATHS_PER_BATCH, self.MAX_WILDCARDS_PER_BATCH
+            )
+            created = 0
+            for i, batch in enumerate(batches):
+                try:
+                    response = self.client.create_invalidation(
+                        DistributionId=self.distribution_id,
+                        InvalidationBatch={
+                            'Paths': {'Quantity': len(batch), 'Items': batch},
+                            'CallerReference': f"invalidation-{os.urandom(8).hex()}"
+                        }
+                    )
+                except Exception as e:
+                    self.failures += 1
+                    code = (getattr(e, 'response', None) or {}).get('Error', {}).get('Code')
+                    if code not in self.RETRYABLE_ERRORS:
+                        logger.error(f"Error creating CloudFront invalidation, dropping {len(batch)} paths: {e}")
+                        self.dropped += len(batch)
+                        continue
+                    logger.warning(f"CloudFront invalidation rejected ({code}), retrying next window")
+                    retry = [path for rest in batches[i:] for path in rest]
+                    with self._lock:
+                        self._pending.update(retry)
+                        if self.auto_flush and self._timer is None:
+                            self._schedule()
+                    break
+                created += 1
+                self.invalidations += 1
+                self.flushed += len(batch)
+                logger.info(f"CloudFront invalidation created: {response['Invalidation']['Id']} ({len(batch)} paths)")
+            return created
+
+
+def collapse_paths(paths, threshold):
+    """
+    Deduplicate paths and collapse crowded directories into wildcards.
+    
+    A directory with at least `threshold` paths becomes /dir/*; paths covered
+    by a wildcard (queued or collapsed) are dropped. The root is never collapsed.
+    """
+    paths = set(paths)
+    directories = {}
+    for path in paths:
+        if not path.endswith('*'):
+            directory = path.rsplit('/', 1)[0]
+            if directory:
+                directories[directory] = directories.get(directory, 0) + 1
+    prefixes = {path[:-1] for path in paths if path.endswith('*')}
+    prefixes |= {f'{directory}/' for directory, count in directories.items() if count >= threshold}
+    
+    def covered(path, own=None):
+        return any(path.startswith(prefix) for prefix in prefixes if prefix != own)
+    
+    result = [f'{prefix}*' for prefix in prefixes if not covered(prefix, own=prefix)]
+    result += [path for path in paths if not path.endswith('*') and not covered(path)]
+    return sorted(result)
+
+
+def split_batches(paths, max_paths, max_wildcards):
+    """Split paths into invalidation batches within the per-batch path and wildcard limits"""
+    batches = []
+    batch, wildcards = [], 0
+    for path in paths:
+        wildcard = path.endswith('*')
+        if len(batch) >= max_paths or (wildcard and wildcards >= max_wildcards):
+            batches.append(batch)
+            batch, wildcards = [], 0
+        batch.append(path)
+        wildcards += wildcard
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+_invalidation_queue = None
+_invalidation_queue_lock = threading.Lock()
+
+
+def get_invalidation_queue():
+    """Process-wide invalidation queue (flushed at exit)"""
+    global _invalidation_queue
+    if _invalidation_queue is None:
+        with _invalidation_queue_lock:
+            if _invalidation_queue is None:
+                _invalidation_queue = InvalidationQueue()
+                atexit.register(_invalidation_queue.flush)
+    return _invalidation_queue
+
 
 # CloudFront invalidation settings
 class CloudFrontInvalidation:
@@ -122,40 +309,24 @@ class CloudFrontInvalidation:
     
     @classmethod
     def create_invalidation(cls, paths):
-        """Create CloudFront invalidation for given paths"""
-        try:
-            import boto3
-            from botocore.exceptions import ClientError
-            
-            if not CloudFrontConfig.DISTRIBUTION_ID:
-                print("Warning: CLOUDFRONT_DISTRIBUTION_ID not set, skipping invalidation")
-                return False
-            
-            cloudfront = boto3.client('cloudfront')
-            
-            # Ensure paths start with /
-            invalidation_paths = [path if path.startswith('/') else f'/{path}' for path in paths]
-            
-            response = cloudfront.create_invalidation(
-                DistributionId=CloudFrontConfig.DISTRIBUTION_ID,
-                InvalidationBatch={
-                    'Paths': {
-                        'Quantity': len(invalidation_paths),
-                        'Items': invalidation_paths
-                    },
-                    'CallerReference': f"invalidation-{os.urandom(8).hex()}"
-                }
-            )
-            
-            print(f"CloudFront invalidation created: {response['Invalidation']['Id']}")
-            return True
-            
-        except ClientError as e:
-            print(f"Error creating CloudFront invalidation: {e}")
-            return False
-        except ImportError:
-            print("boto3 not installed, skipping CloudFront invalidation")
+        """Queue CloudFront invalidation of the given paths (see InvalidationQueue)"""
+        if not CloudFrontConfig.DISTRIBUTION_ID:
+            logger.warning("CLOUDFRONT_DISTRIBUTION_ID not set, skipping invalidation")
             return False
+        get_invalidation_queue().add(paths)
+        return True
+    
+    @classmethod
+    def flush(cls):
+        """Submit the queued invalidations now"""
+        if not CloudFrontConfig.DISTRIBUTION_ID:
+            return 0
+        return get_invalidation_queue().flush()
+    
+    @classmethod
+    def stats(cls):
+        """Pending and flushed invalidation counts of this process"""
+        return get_invalidation_queue().stats()
     
     @classmethod
     def invalidate_user_media(cls, user_id):
@@ -190,7 +361,7 @@ def configure_cloudfront_settings():
     }
     
     # File storage settings
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    DEFAULT_FILE_STORAGE = 'accounts.storage.MediaStorage'
     STATICFILES_STORAGE = 'storages.backends.s3boto3.S3StaticStorage'
     
     return {
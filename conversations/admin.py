@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message, MessageRead
+from .models import Conversation, Message, MessageRead, MessageArchive
 
 class MessageInline(admin.TabularInline):
     model = Message
@@ -33,3 +33,10 @@ class MessageReadAdmin(admin.ModelAdmin):
     list_display = ('message', 'user', 'read_at')
     list_filter = ('read_at',)
     search_fields = ('user__username',)
+
+@admin.register(MessageArchive)
+class MessageArchiveAdmin(admin.ModelAdmin):
+    list_display = ('conversation', 'period_start', 'message_count', 'first_message_at', 'last_message_at')
+    list_filter = ('period_start',)
+    search_fields = ('conversation__id',)
+    exclude = ('payload',)
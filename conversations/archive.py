@@ -0,0 +1,199 @@
+# conversations/archive.py
+
+import json
+import logging
+import zlib
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Message, MessageRead, MessageArchive
+
+logger = logging.getLogger(__name__)
+
+# Les messages sont partitionnés par mois (UTC). Une partition n'est archivée
+# que lorsqu'elle est entièrement antérieure au seuil, de sorte que la table
+# `conversations_message` ne contient que les partitions récentes.
+ARCHIVE_COMPRESSION_LEVEL = 6
+
+
+def month_start(value):
+    """Return the first instant (UTC) of the month containing `value`"""
+    value = value.astimezone(dt_timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month_start(value):
+    """Return the first instant (UTC) of the month following `value`"""
+    start = month_start(value)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def compress_messages(messages):
+    """Serialize a list of archived message dicts to compressed bytes"""
+    raw = json.dumps(messages, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return zlib.compress(raw, ARCHIVE_COMPRESSION_LEVEL)
+
+
+def decompress_messages(payload):
+    """Inverse of `compress_messages`"""
+    return json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
+
+
+def find_archivable_partitions(cutoff):
+    """
+    List the (conversation_id, period_start) partitions that lie entirely
+    before `cutoff`.
+
+    Args:
+        cutoff: Messages older than this datetime are eligible for archiving
+
+    Returns:
+        list: Tuples (conversation_id, period_start) ordered by period
+    """
+    boundary = month_start(cutoff)
+    partitions = (
+        Message.objects.filter(created_at__lt=boundary)
+        .annotate(period=TruncMonth('created_at', tzinfo=dt_timezone.utc))
+        .values_list('conversation_id', 'period')
+        .distinct()
+        .order_by('period', 'conversation_id')
+    )
+    return list(partitions)
+
+
+def archive_partition(conversation_id, period_start):
+    """
+    Move one monthly partition of a conversation into a compressed MessageArchive row.
+
+    The messages (and their read receipts) are deleted from the hot table in the
+    same transaction. If the partition was already partially archived, the new
+    messages are merged into the existing archive.
+
+    Returns:
+        int: Number of messages archived
+    """
+    period_start = month_start(period_start)
+    period_end = next_month_start(period_start)
+
+    with transaction.atomic():
+        rows = list(
+            Message.objects.select_for_update()
+            .filter(
+                conversation_id=conversation_id,
+                created_at__gte=period_start,
+                created_at__lt=period_end,
+            )
+            .order_by('created_at', 'id')
+            .values('id', 'sender_id', 'content', 'created_at', 'is_read', 'attachment')
+        )
+        if not rows:
+            return 0
+
+        message_ids = [row['id'] for row in rows]
+        read_by = defaultdict(list)
+        for message_id, user_id in MessageRead.objects.filter(
+            message_id__in=message_ids
+        ).values_list('message_id', 'user_id'):
+            read_by[message_id].append(user_id)
+
+        messages = [
+            {
+                'id': row['id'],
+                'sender_id': row['sender_id'],
+                'content': row['content'],
+                'created_at': row['created_at'].isoformat(),
+                'is_read': row['is_read'],
+                'attachment': row['attachment'] or None,
+                'read_by': read_by.get(row['id'], []),
+            }
+            for row in rows
+        ]
+
+        archive = MessageArchive.objects.select_for_update().filter(
+            conversation_id=conversation_id,
+            period_start=period_start,
+        ).first()
+        if archive:
+            known_ids = set(message_ids)
+            previous = [m for m in decompress_messages(archive.payload) if m['id'] not in known_ids]
+            messages = sorted(previous + messages, key=lambda m: (m['created_at'], m['id']))
+        else:
+            archive = MessageArchive(
+                conversation_id=conversation_id,
+                period_start=period_start,
+                period_end=period_end,
+            )
+
+        archive.first_message_at = parse_datetime(messages[0]['created_at'])
+        archive.last_message_at = parse_datetime(messages[-1]['created_at'])
+        archive.message_count = len(messages)
+        archive.payload = compress_messages(messages)
+        archive.save()
+
+        # Les accusés de lecture sont supprimés en cascade
+        Message.objects.filter(id__in=message_ids).delete()
+
+    logger.info(
+        f"Archived {len(message_ids)} messages of conversation {conversation_id} "
+        f"for {period_start.strftime('%Y-%m')}"
+    )
+    return len(message_ids)
+
+
+def iter_archived_messages(conversation_id, before=None):
+    """
+    Lazily yield archived messages of a conversation, newest first.
+
+    Archive payloads are only fetched and decompressed when the iteration
+    reaches them, so a caller that stops early never touches older partitions.
+
+    Args:
+        conversation_id: Conversation to read
+        before: Optional datetime; only messages strictly older are yielded
+    """
+    archives = MessageArchive.objects.filter(conversation_id=conversation_id).defer('payload')
+    if before is not None:
+        archives = archives.filter(first_message_at__lt=before)
+
+    for archive in archives.order_by('-period_start').iterator():
+        # Accès au champ différé : une requête par partition réellement lue
+        messages = decompress_messages(archive.payload)
+        for message in reversed(messages):
+            if before is not None and parse_datetime(message['created_at']) >= before:
+                continue
+            yield message
+
+
+def read_archived_messages(conversation_id, before=None, limit=None):
+    """
+    Return archived messages in chronological order.
+
+    Args:
+        conversation_id: Conversation to read
+        before: Optional datetime upper bound (exclusive)
+        limit: Maximum number of (most recent) messages to return
+    """
+    messages = []
+    if limit is not None and limit <= 0:
+        return messages
+
+    for message in iter_archived_messages(conversation_id, before=before):
+        messages.append(message)
+        if limit is not None and len(messages) >= limit:
+            break
+
+    messages.reverse()
+    return messages
+
+
+def archive_cutoff(older_than_days, now=None):
+    """Compute the archiving cutoff datetime from an age in days"""
+    now = now or timezone.now()
+    return now - timedelta(days=older_than_days)
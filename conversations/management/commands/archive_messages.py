@@ -0,0 +1,61 @@
+# conversations/management/commands/archive_messages.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from conversations.archive import (
+    archive_cutoff, archive_partition, find_archivable_partitions, month_start
+)
+
+class Command(BaseCommand):
+    help = 'Move monthly message partitions older than a threshold into compressed archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=getattr(settings, 'MESSAGE_ARCHIVE_AFTER_DAYS', 180),
+            help='Archive whole months of messages older than this many days',
+        )
+        parser.add_argument(
+            '--conversation-id',
+            type=int,
+            help='Only archive this conversation',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the partitions that would be archived without moving them',
+        )
+
+    def handle(self, *args, **options):
+        older_than_days = options['older_than_days']
+        if older_than_days < 1:
+            raise CommandError("--older-than-days must be at least 1")
+
+        cutoff = archive_cutoff(older_than_days)
+        partitions = find_archivable_partitions(cutoff)
+        if options.get('conversation_id'):
+            partitions = [p for p in partitions if p[0] == options['conversation_id']]
+
+        self.stdout.write(
+            f"Archiving partitions before {month_start(cutoff).strftime('%Y-%m')} "
+            f"({len(partitions)} partition(s) found)"
+        )
+
+        if options['dry_run']:
+            for conversation_id, period_start in partitions:
+                self.stdout.write(f"  conversation {conversation_id} - {period_start.strftime('%Y-%m')}")
+            return
+
+        archived_total = 0
+        for conversation_id, period_start in partitions:
+            try:
+                archived_total += archive_partition(conversation_id, period_start)
+            except Exception as e:
+                raise CommandError(
+                    f"Error archiving conversation {conversation_id} ({period_start.strftime('%Y-%m')}): {e}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived_total} message(s) from {len(partitions)} partition(s)"
+        ))
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_postgres_time_index(apps, schema_editor):
+    # BRIN : index minuscule pour une table en ajout seul ordonnée dans le temps,
+    # permet d'élaguer les blocs par partition mensuelle sur PostgreSQL.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS message_created_brin_idx "
+        "ON conversations_message USING brin (created_at)"
+    )
+
+
+def drop_postgres_time_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS message_created_brin_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('first_message_at', models.DateTimeField()),
+                ('last_message_at', models.DateTimeField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('payload', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at'], name='message_conv_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='messagearchive',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_archives', to='conversations.conversation'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='messagearchive',
+            unique_together={('conversation', 'period_start')},
+        ),
+        migrations.RunPython(create_postgres_time_index, drop_postgres_time_index),
+    ]
@@ -34,6 +34,9 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='message_conv_created_idx'),
+        ]
 
 class MessageRead(models.Model):
     """Modèle pour suivre quels messages ont été lus par quels utilisateurs"""
@@ -43,4 +46,25 @@ class MessageRead(models.Model):
     read_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ('message', 'user')
\ No newline at end of file
+        unique_together = ('message', 'user')
+
+class MessageArchive(models.Model):
+    """Partition mensuelle archivée (compressée) des messages d'une conversation"""
+    
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='message_archives')
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    first_message_at = models.DateTimeField()
+    last_message_at = models.DateTimeField()
+    message_count = models.PositiveIntegerField(default=0)
+    
+    # JSON des messages compressé avec zlib (voir conversations/archive.py)
+    payload = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Archive conversation {self.conversation_id} - {self.period_start.strftime('%m/%Y')}"
+    
+    class Meta:
+        ordering = ['-period_start']
+        unique_together = ('conversation', 'period_start')
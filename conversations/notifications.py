@@ -1,33 +1,64 @@
 # conversations/notifications.py
 
+import asyncio
+
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.utils import timezone
 
-def send_notification(user_id, notification_type, **kwargs):
+def build_notification(user_id, notification_type, **kwargs):
     """
-    Envoie une notification à un utilisateur spécifique via WebSocket
+    Construit le message de groupe d'une notification, pour send_notifications
     
-    Args:
-        user_id: ID de l'utilisateur destinataire
-        notification_type: Type de notification (message, match, etc.)
-        **kwargs: Données supplémentaires de la notification
+    Returns:
+        tuple: (nom du groupe, message)
     """
-    channel_layer = get_channel_layer()
-    
     notification = {
         'type': notification_type,
         'timestamp': timezone.now().isoformat(),
         **kwargs
     }
+    return f'user_{user_id}_notifications', {
+        'type': 'notification',
+        'notification': notification
+    }
+
+def send_notifications(messages):
+    """
+    Publie un lot de messages de groupe en un seul passage dans la boucle asynchrone
     
-    async_to_sync(channel_layer.group_send)(
-        f'user_{user_id}_notifications',
-        {
-            'type': 'notification',
-            'notification': notification
-        }
-    )
+    Les messages d'un même groupe partent dans l'ordre, les groupes en parallèle.
+    
+    Args:
+        messages: liste de (nom du groupe, message)
+    """
+    channel_layer = get_channel_layer()
+    if not messages or channel_layer is None:
+        return
+    
+    by_group = {}
+    for group, message in messages:
+        by_group.setdefault(group, []).append(message)
+    
+    async def publish_group(group, group_messages):
+        for message in group_messages:
+            await channel_layer.group_send(group, message)
+    
+    async def publish():
+        await asyncio.gather(*(publish_group(group, group_messages) for group, group_messages in by_group.items()))
+    
+    async_to_sync(publish)()
+
+def send_notification(user_id, notification_type, **kwargs):
+    """
+    Envoie une notification à un utilisateur spécifique via WebSocket
+    
+    Args:
+        user_id: ID de l'utilisateur destinataire
+        notification_type: Type de notification (message, match, etc.)
+        **kwargs: Données supplémentaires de la notification
+    """
+    send_notifications([build_notification(user_id, notification_type, **kwargs)])
 
 def notify_new_message(user_id, message_data):
     """
@@ -2,6 +2,7 @@
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from .models import Conversation, Message, MessageRead
 
 User = get_user_model()
@@ -33,6 +34,42 @@ class MessageSerializer(serializers.ModelSerializer):
             # Si l'utilisateur est un destinataire, on vérifie s'il a lu le message
             return MessageRead.objects.filter(message=obj, user=request.user).exists()
 
+def serialize_archived_messages(messages, conversation_id, context=None):
+    """
+    Build MessageSerializer-shaped dicts for archived messages.
+    
+    Senders are hydrated in a single query; read state comes from the
+    receipts stored in the archive payload.
+    """
+    context = context or {}
+    request = context.get('request')
+    sender_ids = {message['sender_id'] for message in messages}
+    senders = {
+        user.id: MessageUserSerializer(user, context=context).data
+        for user in User.objects.filter(id__in=sender_ids)
+    }
+    
+    data = []
+    for message in messages:
+        read_by = message.get('read_by', [])
+        if not request or request.user.id == message['sender_id']:
+            is_read_by_recipient = any(user_id != message['sender_id'] for user_id in read_by)
+        else:
+            is_read_by_recipient = request.user.id in read_by
+        
+        data.append({
+            'id': message['id'],
+            'conversation': conversation_id,
+            'sender': senders.get(message['sender_id']),
+            'content': message['content'],
+            'created_at': message['created_at'],
+            'is_read': message['is_read'],
+            'attachment': default_storage.url(message['attachment']) if message['attachment'] else None,
+            'is_read_by_recipient': is_read_by_recipient,
+            'is_archived': True,
+        })
+    return data
+
 class MessageCreateSerializer(serializers.ModelSerializer):
     """Serializer pour la création de messages"""
     class Meta:
@@ -69,13 +69,21 @@ class CloudFrontService:
         return CloudFrontConfig.get_cloudfront_url(s3_key)
     
     def get_optimized_image_url(self, s3_key, width=None, height=None, quality=85):
-        """Get optimized image URL with transformations"""
+        """Get the URL of the stored rendition that fits width x height"""
         return CloudFrontConfig.get_optimized_url(s3_key, width, height, quality)
     
     def invalidate_cache(self, paths):
-        """Invalidate CloudFront cache for given paths"""
+        """Queue CloudFront invalidation of the given paths (submitted in batches)"""
         return CloudFrontInvalidation.create_invalidation(paths)
     
+    def flush_invalidations(self):
+        """Submit the queued invalidations now"""
+        return CloudFrontInvalidation.flush()
+    
+    def get_invalidation_stats(self):
+        """Pending and flushed invalidation counts"""
+        return CloudFrontInvalidation.stats()
+    
     def invalidate_user_media(self, user_id):
         """Invalidate all media for a user"""
         return CloudFrontInvalidation.invalidate_user_media(user_id)
@@ -0,0 +1,116 @@
+# conversations/tests/test_cloudfront_invalidation.py
+
+import threading
+from botocore.exceptions import ClientError
+from django.test import SimpleTestCase
+from unittest import mock
+import cloudfront_config
+from cloudfront_config import CloudFrontInvalidation, InvalidationQueue, collapse_paths, split_batches
+
+
+class StubCloudFrontClient:
+    """Records create_invalidation calls; the first `failures` ones fail with `error_code`"""
+
+    def __init__(self, failures=0, error_code='TooManyInvalidationsInProgress'):
+        self.batches = []
+        self.failures = failures
+        self.error_code = error_code
+        self.called = threading.Event()
+
+    def create_invalidation(self, DistributionId, InvalidationBatch):
+        self.called.set()
+        if self.failures:
+            self.failures -= 1
+            raise ClientError({'Error': {'Code': self.error_code, 'Message': 'rejected'}}, 'CreateInvalidation')
+        paths = InvalidationBatch['Paths']
+        assert paths['Quantity'] == len(paths['Items'])
+        self.batches.append(paths['Items'])
+        return {'Invalidation': {'Id': f'I{len(self.batches)}'}}
+
+
+class InvalidationQueueTest(SimpleTestCase):
+    """Tests for the coalescing CloudFront invalidation queue"""
+
+    def make_queue(self, client, **kwargs):
+        kwargs.setdefault('auto_flush', False)
+        return InvalidationQueue(distribution_id='E123', client=client, collapse_threshold=3, **kwargs)
+
+    def test_paths_are_deduplicated_into_one_invalidation(self):
+        client = StubCloudFrontClient()
+        queue = self.make_queue(client)
+        for _ in range(50):
+            queue.add(['profil/a.jpg', '/profil/b.jpg'])
+        self.assertEqual(queue.stats()['pending'], 2)
+        self.assertEqual(client.batches, [])
+
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(client.batches, [['/profil/a.jpg', '/profil/b.jpg']])
+        self.assertEqual(queue.stats(), {
+            'pending': 0, 'queued': 2, 'flushed': 2, 'invalidations': 1, 'failures': 0, 'dropped': 0
+        })
+        self.assertEqual(queue.flush(), 0)
+
+    def test_crowded_directories_collapse_to_a_wildcard(self):
+        paths = ['/media/user_1/*', '/media/user_1/x.jpg', '/p/r/abc/128.jpg', '/p/r/abc/320.jpg',
+                 '/p/r/abc/640.jpg', '/p/r/def/128.jpg', '/top.jpg']
+        self.assertEqual(collapse_paths(paths, 3), ['/media/user_1/*', '/p/r/abc/*', '/p/r/def/128.jpg', '/top.jpg'])
+        # Un joker couvre les jokers plus profonds
+        self.assertEqual(collapse_paths(['/media/*', '/media/user_1/*'], 3), ['/media/*'])
+
+    def test_batches_stay_within_provider_limits(self):
+        paths = [f'/d{i}/*' for i in range(20)] + [f'/f{i}.jpg' for i in range(7000)]
+        batches = split_batches(sorted(paths), 3000, 15)
+        self.assertEqual(sum(len(batch) for batch in batches), 7020)
+        for batch in batches:
+            self.assertLessEqual(len(batch), 3000)
+            self.assertLessEqual(sum(path.endswith('*') for path in batch), 15)
+
+        client = StubCloudFrontClient()
+        queue = self.make_queue(client)
+        queue.add(f'/u/{i}/photo.jpg' for i in range(4500))
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual([len(batch) for batch in client.batches], [3000, 1500])
+
+    def test_rejected_batch_is_queued_again(self):
+        client = StubCloudFrontClient(failures=1)
+        queue = self.make_queue(client)
+        queue.add(['/a.jpg', '/b.jpg'])
+        self.assertEqual(queue.flush(), 0)
+        self.assertEqual(queue.stats()['pending'], 2)
+        self.assertEqual(queue.stats()['failures'], 1)
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(client.batches, [['/a.jpg', '/b.jpg']])
+
+    def test_non_retryable_error_drops_the_batch(self):
+        client = StubCloudFrontClient(failures=1, error_code='InvalidArgument')
+        queue = self.make_queue(client)
+        queue.add(f'/u/{i}/photo.jpg' for i in range(4500))
+        self.assertEqual(queue.flush(), 1)  # le second lot passe malgré le rejet du premier
+        self.assertEqual([len(batch) for batch in client.batches], [1500])
+        stats = queue.stats()
+        self.assertEqual((stats['pending'], stats['failures'], stats['dropped']), (0, 1, 3000))
+        self.assertEqual(queue.flush(), 0)
+
+    def test_window_flushes_in_the_background(self):
+        client = StubCloudFrontClient()
+        queue = self.make_queue(client, auto_flush=True, window=0.05)
+        queue.add(['/a.jpg'])
+        queue.add(['/b.jpg'])
+        self.assertTrue(client.called.wait(5))
+        queue._flush_lock.acquire()
+        queue._flush_lock.release()
+        self.assertEqual(client.batches, [['/a.jpg', '/b.jpg']])
+
+    def test_service_calls_are_coalesced(self):
+        client = StubCloudFrontClient()
+        queue = self.make_queue(client)
+        with mock.patch.object(cloudfront_config.CloudFrontConfig, 'DISTRIBUTION_ID', 'E123'), \
+                mock.patch.object(cloudfront_config, '_invalidation_queue', queue):
+            for user_id in range(3):
+                self.assertTrue(CloudFrontInvalidation.invalidate_file(f'profil/user_{user_id}.jpg'))
+                CloudFrontInvalidation.invalidate_user_media(user_id)
+            self.assertEqual(CloudFrontInvalidation.stats()['pending'], 9)
+            self.assertEqual(client.batches, [])
+            self.assertEqual(CloudFrontInvalidation.flush(), 1)
+        # /profil/user_N.jpg regroupés en /profil/*, qui couvre aussi /profil/user_N/*
+        self.assertEqual(client.batches, [['/media/user_0/*', '/media/user_1/*', '/media/user_2/*', '/profil/*']])
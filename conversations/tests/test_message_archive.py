@@ -0,0 +1,150 @@
+# conversations/tests/test_message_archive.py
+
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from rest_framework.test import APIRequestFactory, force_authenticate
+from conversations.archive import (
+    archive_partition, find_archivable_partitions, iter_archived_messages,
+    read_archived_messages
+)
+from conversations.models import Conversation, Message, MessageArchive, MessageRead
+from conversations.views import MessageViewSet
+
+User = get_user_model()
+
+class MessageArchiveTest(TestCase):
+    """Tests for monthly message partition archiving"""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+
+    def create_message(self, content, created_at, sender=None):
+        message = Message.objects.create(
+            conversation=self.conversation,
+            sender=sender or self.user1,
+            content=content,
+        )
+        # created_at est auto_now_add : on le force après coup
+        Message.objects.filter(id=message.id).update(created_at=created_at)
+        return message
+
+    def test_archive_moves_whole_old_months_only(self):
+        """Only partitions entirely before the cutoff month are archived"""
+        old = self.create_message('old', datetime(2024, 1, 10, tzinfo=dt_timezone.utc))
+        MessageRead.objects.create(message=old, user=self.user2)
+        self.create_message('older', datetime(2023, 12, 5, tzinfo=dt_timezone.utc))
+        self.create_message('recent', timezone.now())
+
+        partitions = find_archivable_partitions(datetime(2024, 1, 20, tzinfo=dt_timezone.utc))
+        self.assertEqual(len(partitions), 1)
+
+        call_command('archive_messages', older_than_days=30, stdout=StringIO())
+
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertEqual(MessageArchive.objects.count(), 2)
+        self.assertFalse(MessageRead.objects.exists())
+
+        archived = read_archived_messages(self.conversation.id)
+        self.assertEqual([m['content'] for m in archived], ['older', 'old'])
+        self.assertEqual(archived[1]['read_by'], [self.user2.id])
+
+    def test_archive_merges_into_existing_partition(self):
+        """Archiving the same month twice merges payloads"""
+        self.create_message('first', datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+        archive_partition(self.conversation.id, datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+        self.create_message('late', datetime(2024, 3, 31, tzinfo=dt_timezone.utc))
+        archive_partition(self.conversation.id, datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+
+        archive = MessageArchive.objects.get()
+        self.assertEqual(archive.message_count, 2)
+        self.assertEqual([m['content'] for m in read_archived_messages(self.conversation.id)], ['first', 'late'])
+
+    def test_archived_partitions_are_read_lazily(self):
+        """Stopping early never decompresses older partitions"""
+        for month in (1, 2, 3):
+            self.create_message(f'm{month}', datetime(2024, month, 15, tzinfo=dt_timezone.utc))
+            archive_partition(self.conversation.id, datetime(2024, month, 1, tzinfo=dt_timezone.utc))
+
+        iterator = iter_archived_messages(self.conversation.id)
+        with self.assertNumQueries(2):
+            # Une requête pour la liste des partitions, une pour le contenu de la plus récente
+            self.assertEqual(next(iterator)['content'], 'm3')
+
+        before = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+        self.assertEqual([m['content'] for m in read_archived_messages(self.conversation.id, before=before, limit=1)], ['m2'])
+
+    def test_history_api_includes_archived_messages(self):
+        """The message list transparently prepends archived messages"""
+        self.create_message('archived', datetime(2024, 1, 10, tzinfo=dt_timezone.utc), sender=self.user2)
+        archive_partition(self.conversation.id, datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        self.create_message('hot', timezone.now())
+
+        factory = APIRequestFactory()
+        view = MessageViewSet.as_view({'get': 'list'})
+
+        request = factory.get('/messages/')
+        force_authenticate(request, user=self.user1)
+        response = view(request, conversation_pk=self.conversation.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['content'] for m in response.data], ['archived', 'hot'])
+        self.assertEqual(response.data[0]['sender']['id'], self.user2.id)
+        self.assertTrue(response.data[0]['is_archived'])
+
+        # Avec une limite satisfaite par la table principale, les archives ne sont pas lues
+        request = factory.get('/messages/', {'limit': 1})
+        force_authenticate(request, user=self.user1)
+        response = view(request, conversation_pk=self.conversation.id)
+        self.assertEqual([m['content'] for m in response.data], ['hot'])
+
+        outsider = User.objects.create_user(username='user3', email='user3@example.com', password='testpass123')
+        request = factory.get('/messages/')
+        force_authenticate(request, user=outsider)
+        response = view(request, conversation_pk=self.conversation.id)
+        self.assertEqual(response.data, [])
+
+    def test_history_api_accepts_before_without_offset(self):
+        """A naive 'before' is read in the server time zone instead of failing"""
+        self.create_message('january', datetime(2024, 1, 10, tzinfo=dt_timezone.utc))
+        self.create_message('march', datetime(2024, 3, 10, tzinfo=dt_timezone.utc))
+        archive_partition(self.conversation.id, datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+
+        view = MessageViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/messages/', {'before': '2024-02-01T00:00:00'})
+        force_authenticate(request, user=self.user1)
+        response = view(request, conversation_pk=self.conversation.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['content'] for m in response.data], ['january'])
+
+        request = APIRequestFactory().get('/messages/', {'before': 'yesterday'})
+        force_authenticate(request, user=self.user1)
+        self.assertEqual(view(request, conversation_pk=self.conversation.id).status_code, 400)
+
+    @override_settings(API_PAGE_SIZE=2)
+    def test_history_api_defaults_to_one_page_without_reading_archives(self):
+        """Without 'limit', one page is served and archives are only read past the hot table"""
+        self.create_message('archived', datetime(2024, 1, 10, tzinfo=dt_timezone.utc))
+        archive_partition(self.conversation.id, datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        for content in ('h1', 'h2', 'h3'):
+            self.create_message(content, timezone.now())
+
+        view = MessageViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/messages/')
+        force_authenticate(request, user=self.user1)
+        with mock.patch('conversations.views.read_archived_messages') as read_archives:
+            response = view(request, conversation_pk=self.conversation.id)
+        self.assertEqual([m['content'] for m in response.data], ['h2', 'h3'])
+        read_archives.assert_not_called()
+
+        # La page suivante dépasse la table principale : une seule entrée archivée est lue
+        request = APIRequestFactory().get('/messages/', {'before': response.data[0]['created_at']})
+        force_authenticate(request, user=self.user1)
+        response = view(request, conversation_pk=self.conversation.id)
+        self.assertEqual([m['content'] for m in response.data], ['archived', 'h1'])
@@ -3,14 +3,17 @@
 from rest_framework import status, generics, permissions, viewsets, mixins
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth import get_user_model
 from .models import Conversation, Message, MessageRead
 from .serializers import (
     ConversationSerializer, ConversationCreateSerializer,
-    MessageSerializer, MessageCreateSerializer
+    MessageSerializer, MessageCreateSerializer, serialize_archived_messages
 )
+from .archive import read_archived_messages
 from .notifications import notify_new_message  # Ajout de l'import pour les notifications
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -199,7 +202,63 @@ class MessageViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
     def list(self, request, *args, **kwargs):
-        response = super().list(request, *args, **kwargs)
+        """
+        Historique des messages, partitions archivées incluses.
+        
+        Paramètres optionnels :
+        - before : date ISO, ne retourne que les messages antérieurs
+        - limit : nombre maximum de messages (les plus récents) à retourner,
+          API_PAGE_SIZE par défaut
+        
+        Les archives ne sont lues que si la fenêtre demandée dépasse les
+        messages encore présents dans la table principale.
+        """
+        before = request.query_params.get('before')
+        if before:
+            before = parse_datetime(before)
+            if before is None:
+                return Response(
+                    {"detail": "Paramètre 'before' invalide (date ISO attendue)"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(before):
+                # Une date sans décalage est interprétée dans le fuseau du serveur
+                before = timezone.make_aware(before)
+        
+        limit = request.query_params.get('limit')
+        if limit is None:
+            # Sans limite, toutes les partitions archivées seraient décompressées à chaque requête
+            limit = getattr(settings, 'API_PAGE_SIZE', 20)
+        elif not limit.isdigit() or int(limit) < 1:
+            return Response(
+                {"detail": "Paramètre 'limit' invalide"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = int(limit)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        if before:
+            queryset = queryset.filter(created_at__lt=before)
+        hot_messages = list(queryset.order_by('-created_at', '-id')[:limit])[::-1]
+        
+        data = list(self.get_serializer(hot_messages, many=True).data)
+        
+        # Les partitions archivées sont toujours plus anciennes que la table principale :
+        # elles ne sont lues que si la page dépasse le plus ancien message de la table
+        remaining = limit - len(hot_messages)
+        conversation_id = self.kwargs.get('conversation_pk')
+        is_participant = Conversation.objects.filter(
+            id=conversation_id,
+            participants=request.user
+        ).exists()
+        if is_participant and remaining > 0:
+            archived = read_archived_messages(conversation_id, before=before, limit=remaining)
+            if archived:
+                data = serialize_archived_messages(
+                    archived, int(conversation_id), self.get_serializer_context()
+                ) + data
+        
+        response = Response(data)
         
         # Marque tous les messages comme lus par l'utilisateur courant
         if response.status_code == status.HTTP_200_OK:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserPreference, UserInterest, UserInterestRelation, Match
+from .models import UserPreference, UserInterest, UserInterestRelation, Match, UserSkip
 
 @admin.register(UserPreference)
 class UserPreferenceAdmin(admin.ModelAdmin):
@@ -23,3 +23,8 @@ class MatchAdmin(admin.ModelAdmin):
     list_display = ('user1', 'user2', 'created_at', 'is_active')
     list_filter = ('is_active', 'created_at')
     search_fields = ('user1__username', 'user2__username')
+
+@admin.register(UserSkip)
+class UserSkipAdmin(admin.ModelAdmin):
+    list_display = ('user', 'skipped_user', 'created_at')
+    search_fields = ('user__username', 'skipped_user__username')
@@ -0,0 +1,74 @@
+# matching/candidates.py
+
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from .geo import filter_by_distance
+
+User = get_user_model()
+
+# Seuls les utilisateurs actifs dans cette fenêtre sont proposés
+ACTIVE_WINDOW_DAYS = 7
+
+
+def base_candidate_queryset(user, exclude_seen=True):
+    """
+    Tous les utilisateurs sauf l'utilisateur courant et ceux qu'il a bloqués.
+
+    Avec `exclude_seen`, les profils likés et passés sont aussi exclus en SQL.
+    Les chemins classés passent `exclude_seen=False` et filtrent ensuite avec
+    le filtre de profils vus (matching/seen.py), dont le coût ne dépend pas
+    de la taille de l'historique.
+    """
+    excluded = Q(id=user.id) | Q(id__in=user.blocked_users.all())
+    if exclude_seen:
+        excluded |= Q(id__in=user.liked_users.all()) | Q(skipped_by__user=user)
+
+    return User.objects.exclude(excluded).prefetch_related(
+        'interests__interest'
+    )
+
+
+def apply_preference_filters(queryset, preferences):
+    """Applique les filtres d'âge, de genre et d'activité récente issus des préférences"""
+
+    # Filtre par âge si la date de naissance est disponible
+    if preferences.min_age or preferences.max_age:
+        today = date.today()
+
+        if preferences.min_age:
+            max_birthdate = today - timedelta(days=preferences.min_age * 365)
+            queryset = queryset.filter(Q(date_of_birth__isnull=False) & Q(date_of_birth__lte=max_birthdate))
+
+        if preferences.max_age:
+            min_birthdate = today - timedelta(days=preferences.max_age * 365)
+            queryset = queryset.filter(Q(date_of_birth__isnull=False) & Q(date_of_birth__gte=min_birthdate))
+
+    # Filtre par genre si spécifié
+    if preferences.gender_preference and preferences.gender_preference != 'A':
+        queryset = queryset.filter(gender=preferences.gender_preference)
+
+    # Filtre par activité récente (utilisateurs actifs dans les 7 derniers jours)
+    active_threshold = timezone.now() - timedelta(days=ACTIVE_WINDOW_DAYS)
+    queryset = queryset.filter(
+        Q(last_activity__gte=active_threshold) | Q(is_online=True)
+    )
+
+    return queryset
+
+
+def apply_distance_filter(queryset, user, max_distance):
+    """Filtre par distance maximale (km) si l'utilisateur a des coordonnées"""
+    if not max_distance or user.latitude is None or user.longitude is None:
+        return queryset
+    return filter_by_distance(queryset, user.latitude, user.longitude, max_distance)
+
+
+def candidate_queryset(user, preferences, exclude_seen=True):
+    """Candidats par défaut d'un utilisateur (préférences seules, sans filtres de requête)"""
+    queryset = base_candidate_queryset(user, exclude_seen)
+    queryset = apply_preference_filters(queryset, preferences)
+    return apply_distance_filter(queryset, user, preferences.max_distance)
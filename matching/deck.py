@@ -0,0 +1,374 @@
+# matching/deck.py
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+
+from .candidates import candidate_queryset
+from .models import UserPreference
+from .ranking import (
+    DEFAULT_MAX_CANDIDATES, RANKING_AVAILABLE, get_viewer_interest_bits,
+    rank_candidates, rank_features
+)
+from .seen import get_seen_filter
+from .user_index import indexed_candidates, user_index_enabled
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Taille d'un deck matérialisé, seuil de recharge et durée de vie
+DEFAULT_DECK_SIZE = 200
+DEFAULT_DECK_LOW_WATERMARK = 40
+DEFAULT_DECK_TTL = 6 * 3600
+# Durée pendant laquelle une page dépilée peut être redemandée par son curseur
+DEFAULT_DECK_PAGE_TTL = 15 * 60
+
+
+def deck_key(user_id):
+    return f"candidate_deck:{user_id}"
+
+
+def served_key(user_id):
+    return f"candidate_deck_served:{user_id}"
+
+
+class InMemoryDeckStore:
+    """
+    Per-process stand-in for the Redis sorted set.
+
+    Each deck is kept as a list of (candidate_id, score) sorted by descending
+    score, so popping the head is the equivalent of ZPOPMAX. Pages popped
+    with a cursor are kept per deck so that the same cursor replays them.
+    """
+
+    def __init__(self):
+        self._decks = {}
+        self._served = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        entry = self._decks.get(key)
+        if entry is None:
+            return None
+        expires_at, items = entry
+        if expires_at < time.monotonic():
+            del self._decks[key]
+            return None
+        return items
+
+    def _served_ids(self, key):
+        expires_at, served = self._served.get(key, (0, set()))
+        return served if expires_at >= time.monotonic() else set()
+
+    def replace(self, key, scored_ids, ttl, served_key=None):
+        with self._lock:
+            served = self._served_ids(served_key) if served_key else set()
+            items = sorted(
+                (item for item in scored_ids if item[0] not in served), key=lambda item: item[1], reverse=True
+            )
+            self._decks[key] = (time.monotonic() + ttl, items)
+            return len(items)
+
+    def pop(self, key, count):
+        with self._lock:
+            items = self._get(key)
+            if not items:
+                return []
+            popped, items[:] = items[:count], items[count:]
+            return popped
+
+    def pop_page(self, key, served_key, count, ttl, cursor=None, page_ttl=DEFAULT_DECK_PAGE_TTL):
+        with self._lock:
+            now = time.monotonic()
+            pages = self._pages.setdefault(key, {})
+            for token in [token for token, (expires_at, _) in pages.items() if expires_at < now]:
+                del pages[token]
+            if cursor in pages:
+                return list(pages[cursor][1])
+
+            items = self._get(key)
+            if not items:
+                return []
+            popped, items[:] = items[:count], items[count:]
+            served = set(self._served_ids(served_key))
+            served.update(candidate_id for candidate_id, _ in popped)
+            self._served[served_key] = (now + ttl, served)
+            if cursor:
+                pages[cursor] = (now + page_ttl, popped)
+            return list(popped)
+
+    def size(self, key):
+        with self._lock:
+            items = self._get(key)
+            return len(items) if items else 0
+
+    def discard(self, key, candidate_ids):
+        candidate_ids = set(candidate_ids)
+        with self._lock:
+            items = self._get(key)
+            if items:
+                items[:] = [item for item in items if item[0] not in candidate_ids]
+
+    def served(self, key):
+        with self._lock:
+            return set(self._served_ids(key))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._decks.pop(key, None)
+                self._served.pop(key, None)
+                self._pages.pop(key, None)
+
+
+# Remplacement du deck sans les candidats présentés entre la lecture et l'écriture
+# KEYS: deck, présentés ; ARGV: ttl, puis membre, score, membre, score...
+_REPLACE_SCRIPT = """
+redis.call('DEL', KEYS[1])
+for i = 2, #ARGV, 2 do
+    if redis.call('SISMEMBER', KEYS[2], ARGV[i]) == 0 then
+        redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+    end
+end
+local size = redis.call('ZCARD', KEYS[1])
+if size > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return size
+"""
+
+# Dépilement et marquage « présenté » atomiques, page rejouée si son curseur est connu
+# KEYS: deck, présentés, page ; ARGV: nombre, ttl, ttl de la page (0 : pas de curseur)
+_POP_PAGE_SCRIPT = """
+local page = redis.call('GET', KEYS[3])
+if page then
+    return page
+end
+local popped = redis.call('ZPOPMAX', KEYS[1], ARGV[1])
+if #popped == 0 then
+    return false
+end
+for i = 1, #popped, 2 do
+    redis.call('SADD', KEYS[2], popped[i])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+page = cjson.encode(popped)
+if tonumber(ARGV[3]) > 0 then
+    redis.call('SET', KEYS[3], page, 'EX', ARGV[3])
+end
+return page
+"""
+
+
+class RedisDeckStore:
+    """Decks stored as Redis sorted sets (member = candidate id, score = ranking score)"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._replace = self._client.register_script(_REPLACE_SCRIPT)
+        self._pop_page = self._client.register_script(_POP_PAGE_SCRIPT)
+
+    def replace(self, key, scored_ids, ttl, served_key=None):
+        if served_key is None:
+            pipe = self._client.pipeline(transaction=True)
+            pipe.delete(key)
+            if scored_ids:
+                pipe.zadd(key, {str(candidate_id): score for candidate_id, score in scored_ids})
+                pipe.expire(key, ttl)
+            pipe.execute()
+            return len(scored_ids)
+        args = [ttl]
+        for candidate_id, score in scored_ids:
+            args += [str(candidate_id), score]
+        return self._replace(keys=[key, served_key], args=args)
+
+    def pop(self, key, count):
+        return [(int(member), score) for member, score in self._client.zpopmax(key, count)]
+
+    def pop_page(self, key, served_key, count, ttl, cursor=None, page_ttl=DEFAULT_DECK_PAGE_TTL):
+        page = self._pop_page(
+            keys=[key, served_key, f"{key}:page:{cursor or ''}"],
+            args=[count, ttl, page_ttl if cursor else 0]
+        )
+        if not page:
+            return []
+        flat = json.loads(page)
+        return [(int(flat[i]), float(flat[i + 1])) for i in range(0, len(flat), 2)]
+
+    def size(self, key):
+        return self._client.zcard(key)
+
+    def discard(self, key, candidate_ids):
+        if candidate_ids:
+            self._client.zrem(key, *[str(candidate_id) for candidate_id in candidate_ids])
+
+    def served(self, key):
+        return {int(member) for member in self._client.smembers(key)}
+
+    def delete(self, *keys):
+        self._client.delete(*keys)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_deck_store():
+    """Redis when REDIS_URL is configured, otherwise the in-memory stand-in"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                redis_url = getattr(settings, 'MATCHING_DECK_REDIS_URL', None)
+                if redis_url:
+                    try:
+                        _store = RedisDeckStore(redis_url)
+                    except Exception as e:
+                        logger.error(f"Redis deck store unavailable, using in-memory store: {e}")
+                if _store is None:
+                    _store = InMemoryDeckStore()
+    return _store
+
+
+def get_deck_size():
+    return getattr(settings, 'MATCHING_DECK_SIZE', DEFAULT_DECK_SIZE)
+
+
+def get_deck_ttl():
+    return getattr(settings, 'MATCHING_DECK_TTL', DEFAULT_DECK_TTL)
+
+
+def get_deck_page_ttl():
+    return getattr(settings, 'MATCHING_DECK_PAGE_TTL', DEFAULT_DECK_PAGE_TTL)
+
+
+def build_deck(user):
+    """
+    Materialize the next ranked candidates of `user` into their deck.
+
+    Returns:
+        int: Number of candidates stored
+    """
+    store = get_deck_store()
+    preferences, _ = UserPreference.objects.get_or_create(user=user)
+
+    # Les candidats déjà présentés (mais pas encore swipés) ne reviennent qu'après expiration
+    served = store.served(served_key(user.id))
+
+    if RANKING_AVAILABLE and user_index_enabled():
+        # Filtrage par l'index en mémoire (bitsets d'intérêts compris) : aucun filtrage SQL
+        ids, features = indexed_candidates(
+            user, preferences, exclude=get_seen_filter(user.id),
+            max_candidates=getattr(settings, 'MATCHING_RANKING_MAX_CANDIDATES', DEFAULT_MAX_CANDIDATES)
+        )
+        ranked = rank_features(user, ids, features, preferences, get_viewer_interest_bits(user))
+        scored_ids = [(user_id, score) for user_id, score, _ in ranked if user_id not in served]
+    elif RANKING_AVAILABLE:
+        # Likes, passes et blocages sont exclus par le filtre de profils vus
+        queryset = candidate_queryset(user, preferences, exclude_seen=False)
+        ranked = rank_candidates(user, queryset, preferences, exclude=get_seen_filter(user.id))
+        scored_ids = [(user_id, score) for user_id, score, _ in ranked if user_id not in served]
+    else:
+        queryset = candidate_queryset(user, preferences)
+        ids = queryset.order_by('-is_online', '-last_activity').values_list('id', flat=True)
+        # Sans moteur de classement, le score conserve l'ordre SQL
+        scored_ids = [
+            (user_id, float(-position)) for position, user_id in enumerate(ids) if user_id not in served
+        ]
+
+    # Fusion atomique : un candidat dépilé depuis la lecture de `served` n'est pas remis dans le deck
+    return store.replace(deck_key(user.id), scored_ids[:get_deck_size()], get_deck_ttl(), served_key(user.id))
+
+
+_executor = None
+_inflight = set()
+_inflight_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _inflight_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'MATCHING_DECK_REFILL_WORKERS', 2),
+                    thread_name_prefix='deck-refill'
+                )
+    return _executor
+
+
+def _refill(user_id, in_worker=True):
+    try:
+        if in_worker:
+            close_old_connections()
+        user = User.objects.filter(id=user_id).first()
+        if user:
+            build_deck(user)
+    except Exception as e:
+        logger.error(f"Deck refill failed for user {user_id}: {e}")
+    finally:
+        if in_worker:
+            close_old_connections()
+        with _inflight_lock:
+            _inflight.discard(user_id)
+
+
+def refill_deck_async(user_id):
+    """Schedule a deck rebuild in the background (at most one in flight per user)"""
+    with _inflight_lock:
+        if user_id in _inflight:
+            return False
+        _inflight.add(user_id)
+
+    if not getattr(settings, 'MATCHING_DECK_REFILL_ASYNC', True):
+        _refill(user_id, in_worker=False)
+        return True
+
+    _get_executor().submit(_refill, user_id)
+    return True
+
+
+def pop_deck_page(user, count, cursor=None):
+    """
+    Pop the next `count` candidates of the user's deck.
+
+    A missing deck is built synchronously; a deck running low is refilled
+    in the background. A page popped with a `cursor` is replayed when the
+    same cursor is requested again (retry of the same `next` URL).
+
+    Returns:
+        tuple: (list of (candidate_id, score), remaining deck size)
+    """
+    store = get_deck_store()
+    key = deck_key(user.id)
+    args = (key, served_key(user.id), count, get_deck_ttl(), cursor, get_deck_page_ttl())
+
+    entries = store.pop_page(*args)
+    if not entries:
+        build_deck(user)
+        entries = store.pop_page(*args)
+
+    remaining = store.size(key)
+    if remaining < getattr(settings, 'MATCHING_DECK_LOW_WATERMARK', DEFAULT_DECK_LOW_WATERMARK):
+        refill_deck_async(user.id)
+
+    return entries, remaining
+
+
+def discard_from_deck(user_id, candidate_ids):
+    """Retire des candidats du deck (après un like, un skip ou un blocage)"""
+    get_deck_store().discard(deck_key(user_id), candidate_ids)
+
+
+def invalidate_deck(user_id):
+    """Supprime le deck ; il sera reconstruit à la prochaine requête"""
+    get_deck_store().delete(deck_key(user_id), served_key(user_id))
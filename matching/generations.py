@@ -0,0 +1,80 @@
+# matching/generations.py
+
+import hashlib
+import time
+
+from django.core.cache import cache
+
+# Durée de vie des entrées versionnées : les anciennes générations expirent d'elles-mêmes
+DEFAULT_VERSIONED_TTL = 300
+
+
+def generation_key(user_id):
+    return f"matching_generation:{user_id}"
+
+
+def _initial_generation():
+    """
+    Valeur de départ d'un compteur absent (jamais créé ou évincé du cache).
+
+    Basée sur l'horloge pour qu'un compteur réinitialisé ne retombe jamais
+    sur une génération déjà utilisée par des entrées encore en cache.
+    """
+    return time.time_ns()
+
+
+def read_counter(key):
+    """Valeur d'un compteur de version partagé (créé à la première lecture)"""
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump_counter(key):
+    """Incrément atomique d'un compteur de version partagé"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Compteur absent : toute nouvelle valeur invalide les entrées existantes
+        cache.add(key, _initial_generation(), timeout=None)
+
+
+def get_generation(user_id):
+    """Génération courante des caches de matching de `user_id`"""
+    return read_counter(generation_key(user_id))
+
+
+def bump_generation(*user_ids):
+    """
+    Invalide tous les caches de matching des utilisateurs donnés.
+
+    Un seul INCR atomique par utilisateur ; les entrées de l'ancienne
+    génération ne sont plus jamais lues et expirent naturellement.
+    """
+    for user_id in set(user_ids):
+        bump_counter(generation_key(user_id))
+
+
+def versioned_key(prefix, user_id, params=None):
+    """
+    Clé de cache d'un utilisateur, versionnée par sa génération courante.
+
+    Args:
+        prefix: famille de cache (ex. "potential_matches")
+        user_id: propriétaire du cache
+        params: paramètres optionnels qui font varier le contenu (dict)
+
+    La clé doit être calculée une seule fois, avant de construire la valeur :
+    si une invalidation survient entre-temps, la valeur est écrite sous
+    l'ancienne génération et ne sera jamais relue.
+    """
+    key = f"{prefix}:{user_id}:g{get_generation(user_id)}"
+    if params:
+        digest = hashlib.md5(
+            repr(sorted((str(k), str(v)) for k, v in params.items())).encode()
+        ).hexdigest()[:12]
+        key = f"{key}:{digest}"
+    return key
+
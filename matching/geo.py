@@ -0,0 +1,123 @@
+# matching/geo.py
+
+import logging
+from math import asin, cos, degrees, radians, sin, sqrt
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Cache du test de présence de l'extension earthdistance (par alias de base)
+_earthdistance_available = {}
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers between two points"""
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Compute the latitude/longitude box enclosing a circle.
+
+    Returns:
+        tuple: (min_lat, max_lat, lon_ranges) where lon_ranges is a list of
+        (min_lon, max_lon) pairs; two pairs when the box crosses the antimeridian,
+        None when the circle covers a pole (every longitude matches).
+    """
+    delta_lat = degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, lat - delta_lat)
+    max_lat = min(90.0, lat + delta_lat)
+
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, None
+
+    delta_lon = degrees(asin(min(1.0, sin(radians(delta_lat)) / cos(radians(lat)))))
+    min_lon = lon - delta_lon
+    max_lon = lon + delta_lon
+
+    if min_lon < -180.0:
+        return min_lat, max_lat, [(min_lon + 360.0, 180.0), (-180.0, max_lon)]
+    if max_lon > 180.0:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon - 360.0)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+
+def bounding_box_q(lat, lon, radius_km):
+    """Q object prefiltering users inside the bounding box (served by the lat/lon index)"""
+    min_lat, max_lat, lon_ranges = bounding_box(lat, lon, radius_km)
+    query = Q(latitude__gte=min_lat, latitude__lte=max_lat, longitude__isnull=False)
+    if lon_ranges:
+        lon_query = Q()
+        for min_lon, max_lon in lon_ranges:
+            lon_query |= Q(longitude__gte=min_lon, longitude__lte=max_lon)
+        query &= lon_query
+    return query
+
+
+def haversine_expression(lat, lon):
+    """Portable ORM expression of the haversine distance (km) to (lat, lon)"""
+    dlat = Radians(F('latitude') - Value(lat))
+    dlon = Radians(F('longitude') - Value(lon))
+    a = (
+        Power(Sin(dlat / Value(2.0)), 2)
+        + Value(cos(radians(lat))) * Cos(Radians(F('latitude'))) * Power(Sin(dlon / Value(2.0)), 2)
+    )
+    return ExpressionWrapper(
+        Value(2.0 * EARTH_RADIUS_KM) * ASin(Sqrt(a)),
+        output_field=FloatField()
+    )
+
+
+def has_earthdistance(using=None):
+    """Check (once per connection alias) whether PostgreSQL's earthdistance extension is installed"""
+    conn = connections[using or DEFAULT_DB_ALIAS]
+    if conn.vendor != 'postgresql':
+        return False
+
+    if conn.alias not in _earthdistance_available:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'earthdistance'")
+                _earthdistance_available[conn.alias] = cursor.fetchone() is not None
+        except Exception as e:
+            logger.warning(f"Could not detect earthdistance extension: {e}")
+            _earthdistance_available[conn.alias] = False
+    return _earthdistance_available[conn.alias]
+
+
+def filter_by_distance(queryset, lat, lon, radius_km):
+    """
+    Restrict a user queryset to a radius around (lat, lon), annotated with `distance` (km).
+
+    A bounding box prefilter on the indexed latitude/longitude columns runs first;
+    the exact haversine distance is then only evaluated for the survivors. On
+    PostgreSQL with earthdistance/cube installed, the GiST index on
+    ll_to_earth(latitude, longitude) and earth_distance() are used instead.
+    """
+    if has_earthdistance(queryset.db):
+        table = connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+        point = f'll_to_earth({table}."latitude", {table}."longitude")'
+        queryset = queryset.filter(latitude__isnull=False, longitude__isnull=False).extra(
+            where=[f'earth_box(ll_to_earth(%s, %s), %s) @> {point}'],
+            params=[lat, lon, radius_km * 1000.0],
+        )
+        distance = RawSQL(
+            f'earth_distance(ll_to_earth(%s, %s), {point}) / 1000.0',
+            (lat, lon),
+            output_field=FloatField()
+        )
+    else:
+        queryset = queryset.filter(bounding_box_q(lat, lon, radius_km))
+        distance = haversine_expression(lat, lon)
+
+    return queryset.annotate(distance=distance).filter(distance__lte=radius_km)
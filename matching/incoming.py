@@ -0,0 +1,111 @@
+# matching/incoming.py
+
+"""
+Likes reçus en attente (« qui m'a liké »).
+
+Un like X → Y est en attente tant que Y n'a pas répondu : Y n'a pas liké X
+en retour (sinon c'est un match), ne l'a pas passé, et aucun des deux n'a
+bloqué l'autre. User.incoming_like_count garde le nombre de likes en attente
+de chaque utilisateur : les écritures qui touchent une paire lisent l'état
+de la paire avant et après, dans leur transaction, et appliquent la
+différence. Le badge se lit donc sans COUNT sur la table des likes.
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import UserSkip
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def _pending(likes):
+    """Restreint un queryset de likes (table through) aux likes en attente"""
+    Like = User.liked_users.through
+    Block = User.blocked_users.through
+    return likes.filter(
+        ~Exists(Like.objects.filter(from_user_id=OuterRef('to_user_id'), to_user_id=OuterRef('from_user_id'))),
+        ~Exists(Block.objects.filter(from_user_id=OuterRef('to_user_id'), to_user_id=OuterRef('from_user_id'))),
+        ~Exists(Block.objects.filter(from_user_id=OuterRef('from_user_id'), to_user_id=OuterRef('to_user_id'))),
+        ~Exists(UserSkip.objects.filter(user_id=OuterRef('to_user_id'), skipped_user_id=OuterRef('from_user_id'))),
+    )
+
+
+def pending_likes(user_id):
+    """Likes en attente reçus par un utilisateur (lignes de la table des likes)"""
+    return _pending(User.liked_users.through.objects.filter(to_user_id=user_id))
+
+
+def pending_pairs(user_id, other_ids):
+    """Likes en attente entre `user_id` et `other_ids`, dans les deux sens : {(from_id, to_id)}"""
+    Like = User.liked_users.through
+    if not other_ids:
+        return set()
+    likes = Like.objects.filter(
+        Q(from_user_id=user_id, to_user_id__in=other_ids) | Q(from_user_id__in=other_ids, to_user_id=user_id)
+    )
+    return set(_pending(likes).values_list('from_user_id', 'to_user_id'))
+
+
+def adjust_incoming_counts(before, after):
+    """Applique aux compteurs la différence entre deux états de pending_pairs (une requête par delta)"""
+    deltas = Counter()
+    for _, to_id in after - before:
+        deltas[to_id] += 1
+    for _, to_id in before - after:
+        deltas[to_id] -= 1
+
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        User.objects.filter(id__in=user_ids).update(incoming_like_count=F('incoming_like_count') + delta)
+
+
+@contextmanager
+def tracking_incoming_likes(user_id, other_ids):
+    """
+    Maintient les compteurs autour d'écritures sur les paires (user_id, other_ids).
+
+    À utiliser dans la transaction des écritures. Les lignes des utilisateurs
+    sont verrouillées par id croissant, comme dans like_user, avant de lire
+    l'état des paires : deux écritures concurrentes sur une même paire ne
+    peuvent pas appliquer la même différence.
+    """
+    other_ids = list(other_ids)
+    list(User.objects.select_for_update().filter(id__in=[user_id, *other_ids]).order_by('id').values_list('id'))
+    before = pending_pairs(user_id, other_ids)
+    yield
+    adjust_incoming_counts(before, pending_pairs(user_id, other_ids))
+
+
+def get_incoming_like_count(user_id):
+    """Nombre de likes reçus en attente (lecture du compteur)"""
+    count = User.objects.filter(id=user_id).values_list('incoming_like_count', flat=True).first()
+    return max(count or 0, 0)
+
+
+def recount_incoming_likes(user_ids=None):
+    """
+    Recalcule les compteurs depuis la table des likes (réparation).
+
+    Returns:
+        int: nombre d'utilisateurs mis à jour
+    """
+    counts = (
+        pending_likes(OuterRef('pk'))
+        .order_by()
+        .values('to_user_id')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    users = User.objects.all() if user_ids is None else User.objects.filter(id__in=user_ids)
+    return users.update(incoming_like_count=Coalesce(Subquery(counts), 0))
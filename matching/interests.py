@@ -0,0 +1,252 @@
+# matching/interests.py
+
+"""
+Bitsets d'intérêts.
+
+Les intérêts d'un utilisateur sont dénormalisés dans User.interest_bits :
+le bit n est levé lorsque l'utilisateur a l'intérêt de position n
+(UserInterest.bit, ordinal dense attribué à la création). La largeur des
+bitsets suit donc la taille du catalogue, pas la valeur des ids. La colonne
+est stockée en octets little-endian et convertie en mots uint64 pour les
+calculs vectorisés (intersection par ET binaire, comptage par popcount).
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .generations import bump_counter, read_counter
+from .models import UserInterest, UserInterestRelation
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy est listé dans requirements.txt
+    np = None
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Nombre de bits levés pour chaque octet (popcount sans np.bitwise_count, NumPy < 2)
+_POPCOUNT8 = None
+
+# Version partagée du catalogue d'intérêts (incrémentée à chaque modification)
+CATALOG_VERSION_KEY = 'interest_catalog_version'
+
+_catalog = None
+_catalog_lock = threading.Lock()
+_local = threading.local()
+
+
+def positions_bitset(positions):
+    """Bitset (entier Python) d'une collection de positions de bits"""
+    bits = 0
+    for position in positions:
+        bits |= 1 << int(position)
+    return bits
+
+
+def bitset_positions(bits):
+    """Positions des bits levés d'un bitset"""
+    positions = []
+    position = 0
+    while bits:
+        if bits & 1:
+            positions.append(position)
+        bits >>= 1
+        position += 1
+    return positions
+
+
+def interest_positions(interest_ids=()):
+    """
+    {id d'intérêt: position de bit}, depuis le catalogue en cache.
+
+    Relu en base si un des `interest_ids` n'y figure pas encore (intérêt créé
+    dans la transaction en cours, avant l'invalidation du catalogue).
+    """
+    get_interest_catalog()
+    positions = _catalog[2]
+    if any(int(interest_id) not in positions for interest_id in interest_ids):
+        positions = dict(UserInterest.objects.filter(bit__isnull=False).values_list('id', 'bit'))
+    return positions
+
+
+def interest_bitset(interest_ids):
+    """Bitset (entier Python) d'une collection d'ids d'intérêts ; les ids inconnus sont ignorés"""
+    interest_ids = list(interest_ids)
+    positions = interest_positions(interest_ids)
+    return positions_bitset(positions[int(i)] for i in interest_ids if int(i) in positions)
+
+
+def bitset_to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little') if bits else b''
+
+
+def bytes_to_bitset(data):
+    return int.from_bytes(bytes(data or b''), 'little')
+
+
+def bitset_interest_ids(bits):
+    """Ids d'intérêts d'un bitset, triés"""
+    by_position = {position: interest_id for interest_id, position in interest_positions().items()}
+    return sorted(by_position[position] for position in bitset_positions(bits) if position in by_position)
+
+
+@contextmanager
+def bulk_interest_update():
+    """Suspend la synchronisation par signal ; l'appelant synchronise une seule fois à la fin"""
+    _local.suppressed = True
+    try:
+        yield
+    finally:
+        _local.suppressed = False
+
+
+def interest_sync_suppressed():
+    return getattr(_local, 'suppressed', False)
+
+
+def sync_interest_bits(user_id, interest_ids=None):
+    """
+    Recalcule le bitset d'un utilisateur depuis UserInterestRelation
+    (ou depuis `interest_ids` quand l'appelant connaît déjà l'ensemble final).
+
+    Returns:
+        bytes: bitset enregistré
+    """
+    if interest_ids is None:
+        interest_ids = UserInterestRelation.objects.filter(user_id=user_id).values_list('interest_id', flat=True)
+    data = bitset_to_bytes(interest_bitset(interest_ids))
+    User.objects.filter(id=user_id).update(interest_bits=data)
+
+    from .user_index import sync_user_interests
+    sync_user_interests(user_id, data)
+    return data
+
+
+def word_count(data):
+    """Nombre de mots uint64 nécessaires pour un bitset en octets"""
+    return max(1, (len(data or b'') + 7) // 8)
+
+
+def pack_bitsets(values, width=None):
+    """
+    Convertit des bitsets (octets) en matrice de mots uint64.
+
+    Returns:
+        np.ndarray: forme (len(values), width)
+    """
+    width = width or max((word_count(data) for data in values), default=1)
+    buffer = bytearray(len(values) * width * 8)
+    stride = width * 8
+    for row, data in enumerate(values):
+        data = bytes(data or b'')[:stride]
+        buffer[row * stride:row * stride + len(data)] = data
+    return np.frombuffer(bytes(buffer), dtype='<u8').reshape(len(values), width).astype(np.uint64)
+
+
+def bitset_words(bits, width):
+    """Mots uint64 d'un bitset (entier Python), tronqué ou complété à `width`"""
+    data = (bits & ((1 << (width * 64)) - 1)).to_bytes(width * 8, 'little')
+    return np.frombuffer(data, dtype='<u8').astype(np.uint64)
+
+
+def popcount(words):
+    """Nombre de bits levés par ligne d'une matrice de mots uint64"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1).astype(np.int64)
+
+    global _POPCOUNT8
+    if _POPCOUNT8 is None:
+        _POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    as_bytes = np.ascontiguousarray(words).view(np.uint8).reshape(words.shape[0], -1)
+    return _POPCOUNT8[as_bytes].sum(axis=-1).astype(np.int64)
+
+
+def shared_interest_counts(viewer_bits, words):
+    """Nombre d'intérêts communs entre le bitset du viewer et chaque ligne de `words`"""
+    if not len(words) or not viewer_bits:
+        return np.zeros(len(words), dtype=np.int64)
+    return popcount(words & bitset_words(viewer_bits, words.shape[1]))
+
+
+def jaccard_scores(shared, viewer_count, candidate_counts):
+    """Similarité de Jaccard |A ∩ B| / |A ∪ B| (0 quand les deux ensembles sont vides)"""
+    union = viewer_count + np.asarray(candidate_counts, dtype=float) - shared
+    return np.where(union > 0, shared / np.maximum(union, 1.0), 0.0)
+
+
+def get_interest_catalog():
+    """
+    Catalogue des intérêts, mis en cache dans le processus.
+
+    Une lecture du compteur de version partagé suffit pour savoir si la copie
+    locale est à jour ; elle n'est rechargée qu'après une modification.
+
+    Returns:
+        tuple: ((id, name), ...) triés par id
+    """
+    global _catalog
+    version = read_counter(CATALOG_VERSION_KEY)
+    catalog = _catalog
+    if catalog is not None and catalog[0] == version:
+        return catalog[1]
+
+    with _catalog_lock:
+        if _catalog is None or _catalog[0] != version:
+            rows = UserInterest.objects.order_by('id').values_list('id', 'name', 'bit')
+            _catalog = (
+                version,
+                tuple((interest_id, name) for interest_id, name, _ in rows),
+                {interest_id: bit for interest_id, _, bit in rows if bit is not None},
+            )
+        return _catalog[1]
+
+
+def invalidate_interest_catalog():
+    """Invalide le catalogue de tous les processus, après validation de la transaction"""
+    transaction.on_commit(lambda: bump_counter(CATALOG_VERSION_KEY))
+
+
+def set_user_interests(user_id, interest_ids):
+    """
+    Remplace les intérêts d'un utilisateur par un diff, dans une transaction.
+
+    Une lecture des relations actuelles, un bulk_create des ajouts, une
+    suppression des retraits et une mise à jour du bitset. Les ids inconnus
+    du catalogue sont ignorés.
+
+    Returns:
+        bool: True si les intérêts ont changé
+    """
+    catalog_ids = {interest_id for interest_id, _ in get_interest_catalog()}
+    requested = set()
+    for interest_id in interest_ids:
+        try:
+            requested.add(int(interest_id))
+        except (TypeError, ValueError):
+            continue
+    requested &= catalog_ids
+
+    with transaction.atomic(), bulk_interest_update():
+        current = set(
+            UserInterestRelation.objects.filter(user_id=user_id).values_list('interest_id', flat=True)
+        )
+        to_add = requested - current
+        to_remove = current - requested
+        if not to_add and not to_remove:
+            return False
+
+        if to_remove:
+            UserInterestRelation.objects.filter(user_id=user_id, interest_id__in=to_remove).delete()
+        if to_add:
+            UserInterestRelation.objects.bulk_create(
+                [UserInterestRelation(user_id=user_id, interest_id=interest_id) for interest_id in to_add],
+                ignore_conflicts=True
+            )
+        sync_interest_bits(user_id, requested)
+    return True
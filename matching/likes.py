@@ -0,0 +1,246 @@
+# matching/likes.py
+
+"""
+Pipeline du like.
+
+Tout ce qui décide du résultat tient dans une transaction au nombre de
+requêtes constant :
+
+1. verrou des deux lignes utilisateur (dans l'ordre des ids, sans risque
+   d'interblocage) et contrôles « déjà liké » / « bloqué » dans la même requête ;
+2. insertion du like (ON CONFLICT DO NOTHING) ;
+3. like réciproque et match existant, relus après la prise du verrou ;
+4. création ou réactivation du match, uniquement si le like est réciproque ;
+5. mise à jour des compteurs de likes reçus (voir incoming.py).
+
+Le verrou sérialise les likes croisés d'une même paire : deux likes
+simultanés A→B et B→A ne peuvent plus manquer le match. Les notifications
+WebSocket et la conversation sont envoyées après validation, hors du chemin
+de la requête.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from conversations.notifications import build_notification, send_notifications
+from .deck import discard_from_deck
+from .generations import bump_generation
+from .incoming import adjust_incoming_counts, pending_pairs
+from .match_edges import set_matches_active
+from .models import Match
+from .seen import record_seen
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+LIKED = 'liked'
+ALREADY_LIKED = 'already_liked'
+BLOCKED = 'blocked'
+NOT_FOUND = 'not_found'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class LikeResult:
+    """Résultat du pipeline : statut, utilisateur liké et match éventuel"""
+
+    def __init__(self, status, liked_user=None, match=None, created=False):
+        self.status = status
+        self.liked_user = liked_user
+        self.match = match
+        self.created = created
+
+    @property
+    def is_match(self):
+        return self.match is not None
+
+
+def match_notification(user_id, match_data):
+    """Message de groupe du match (format attendu par le consumer `match_notification`)"""
+    return f'user_{user_id}_notifications', {
+        'type': 'match_notification',
+        'data': {
+            'type': 'new_match',
+            'match': match_data
+        }
+    }
+
+
+def send_match_notification(user_id, match_data):
+    """Send WebSocket notification for new match"""
+    send_notifications([match_notification(user_id, match_data)])
+
+
+def create_conversation_for_match(user1, user2):
+    """Create a conversation when users match"""
+    from conversations.models import Conversation, Message
+
+    # Check if conversation already exists
+    existing_conversation = Conversation.objects.filter(
+        participants=user1
+    ).filter(
+        participants=user2
+    ).first()
+
+    if existing_conversation:
+        return existing_conversation
+
+    # Create new conversation
+    with transaction.atomic():
+        conversation = Conversation.objects.create()
+        conversation.participants.add(user1, user2)
+
+        # Create initial welcome message
+        Message.objects.create(
+            conversation=conversation,
+            sender=user1,  # Or could be system user
+            content="Vous avez matché! Commencez la conversation."
+        )
+
+    return conversation
+
+
+def like_user(user, liked_user_id):
+    """
+    Enregistre le like de `user` pour `liked_user_id` et crée le match s'il est réciproque.
+
+    Returns:
+        LikeResult
+    """
+    Like = User.liked_users.through
+    Block = User.blocked_users.through
+    user1_id, user2_id = sorted((user.id, liked_user_id))
+    started_at = timezone.now()
+
+    with transaction.atomic():
+        rows = (
+            User.objects.select_for_update()
+            .filter(id__in=(user.id, liked_user_id))
+            .order_by('id')
+            .annotate(
+                already_liked=Exists(Like.objects.filter(from_user_id=user.id, to_user_id=OuterRef('pk'))),
+                is_blocked=Exists(Block.objects.filter(from_user_id=user.id, to_user_id=OuterRef('pk'))),
+            )
+        )
+        liked_user = next((row for row in rows if row.id == liked_user_id), None)
+        if liked_user is None:
+            return LikeResult(NOT_FOUND)
+        if liked_user.already_liked:
+            return LikeResult(ALREADY_LIKED, liked_user)
+        if liked_user.is_blocked:
+            return LikeResult(BLOCKED, liked_user)
+
+        pending_before = pending_pairs(user.id, [liked_user_id])
+        Like.objects.bulk_create([Like(from_user_id=user.id, to_user_id=liked_user_id)], ignore_conflicts=True)
+
+        # Nouvelle requête, donc nouvel instantané : le like croisé validé pendant
+        # l'attente du verrou est visible
+        pair = Match.objects.filter(user1_id=user1_id, user2_id=user2_id)
+        state = User.objects.filter(id=liked_user_id).annotate(
+            likes_back=Exists(Like.objects.filter(from_user_id=liked_user_id, to_user_id=user.id)),
+            match_id=Subquery(pair.values('id')[:1]),
+            match_active=Subquery(pair.values('is_active')[:1]),
+            match_created_at=Subquery(pair.values('created_at')[:1]),
+        ).values('likes_back', 'match_id', 'match_active', 'match_created_at').get()
+
+        match = None
+        created = False
+        if state['likes_back']:
+            if state['match_id'] is None:
+                match = Match.objects.create(user1_id=user1_id, user2_id=user2_id, is_active=True)
+                created = True
+            else:
+                if not state['match_active']:
+                    set_matches_active([state['match_id']], True)
+                match = Match(
+                    id=state['match_id'], user1_id=user1_id, user2_id=user2_id,
+                    created_at=state['match_created_at'], is_active=True
+                )
+                created = state['match_created_at'] >= started_at
+            match.user1, match.user2 = (user, liked_user) if user.id == user1_id else (liked_user, user)
+
+        adjust_incoming_counts(pending_before, pending_pairs(user.id, [liked_user_id]))
+
+    # Caches du matching : immédiatement, pour que la requête suivante ne revoie pas le profil
+    record_seen(user.id, [liked_user_id])
+    if match is not None:
+        bump_generation(user.id, liked_user_id)
+    else:
+        bump_generation(user.id)
+    discard_from_deck(user.id, [liked_user_id])
+
+    transaction.on_commit(lambda: dispatch_side_effects(_notify_like, user, liked_user, match, created))
+    return LikeResult(LIKED, liked_user, match, created)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'MATCHING_LIKE_SIDE_EFFECTS_WORKERS', 4),
+                    thread_name_prefix='like-side-effects'
+                )
+    return _executor
+
+
+def _run(func, args, in_worker):
+    try:
+        if in_worker:
+            close_old_connections()
+        func(*args)
+    except Exception as e:
+        logger.error(f"Like side effect {func.__name__} failed: {e}")
+    finally:
+        if in_worker:
+            close_old_connections()
+
+
+def dispatch_side_effects(func, *args):
+    """Exécute `func` dans le pool des effets de bord (ou tout de suite si désactivé)"""
+    if not getattr(settings, 'MATCHING_LIKE_SIDE_EFFECTS_ASYNC', True):
+        _run(func, args, in_worker=False)
+        return
+    _get_executor().submit(_run, func, args, True)
+
+
+def _user_summary(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'profile_picture': user.get_profile_picture_url()
+    }
+
+
+def like_notifications(user, liked_user, match=None, created=False):
+    """Messages de groupe d'un like et, en cas de match, du match pour les deux utilisateurs"""
+    messages = [build_notification(liked_user.id, 'new_like', liker=_user_summary(user))]
+    if match is None:
+        return messages
+
+    match_data = {
+        'id': match.id,
+        'user': _user_summary(user),
+        'created_at': match.created_at.isoformat() if created else timezone.now().isoformat()
+    }
+    messages.append(build_notification(liked_user.id, 'new_match', match=match_data))
+    messages.append(match_notification(liked_user.id, match_data))
+    messages.append(match_notification(user.id, {**match_data, 'user': _user_summary(liked_user)}))
+    return messages
+
+
+def _notify_like(user, liked_user, match, created):
+    """Conversation du match puis notifications, en une seule publication"""
+    if match is not None:
+        create_conversation_for_match(user, liked_user)
+    send_notifications(like_notifications(user, liked_user, match, created))
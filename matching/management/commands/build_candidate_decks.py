@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from matching.candidates import ACTIVE_WINDOW_DAYS
+from matching.deck import build_deck
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Materialize the ranked candidate deck of active users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='Only rebuild the deck of this user'
+        )
+        parser.add_argument(
+            '--active-days',
+            type=int,
+            default=ACTIVE_WINDOW_DAYS,
+            help='Only rebuild decks of users active within this many days (default: %(default)s)'
+        )
+
+    def handle(self, *args, **options):
+        if options['user_id']:
+            users = User.objects.filter(id=options['user_id'])
+        else:
+            threshold = timezone.now() - timedelta(days=options['active_days'])
+            users = User.objects.filter(
+                Q(last_activity__gte=threshold) | Q(is_online=True),
+                is_active=True
+            )
+
+        built = 0
+        candidates = 0
+        for user in users.iterator():
+            try:
+                candidates += build_deck(user)
+                built += 1
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Deck build failed for user {user.id}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {built} deck(s) with {candidates} candidate(s) in total'
+        ))
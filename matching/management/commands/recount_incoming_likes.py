@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from matching.incoming import recount_incoming_likes
+
+
+class Command(BaseCommand):
+    help = 'Recompute the pending incoming-like counters from the likes table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            action='append',
+            help='Only recount this user (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        updated = recount_incoming_likes(options['user_id'])
+        self.stdout.write(self.style.SUCCESS(f'Recounted incoming likes of {updated} user(s)'))
@@ -0,0 +1,102 @@
+# matching/match_edges.py
+
+"""
+Table d'arêtes des matchs.
+
+Chaque Match (user1 < user2) a deux MatchEdge, une par utilisateur :
+(owner, other_user, match, created_at, is_active). Les lectures partent de
+owner et suivent l'index (owner, is_active, -created_at) ; l'unicité
+(owner, other_user) sert le test « sont-ils matchés ? ».
+
+Les écritures de Match passent par ce module, dans la transaction de
+l'appelant, pour que les arêtes suivent : create_match_edges après un
+bulk_create, set_matches_active pour (dés)activer. Les save() unitaires
+(admin, scripts) sont suivis par signal.
+"""
+
+import logging
+
+from django.db import transaction
+
+from .models import Match, MatchEdge
+
+logger = logging.getLogger(__name__)
+
+
+def _edges(match):
+    return [
+        MatchEdge(
+            owner_id=owner_id, other_user_id=other_id, match_id=match.id,
+            created_at=match.created_at, is_active=match.is_active
+        )
+        for owner_id, other_id in ((match.user1_id, match.user2_id), (match.user2_id, match.user1_id))
+    ]
+
+
+def create_match_edges(matches):
+    """Crée les arêtes de matchs nouvellement insérés (une requête)"""
+    edges = [edge for match in matches for edge in _edges(match)]
+    if edges:
+        MatchEdge.objects.bulk_create(edges, ignore_conflicts=True)
+
+
+def set_matches_active(match_ids, is_active):
+    """(Dés)active des matchs et leurs arêtes"""
+    match_ids = list(match_ids)
+    if not match_ids:
+        return 0
+    with transaction.atomic():
+        updated = Match.objects.filter(id__in=match_ids).update(is_active=is_active)
+        MatchEdge.objects.filter(match_id__in=match_ids).update(is_active=is_active)
+    return updated
+
+
+def deactivate_matches_with(user_id, other_ids):
+    """Désactive les matchs actifs entre `user_id` et `other_ids` (lecture par l'index des arêtes)"""
+    match_ids = list(
+        MatchEdge.objects.filter(owner_id=user_id, other_user_id__in=list(other_ids), is_active=True)
+        .values_list('match_id', flat=True)
+    )
+    return set_matches_active(match_ids, False)
+
+
+def match_edges(user_id, active=True):
+    """Arêtes des matchs d'un utilisateur, du plus récent au plus ancien"""
+    edges = MatchEdge.objects.filter(owner_id=user_id)
+    if active is not None:
+        edges = edges.filter(is_active=active)
+    return edges.order_by('-created_at')
+
+
+def is_matched(user_id, other_id):
+    return MatchEdge.objects.filter(owner_id=user_id, other_user_id=other_id, is_active=True).exists()
+
+
+def sync_match_edges(match, created=False):
+    """Reporte un save() de Match sur ses arêtes"""
+    if created:
+        create_match_edges([match])
+    else:
+        MatchEdge.objects.filter(match_id=match.id).update(is_active=match.is_active)
+
+
+def rebuild_match_edges():
+    """
+    Reconstruit toute la table depuis Match (réparation).
+
+    Returns:
+        int: nombre d'arêtes créées
+    """
+    with transaction.atomic():
+        MatchEdge.objects.all().delete()
+        created = 0
+        batch = []
+        for match in Match.objects.only('id', 'user1_id', 'user2_id', 'created_at', 'is_active').iterator():
+            batch.append(match)
+            if len(batch) >= 1000:
+                create_match_edges(batch)
+                created += 2 * len(batch)
+                batch = []
+        create_match_edges(batch)
+        created += 2 * len(batch)
+    return created
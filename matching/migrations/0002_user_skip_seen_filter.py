@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('matching', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSeenFilter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bits', models.BinaryField()),
+                ('num_bits', models.PositiveIntegerField()),
+                ('num_hashes', models.PositiveSmallIntegerField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seen_filter', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserSkip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('skipped_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skipped_by', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skips', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'skipped_user')},
+            },
+        ),
+    ]
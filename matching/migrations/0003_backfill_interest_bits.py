@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def backfill_interest_bits(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserInterestRelation = apps.get_model('matching', 'UserInterestRelation')
+
+    bits = {}
+    for user_id, interest_id in UserInterestRelation.objects.values_list('user_id', 'interest_id').iterator():
+        bits[user_id] = bits.get(user_id, 0) | (1 << interest_id)
+
+    for user_id, value in bits.items():
+        User.objects.filter(id=user_id).update(
+            interest_bits=value.to_bytes((value.bit_length() + 7) // 8, 'little')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_user_interest_bits'),
+        ('matching', '0002_user_skip_seen_filter'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_interest_bits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_incoming_like_count(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserSkip = apps.get_model('matching', 'UserSkip')
+    Like = User.liked_users.through
+    Block = User.blocked_users.through
+
+    pending = Like.objects.filter(
+        ~Exists(Like.objects.filter(from_user_id=OuterRef('to_user_id'), to_user_id=OuterRef('from_user_id'))),
+        ~Exists(Block.objects.filter(from_user_id=OuterRef('to_user_id'), to_user_id=OuterRef('from_user_id'))),
+        ~Exists(Block.objects.filter(from_user_id=OuterRef('from_user_id'), to_user_id=OuterRef('to_user_id'))),
+        ~Exists(UserSkip.objects.filter(user_id=OuterRef('to_user_id'), skipped_user_id=OuterRef('from_user_id'))),
+        to_user_id=OuterRef('pk'),
+    )
+    counts = pending.order_by().values('to_user_id').annotate(count=Count('id')).values('count')
+    User.objects.update(incoming_like_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_user_incoming_like_count'),
+        ('matching', '0003_backfill_interest_bits'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_incoming_like_count, migrations.RunPython.noop),
+    ]
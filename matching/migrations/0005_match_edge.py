@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_match_edges(apps, schema_editor):
+    Match = apps.get_model('matching', 'Match')
+    MatchEdge = apps.get_model('matching', 'MatchEdge')
+
+    batch = []
+    for match in Match.objects.values('id', 'user1_id', 'user2_id', 'created_at', 'is_active').iterator():
+        for owner_id, other_id in ((match['user1_id'], match['user2_id']), (match['user2_id'], match['user1_id'])):
+            batch.append(MatchEdge(
+                owner_id=owner_id, other_user_id=other_id, match_id=match['id'],
+                created_at=match['created_at'], is_active=match['is_active']
+            ))
+        if len(batch) >= 2000:
+            MatchEdge.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    MatchEdge.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('matching', '0004_backfill_incoming_like_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='matching.match')),
+                ('other_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_edges', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'is_active', '-created_at'], name='match_edge_owner_idx')],
+                'unique_together': {('owner', 'other_user')},
+            },
+        ),
+        migrations.RunPython(backfill_match_edges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+def assign_interest_bits(apps, schema_editor):
+    """Ordinaux denses par id croissant, puis bitsets des utilisateurs recalculés avec ces positions"""
+    User = apps.get_model('accounts', 'User')
+    UserInterest = apps.get_model('matching', 'UserInterest')
+    UserInterestRelation = apps.get_model('matching', 'UserInterestRelation')
+
+    positions = {}
+    for position, interest_id in enumerate(UserInterest.objects.order_by('id').values_list('id', flat=True)):
+        UserInterest.objects.filter(id=interest_id).update(bit=position)
+        positions[interest_id] = position
+
+    bits = {}
+    for user_id, interest_id in UserInterestRelation.objects.values_list('user_id', 'interest_id').iterator():
+        bits[user_id] = bits.get(user_id, 0) | (1 << positions[interest_id])
+
+    User.objects.exclude(interest_bits=b'').update(interest_bits=b'')
+    for user_id, value in bits.items():
+        User.objects.filter(id=user_id).update(
+            interest_bits=value.to_bytes((value.bit_length() + 7) // 8, 'little')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0005_match_edge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinterest',
+            name='bit',
+            field=models.PositiveIntegerField(editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(assign_interest_bits, migrations.RunPython.noop),
+    ]
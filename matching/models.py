@@ -1,6 +1,6 @@
 # matching/models.py
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 
 class UserPreference(models.Model):
@@ -30,6 +30,29 @@ class UserInterest(models.Model):
     """Intérêts des utilisateurs pour le matching"""
     
     name = models.CharField(max_length=50, unique=True)
+    # Position de l'intérêt dans User.interest_bits : ordinal dense attribué à la création
+    bit = models.PositiveIntegerField(unique=True, null=True, editable=False)
+    
+    # Tentatives d'attribution du bit quand des créations concurrentes prennent le même
+    BIT_ALLOCATION_ATTEMPTS = 5
+    
+    def save(self, *args, **kwargs):
+        if self.bit is not None:
+            return super().save(*args, **kwargs)
+        for attempt in range(self.BIT_ALLOCATION_ATTEMPTS):
+            last = UserInterest.objects.aggregate(last=models.Max('bit'))['last']
+            self.bit = 0 if last is None else last + 1
+            try:
+                # Point de sauvegarde : l'échec n'annule pas la transaction appelante
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Bit pris entre-temps par une autre création : on relit le maximum.
+                # Toute autre violation (nom déjà pris) est propagée.
+                taken = UserInterest.objects.filter(bit=self.bit).exclude(pk=self.pk).exists()
+                self.bit = None
+                if not taken or attempt == self.BIT_ALLOCATION_ATTEMPTS - 1:
+                    raise
     
     def __str__(self):
         return self.name
@@ -58,4 +81,54 @@ class Match(models.Model):
         unique_together = ('user1', 'user2')
     
     def __str__(self):
-        return f"Match entre {self.user1.username} et {self.user2.username}"
\ No newline at end of file
+        return f"Match entre {self.user1.username} et {self.user2.username}"
+
+class MatchEdge(models.Model):
+    """
+    Match vu par l'un des deux utilisateurs (deux lignes par match, voir matching/match_edges.py)
+    
+    Les listes de matchs et le test « sont-ils matchés ? » deviennent des
+    parcours d'index sur owner, sans OR entre user1 et user2.
+    """
+    
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='match_edges')
+    other_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='edges')
+    created_at = models.DateTimeField()
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        unique_together = ('owner', 'other_user')
+        indexes = [
+            models.Index(fields=['owner', 'is_active', '-created_at'], name='match_edge_owner_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Match {self.match_id} de {self.owner_id} avec {self.other_user_id}"
+
+class UserSkip(models.Model):
+    """Profils passés par un utilisateur (ils ne sont plus proposés)"""
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='skips')
+    skipped_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='skipped_by')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('user', 'skipped_user')
+    
+    def __str__(self):
+        return f"{self.user.username} a passé {self.skipped_user.username}"
+
+class UserSeenFilter(models.Model):
+    """Filtre de Bloom persistant des profils déjà likés, passés ou bloqués (voir matching/seen.py)"""
+    
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='seen_filter')
+    bits = models.BinaryField()
+    num_bits = models.PositiveIntegerField()
+    num_hashes = models.PositiveSmallIntegerField()
+    capacity = models.PositiveIntegerField()
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Filtre de {self.user.username} ({self.item_count}/{self.capacity})"
@@ -0,0 +1,234 @@
+# matching/presign.py
+
+"""
+Signature des URLs des photos de profil.
+
+Un seul signataire par processus : un client S3 (construit une fois, pool de
+connexions partagé) et un cache des URLs signées par clé d'objet. Une URL
+déjà signée est resservie telle quelle tant qu'il lui reste plus de
+MATCHING_PRESIGNED_URL_REFRESH_MARGIN secondes de validité ; les clients et
+le CDN voient donc la même URL d'une requête à l'autre et peuvent la
+mettre en cache.
+
+Les photos traitées existent en plusieurs tailles et formats
+(accounts/renditions.py) : l'appelant choisit la rendition d'après l'indice
+?img_w= du client ou la taille par défaut de l'endpoint.
+
+Le cache a deux niveaux : un LRU en mémoire du processus, puis le cache
+Django (partagé entre les workers quand il est dans Redis) pour que tous les
+workers servent la même URL.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.renditions import DEFAULT_FORMAT, RENDITION_FORMATS, rendition_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+DEFAULT_REFRESH_MARGIN = 600
+DEFAULT_CACHE_SIZE = 50000
+
+CACHE_KEY_PREFIX = 'presigned_url'
+
+
+# Préfixe des photos envoyées par l'application (upload_to de User.profile_picture)
+UPLOAD_PREFIX = 'profile_pictures/'
+
+
+def profile_object_key(key):
+    """Clé S3 d'une photo de profil (les photos importées sont rangées sous profil/)"""
+    key = str(key)
+    if key.startswith(UPLOAD_PREFIX):
+        return key
+    return f"profil/{key.split('/')[-1]}"
+
+
+def requested_rendition(request, default_width=None):
+    """
+    Rendition demandée par le client : (largeur, format).
+
+    ?img_w= est la largeur d'affichage en pixels physiques, ?img_fmt=webp
+    demande du WebP ; sans indice, la largeur par défaut de l'endpoint.
+    """
+    params = getattr(request, 'query_params', None) or getattr(request, 'GET', {})
+    hint = params.get('img_w', '')
+    width = int(hint) if hint.isdigit() and int(hint) > 0 else default_width
+    ext = params.get('img_fmt', DEFAULT_FORMAT)
+    return width, ext if ext in RENDITION_FORMATS else DEFAULT_FORMAT
+
+
+class PresignedURLSigner:
+    """Client S3 partagé et cache {clé d'objet: (URL, expiration)}"""
+
+    timer = time.time
+
+    def __init__(self, bucket=None, region=None, ttl=None, refresh_margin=None, cache_size=None,
+                 access_key=None, secret_key=None):
+        self.bucket = bucket or settings.AWS_STORAGE_BUCKET_NAME
+        self.region = region or getattr(settings, 'AWS_S3_REGION_NAME', 'us-west-2') or 'us-west-2'
+        self.ttl = ttl or getattr(settings, 'MATCHING_PRESIGNED_URL_TTL', DEFAULT_TTL)
+        self.refresh_margin = (
+            refresh_margin if refresh_margin is not None
+            else getattr(settings, 'MATCHING_PRESIGNED_URL_REFRESH_MARGIN', DEFAULT_REFRESH_MARGIN)
+        )
+        self.cache_size = cache_size or getattr(settings, 'MATCHING_PRESIGNED_URL_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+        self.access_key = access_key or os.environ.get('AWS_ACCESS_KEY_ID')
+        self.secret_key = secret_key or os.environ.get('AWS_SECRET_ACCESS_KEY')
+        self._client = None
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        's3',
+                        region_name=self.region,
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key,
+                        endpoint_url=f'https://s3.{self.region}.amazonaws.com',
+                        config=Config(
+                            signature_version='s3v4',
+                            s3={'addressing_style': 'path'},
+                            read_timeout=10,
+                            connect_timeout=10,
+                            retries={'max_attempts': 2},
+                            max_pool_connections=getattr(settings, 'AWS_S3_MAX_POOL_CONNECTIONS', 50),
+                        )
+                    )
+        return self._client
+
+    def _fresh(self, entry, now):
+        return entry is not None and entry[1] - now > self.refresh_margin
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._urls[key] = entry
+            self._urls.move_to_end(key)
+            while len(self._urls) > self.cache_size:
+                self._urls.popitem(last=False)
+
+    def _touch(self, keys):
+        """Les URLs servies depuis le cache passent en tête de la LRU"""
+        with self._lock:
+            for key in keys:
+                if key in self._urls:
+                    self._urls.move_to_end(key)
+
+    def _sign(self, key, now):
+        url = self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': profile_object_key(key)},
+            ExpiresIn=self.ttl,
+        )
+        return url, now + self.ttl
+
+    def sign_many(self, keys):
+        """
+        URLs signées d'un lot de photos.
+
+        Returns:
+            dict: {clé d'origine: URL signée, l'URL telle quelle si elle est déjà absolue, ou None}
+        """
+        now = self.timer()
+        urls = {}
+        hits = []
+        missing = []
+        for key in keys:
+            if not key:
+                urls[key] = None
+            elif isinstance(key, str) and key.startswith('http'):
+                urls[key] = key
+            else:
+                entry = self._urls.get(key)
+                if self._fresh(entry, now):
+                    urls[key] = entry[0]
+                    hits.append(key)
+                else:
+                    missing.append(key)
+        if hits:
+            self._touch(hits)
+        if not missing:
+            return urls
+
+        cache_keys = {f'{CACHE_KEY_PREFIX}:{self.bucket}:{key}': key for key in missing}
+        try:
+            shared = cache.get_many(list(cache_keys))
+        except Exception as e:
+            logger.error(f"Presigned URL cache unavailable: {e}")
+            shared = {}
+
+        to_share = {}
+        for cache_key, key in cache_keys.items():
+            entry = shared.get(cache_key)
+            if not self._fresh(entry, now):
+                try:
+                    entry = self._sign(key, now)
+                except Exception as e:
+                    logger.error(f"S3 presigned URL error for {key}: {e}")
+                    urls[key] = None
+                    continue
+                to_share[cache_key] = entry
+            self._remember(key, entry)
+            urls[key] = entry[0]
+
+        if to_share:
+            try:
+                cache.set_many(to_share, timeout=max(int(self.ttl - self.refresh_margin), 1))
+            except Exception as e:
+                logger.error(f"Presigned URL cache unavailable: {e}")
+        return urls
+
+    def sign(self, key):
+        return self.sign_many([key])[key]
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+
+
+_signer = None
+_signer_lock = threading.Lock()
+
+
+def get_signer():
+    """Signataire du processus (construit au premier appel)"""
+    global _signer
+    if _signer is None:
+        with _signer_lock:
+            if _signer is None:
+                _signer = PresignedURLSigner()
+    return _signer
+
+
+def build_presigned_urls(keys, rendition=None):
+    """
+    Signe un lot de photos de profil (voir PresignedURLSigner.sign_many).
+
+    Args:
+        rendition: (largeur, format) de requested_rendition ; None pour la taille d'origine
+
+    Returns:
+        dict: {clé enregistrée: URL de la rendition}
+    """
+    width, ext = rendition or (None, DEFAULT_FORMAT)
+    keys = {key: rendition_key(key, width, ext) for key in keys}
+    urls = get_signer().sign_many(set(keys.values()))
+    return {key: urls[signed_key] for key, signed_key in keys.items()}
+
+
+def presigned_url(key, rendition=None):
+    return build_presigned_urls([key], rendition)[key]
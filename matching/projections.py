@@ -0,0 +1,145 @@
+# matching/projections.py
+
+"""
+Lecture compacte des listes de matchs.
+
+Les listes de matchs n'ont besoin que de quelques colonnes : les arêtes des
+matchs (MatchEdge) et les profils sont lus par projection values(), les
+intérêts de tous les profils en une requête, les URLs des photos en un seul
+lot, et la réponse est construite en dicts sans passer par les serializers
+DRF. Le format est celui de MatchSerializer / MatchUserSerializer.
+"""
+
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+
+from .geo import haversine_km
+from .models import UserInterestRelation
+from .presign import build_presigned_urls
+
+User = get_user_model()
+
+# Colonnes lues sur MatchEdge (une ligne par match et par utilisateur)
+EDGE_FIELDS = ('match_id', 'created_at', 'is_active', 'other_user_id')
+
+MATCH_USER_FIELDS = (
+    'id', 'username', 'first_name', 'last_name', 'profile_picture',
+    'profile_picture_placeholder', 'profile_picture_color', 'bio', 'location',
+    'is_online', 'last_activity', 'date_of_birth', 'latitude', 'longitude',
+)
+
+# Format de date des serializers DRF (ISO 8601, fuseau courant)
+_datetime_field = serializers.DateTimeField()
+
+
+def _format_datetime(value):
+    return _datetime_field.to_representation(value) if value is not None else None
+
+
+def _age(born, today):
+    if not born:
+        return None
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def load_match_users(user_ids, rendition=None):
+    """
+    Profils, intérêts et URLs des photos d'un lot d'utilisateurs (trois accès au plus).
+
+    Args:
+        rendition: (largeur, format) des photos, voir presign.requested_rendition
+
+    Returns:
+        tuple: ({id: ligne values()}, {id: [noms d'intérêts]}, {clé photo: URL})
+    """
+    user_ids = list(user_ids)
+    users = {row['id']: row for row in User.objects.filter(id__in=user_ids).values(*MATCH_USER_FIELDS)}
+
+    interests = {user_id: [] for user_id in users}
+    for user_id, name in (
+        UserInterestRelation.objects.filter(user_id__in=user_ids)
+        .order_by('id')
+        .values_list('user_id', 'interest__name')
+    ):
+        interests[user_id].append(name)
+
+    urls = build_presigned_urls({row['profile_picture'] for row in users.values()}, rendition)
+    return users, interests, urls
+
+
+def match_user_dict(row, interests, urls, viewer=None, today=None):
+    """Profil au format MatchUserSerializer à partir d'une ligne values()"""
+    distance = None
+    if (viewer is not None and viewer.latitude is not None and viewer.longitude is not None
+            and row['latitude'] is not None and row['longitude'] is not None):
+        distance = round(haversine_km(viewer.latitude, viewer.longitude, row['latitude'], row['longitude']), 1)
+    return {
+        'id': row['id'],
+        'username': row['username'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'profile_picture': urls.get(row['profile_picture']),
+        'profile_picture_placeholder': row['profile_picture_placeholder'],
+        'profile_picture_color': row['profile_picture_color'],
+        'bio': row['bio'],
+        'location': row['location'],
+        'is_online': row['is_online'],
+        'last_activity': _format_datetime(row['last_activity']),
+        'interests': interests.get(row['id'], []),
+        'age': _age(row['date_of_birth'], today or date.today()),
+        'distance': distance,
+    }
+
+
+def build_match_list(viewer, edge_rows, rendition=None):
+    """
+    Liste de matchs au format MatchSerializer.
+
+    Args:
+        edge_rows: lignes values(*EDGE_FIELDS) des arêtes de `viewer`
+    """
+    edge_rows = list(edge_rows)
+    users, interests, urls = load_match_users({row['other_user_id'] for row in edge_rows}, rendition)
+    today = date.today()
+
+    data = []
+    for row in edge_rows:
+        other = users.get(row['other_user_id'])
+        data.append({
+            'id': row['match_id'],
+            'created_at': _format_datetime(row['created_at']),
+            'is_active': row['is_active'],
+            'matched_user': match_user_dict(other, interests, urls, viewer, today) if other else None,
+        })
+    return data
+
+
+def build_recent_match_list(viewer, edge_rows, rendition=None):
+    """Liste de matchs récents au format de RecentMatchesView (profil à plat + date du match)"""
+    edge_rows = list(edge_rows)
+    users, interests, urls = load_match_users({row['other_user_id'] for row in edge_rows}, rendition)
+
+    data = []
+    for row in edge_rows:
+        other = users.get(row['other_user_id'])
+        if other is None:
+            continue
+        data.append({
+            'id': other['id'],
+            'username': other['username'],
+            'first_name': other['first_name'],
+            'last_name': other['last_name'],
+            'profile_picture': urls.get(other['profile_picture']),
+            'profile_picture_placeholder': other['profile_picture_placeholder'],
+            'profile_picture_color': other['profile_picture_color'],
+            'bio': other['bio'],
+            'location': other['location'],
+            'is_online': other['is_online'],
+            'last_activity': other['last_activity'].isoformat() if other['last_activity'] else None,
+            'interests': interests.get(other['id'], []),
+            'distance': 0.0,  # Would need geolocation calculation
+            'match_created_at': row['created_at'].isoformat(),
+        })
+    return data
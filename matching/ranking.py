@@ -0,0 +1,240 @@
+# matching/ranking.py
+
+import logging
+from datetime import date
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .geo import EARTH_RADIUS_KM
+from .interests import interest_bitset, jaccard_scores, pack_bitsets, popcount, shared_interest_counts
+from .models import UserInterestRelation
+
+try:
+    import numpy as np
+    RANKING_AVAILABLE = True
+except ImportError:  # pragma: no cover - numpy est listé dans requirements.txt
+    np = None
+    RANKING_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Poids par défaut des signaux de classement (surchargeables via settings.MATCHING_RANKING_WEIGHTS)
+DEFAULT_RANKING_WEIGHTS = {
+    'distance': 0.30,
+    'interests': 0.25,
+    'recency': 0.20,
+    'age_fit': 0.15,
+    'online': 0.10,
+}
+
+# Nombre maximum de candidats classés par requête
+DEFAULT_MAX_CANDIDATES = 5000
+
+# Lignes lues par lot quand les profils déjà vus sont filtrés à la lecture
+FETCH_CHUNK_SIZE = 2000
+
+# Demi-vie (en heures) du signal de fraîcheur d'activité
+RECENCY_HALF_LIFE_HOURS = 72.0
+
+# Au-delà de la tranche d'âge souhaitée, le score décroît linéairement sur ce nombre d'années
+AGE_TOLERANCE_YEARS = 5.0
+
+
+def get_ranking_weights():
+    """Return the configured ranking weights, merged over the defaults"""
+    weights = dict(DEFAULT_RANKING_WEIGHTS)
+    weights.update(getattr(settings, 'MATCHING_RANKING_WEIGHTS', {}) or {})
+    return weights
+
+
+def haversine_km_array(lat, lon, latitudes, longitudes):
+    """Vectorized great-circle distances (km) from (lat, lon); NaN where coordinates are unknown"""
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    lat2 = np.radians(latitudes)
+    lon2 = np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def score_candidates(features, viewer, weights=None):
+    """
+    Score candidates in one vectorized pass.
+
+    Args:
+        features: dict of equally sized NumPy arrays
+            - latitude, longitude: degrees (NaN when unknown)
+            - shared_interests: number of interests shared with the viewer
+            - candidate_interests: optional number of interests of each
+              candidate (defaults to shared_interests)
+            - last_activity: POSIX timestamps (NaN when unknown)
+            - age: years (NaN when unknown)
+            - is_online: booleans
+        viewer: dict with latitude, longitude (or None), interest_count,
+            min_age, max_age, max_distance and now (POSIX timestamp)
+        weights: optional signal weights (defaults to get_ranking_weights())
+
+    Returns:
+        tuple: (scores, distances_km) as float arrays; distances are NaN when unknown
+    """
+    weights = weights or get_ranking_weights()
+    n = len(features['is_online'])
+
+    # Distance (haversine vectorisé)
+    distances = np.full(n, np.nan)
+    distance_score = np.zeros(n)
+    if viewer.get('latitude') is not None and viewer.get('longitude') is not None:
+        distances = haversine_km_array(
+            viewer['latitude'], viewer['longitude'], features['latitude'], features['longitude']
+        )
+        scale = float(viewer.get('max_distance') or 50)
+        distance_score = np.nan_to_num(np.exp(-distances / scale), nan=0.0)
+
+    # Intérêts communs (similarité de Jaccard)
+    shared = features['shared_interests']
+    interest_score = jaccard_scores(
+        shared, viewer.get('interest_count') or 0, features.get('candidate_interests', shared)
+    )
+
+    # Fraîcheur de l'activité
+    hours = np.maximum(viewer['now'] - features['last_activity'], 0.0) / 3600.0
+    recency_score = np.nan_to_num(np.exp2(-hours / RECENCY_HALF_LIFE_HOURS), nan=0.0)
+
+    # Adéquation à la tranche d'âge souhaitée
+    ages = features['age']
+    below = np.maximum(viewer['min_age'] - ages, 0.0)
+    above = np.maximum(ages - viewer['max_age'], 0.0)
+    age_score = np.clip(1.0 - (below + above) / AGE_TOLERANCE_YEARS, 0.0, 1.0)
+    age_score = np.where(np.isnan(ages), 0.5, age_score)
+
+    online_score = features['is_online'].astype(float)
+
+    scores = (
+        weights['distance'] * distance_score
+        + weights['interests'] * interest_score
+        + weights['recency'] * recency_score
+        + weights['age_fit'] * age_score
+        + weights['online'] * online_score
+    )
+    return scores, distances
+
+
+def load_candidate_features(queryset, max_candidates=None, exclude=None):
+    """
+    Fetch the ranking inputs of the candidates matched by `queryset`.
+
+    One projection query, including the denormalized interest bitsets.
+    Candidates found in `exclude` (a matching.seen.BloomFilter) are dropped
+    as the rows are read, before the `max_candidates` cap: rows are fetched
+    in chunks until that many unseen candidates remain, so a heavy swiper
+    whose first rows are all seen still gets a full deck.
+
+    Returns:
+        tuple: (ids array, features dict with `interest_words`)
+    """
+    max_candidates = max_candidates or getattr(settings, 'MATCHING_RANKING_MAX_CANDIDATES', DEFAULT_MAX_CANDIDATES)
+    rows = queryset.values_list(
+        'id', 'latitude', 'longitude', 'last_activity', 'date_of_birth', 'is_online', 'interest_bits'
+    )
+    if exclude is None:
+        rows = list(rows[:max_candidates])
+    else:
+        unseen = []
+        iterator = rows.iterator(chunk_size=FETCH_CHUNK_SIZE)
+        while len(unseen) < max_candidates:
+            chunk = list(islice(iterator, FETCH_CHUNK_SIZE))
+            if not chunk:
+                break
+            seen = exclude.contains_many([row[0] for row in chunk])
+            unseen.extend(row for row, is_seen in zip(chunk, seen) if not is_seen)
+        rows = unseen[:max_candidates]
+
+    n = len(rows)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=n)
+    latitude = np.array([row[1] if row[1] is not None else np.nan for row in rows], dtype=float)
+    longitude = np.array([row[2] if row[2] is not None else np.nan for row in rows], dtype=float)
+    last_activity = np.array(
+        [row[3].timestamp() if row[3] else np.nan for row in rows], dtype=float
+    )
+    today = date.today()
+    age = np.array(
+        [(today - row[4]).days / 365.25 if row[4] else np.nan for row in rows], dtype=float
+    )
+    is_online = np.array([bool(row[5]) for row in rows], dtype=bool)
+
+    return ids, {
+        'latitude': latitude,
+        'longitude': longitude,
+        'last_activity': last_activity,
+        'age': age,
+        'is_online': is_online,
+        'interest_words': pack_bitsets([row[6] for row in rows]),
+    }
+
+
+def rank_candidates(user, queryset, preferences, max_candidates=None, exclude=None, min_shared_interests=None):
+    """
+    Rank the candidates of `queryset` for `user`, skipping those in `exclude`.
+
+    Returns:
+        list: (user_id, score, distance_km or None) tuples, best first
+    """
+    ids, features = load_candidate_features(queryset, max_candidates, exclude)
+    return rank_features(user, ids, features, preferences, get_viewer_interest_bits(user), min_shared_interests)
+
+
+def get_viewer_interest_bits(user):
+    """Bitset des intérêts du viewer, lu depuis les relations (toujours à jour)"""
+    return interest_bitset(
+        UserInterestRelation.objects.filter(user=user).values_list('interest_id', flat=True)
+    )
+
+
+def rank_features(user, ids, features, preferences, viewer_bits=0, min_shared_interests=None):
+    """
+    Score and sort already loaded candidate features.
+
+    The interest signals are computed here from the candidates' bitsets
+    (`interest_words`): popcount of the intersection with `viewer_bits` and of
+    each bitset. Candidates sharing fewer than `min_shared_interests`
+    interests are dropped.
+
+    Returns:
+        list: (user_id, score, distance_km or None) tuples, best first
+    """
+    if not len(ids):
+        return []
+
+    words = features.pop('interest_words')
+    features['shared_interests'] = shared_interest_counts(viewer_bits, words).astype(float)
+    features['candidate_interests'] = popcount(words).astype(float)
+
+    if min_shared_interests:
+        keep = features['shared_interests'] >= min_shared_interests
+        ids = ids[keep]
+        features = {name: column[keep] for name, column in features.items()}
+        if not len(ids):
+            return []
+
+    viewer = {
+        'latitude': user.latitude,
+        'longitude': user.longitude,
+        'interest_count': bin(viewer_bits).count('1'),
+        'min_age': preferences.min_age or 18,
+        'max_age': preferences.max_age or 99,
+        'max_distance': preferences.max_distance,
+        'now': timezone.now().timestamp(),
+    }
+    scores, distances = score_candidates(features, viewer)
+
+    # Tri stable : à score égal, on conserve l'ordre SQL
+    order = np.argsort(-scores, kind='stable')
+    return [
+        (int(ids[i]), float(scores[i]), None if np.isnan(distances[i]) else float(distances[i]))
+        for i in order
+    ]
@@ -0,0 +1,222 @@
+# matching/seen.py
+
+import logging
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import UserSeenFilter, UserSkip
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy est listé dans requirements.txt
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Taux de faux positifs visé et capacité initiale d'un filtre
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+DEFAULT_INITIAL_CAPACITY = 1000
+
+# Durée de conservation d'un filtre dans le cache
+SEEN_FILTER_CACHE_TTL = 3600
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(x):
+    """splitmix64 : dispersion des identifiants sur 64 bits"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _mix64_array(x):
+    """Version vectorisée de _mix64 (l'arithmétique uint64 de NumPy boucle modulo 2**64)"""
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class BloomFilter:
+    """
+    Bloom filter over integer user ids.
+
+    Membership tests never give false negatives; false positives (a profile
+    wrongly hidden) stay below the configured rate as long as the filter
+    holds at most `capacity` items. Positions use double hashing
+    h1 + i * h2 over splitmix64, so each lookup costs `num_hashes` bit reads.
+    """
+
+    def __init__(self, num_bits, num_hashes, bits=None, capacity=0, item_count=0):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.capacity = capacity
+        self.item_count = item_count
+        self.bits = bytearray(bits) if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        """Dimensionne le filtre : m = -n ln p / (ln 2)^2, k = m/n ln 2"""
+        capacity = max(1, int(capacity))
+        num_bits = max(64, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        return cls(num_bits, num_hashes, capacity=capacity)
+
+    def _positions(self, item):
+        h1 = _mix64(int(item))
+        h2 = _mix64(h1) | 1
+        return [((h1 + i * h2) & _MASK64) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.item_count += 1
+
+    def add_many(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def contains_many(self, items):
+        """
+        Membership of many ids at once.
+
+        Returns:
+            list (or boolean NumPy array when NumPy is available) aligned with `items`
+        """
+        if np is None:
+            return [item in self for item in items]
+
+        ids = np.asarray(items, dtype=np.int64).astype(np.uint64)
+        result = np.ones(len(ids), dtype=bool)
+        if not len(ids):
+            return result
+
+        table = np.frombuffer(bytes(self.bits), dtype=np.uint8)
+        h1 = _mix64_array(ids)
+        h2 = _mix64_array(h1) | np.uint64(1)
+        num_bits = np.uint64(self.num_bits)
+        with np.errstate(over='ignore'):
+            for i in range(self.num_hashes):
+                positions = (h1 + np.uint64(i) * h2) % num_bits
+                hit = table[(positions >> np.uint64(3)).astype(np.int64)] & (
+                    np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)
+                )
+                result &= hit != 0
+        return result
+
+    @property
+    def is_full(self):
+        return self.item_count > self.capacity
+
+
+def seen_filter_cache_key(user_id):
+    return f"seen_filter:{user_id}"
+
+
+def _false_positive_rate():
+    return getattr(settings, 'MATCHING_SEEN_FALSE_POSITIVE_RATE', DEFAULT_FALSE_POSITIVE_RATE)
+
+
+def seen_user_ids(user_id):
+    """Source de vérité : profils likés, passés ou bloqués par l'utilisateur"""
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+    liked = User.liked_users.through.objects.filter(from_user_id=user_id).values_list('to_user_id', flat=True)
+    blocked = User.blocked_users.through.objects.filter(from_user_id=user_id).values_list('to_user_id', flat=True)
+    skipped = UserSkip.objects.filter(user_id=user_id).values_list('skipped_user_id', flat=True)
+    return set(liked) | set(blocked) | set(skipped)
+
+
+def _cache_filter(user_id, bloom):
+    cache.set(
+        seen_filter_cache_key(user_id),
+        (bloom.num_bits, bloom.num_hashes, bloom.capacity, bloom.item_count, bytes(bloom.bits)),
+        SEEN_FILTER_CACHE_TTL
+    )
+
+
+def _save_filter(record, bloom):
+    record.bits = bytes(bloom.bits)
+    record.num_bits = bloom.num_bits
+    record.num_hashes = bloom.num_hashes
+    record.capacity = bloom.capacity
+    record.item_count = bloom.item_count
+    record.save()
+
+
+def _build_filter(ids, capacity=None):
+    capacity = max(capacity or 0, getattr(settings, 'MATCHING_SEEN_INITIAL_CAPACITY', DEFAULT_INITIAL_CAPACITY))
+    # On garde de la marge pour ne pas reconstruire à chaque swipe
+    while capacity < 2 * len(ids):
+        capacity *= 2
+    bloom = BloomFilter.for_capacity(capacity, _false_positive_rate())
+    bloom.add_many(ids)
+    return bloom
+
+
+def rebuild_seen_filter(user_id):
+    """
+    Reconstruit le filtre depuis les likes, passes et blocages en base.
+
+    Nécessaire après un unlike ou un déblocage (un filtre de Bloom ne
+    supporte pas la suppression) et quand le filtre dépasse sa capacité.
+    """
+    with transaction.atomic():
+        record = UserSeenFilter.objects.select_for_update().filter(user_id=user_id).first()
+        bloom = _build_filter(seen_user_ids(user_id), record.capacity if record else None)
+        if record is None:
+            record = UserSeenFilter(user_id=user_id)
+        _save_filter(record, bloom)
+    _cache_filter(user_id, bloom)
+    return bloom
+
+
+def get_seen_filter(user_id):
+    """Filtre de l'utilisateur : cache, puis base, puis reconstruction"""
+    cached = cache.get(seen_filter_cache_key(user_id))
+    if cached is not None:
+        num_bits, num_hashes, capacity, item_count, bits = cached
+        return BloomFilter(num_bits, num_hashes, bits, capacity, item_count)
+
+    record = UserSeenFilter.objects.filter(user_id=user_id).first()
+    if record is None:
+        return rebuild_seen_filter(user_id)
+
+    bloom = BloomFilter(record.num_bits, record.num_hashes, record.bits, record.capacity, record.item_count)
+    _cache_filter(user_id, bloom)
+    return bloom
+
+
+def record_seen(user_id, seen_ids):
+    """Ajoute des profils likés, passés ou bloqués au filtre de l'utilisateur"""
+    seen_ids = list(seen_ids)
+    if not seen_ids:
+        return
+
+    with transaction.atomic():
+        record = UserSeenFilter.objects.select_for_update().filter(user_id=user_id).first()
+        if record is None:
+            bloom = None
+        else:
+            bloom = BloomFilter(record.num_bits, record.num_hashes, record.bits, record.capacity, record.item_count)
+            bloom.add_many(seen_ids)
+            if bloom.is_full:
+                bloom = None
+            else:
+                _save_filter(record, bloom)
+
+    if bloom is None:
+        # Premier swipe ou filtre saturé : reconstruction depuis la base
+        bloom = rebuild_seen_filter(user_id)
+    else:
+        _cache_filter(user_id, bloom)
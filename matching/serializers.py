@@ -3,10 +3,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import UserPreference, UserInterest, Match
+from .geo import haversine_km
+from .presign import presigned_url, requested_rendition
 from django.conf import settings
-import boto3
-from botocore.config import Config
-import os
 
 User = get_user_model()
 
@@ -22,46 +21,6 @@ class UserPreferenceSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-def _build_presigned_url(key: str) -> str | None:
-    if not key:
-        return None
-    if isinstance(key, str) and key.startswith('http'):
-        return key
-    file_name = str(key).split('/')[-1]
-    s3_key = f"profil/{file_name}"
-    try:
-        region = getattr(settings, 'AWS_S3_REGION_NAME', 'us-west-2') or 'us-west-2'
-        
-        # Create S3 client with timeout and error handling
-        s3 = boto3.client(
-            's3',
-            region_name=region,
-            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-            endpoint_url=f'https://s3.{region}.amazonaws.com',
-            config=Config(
-                signature_version='s3v4', 
-                s3={'addressing_style': 'path'},
-                read_timeout=10,
-                connect_timeout=10,
-                retries={'max_attempts': 2}
-            )
-        )
-        
-        # Generate presigned URL with shorter timeout
-        url = s3.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': s3_key},
-            ExpiresIn=3600,
-        )
-        return url
-        
-    except Exception as e:
-        print(f"S3 presigned URL error: {e}")  # Debug logging
-        # Return a fallback URL or None
-        return None
-
-
 class MatchUserSerializer(serializers.ModelSerializer):
     """Serializer simplifié pour les utilisateurs dans le contexte de matching"""
     interests = serializers.SerializerMethodField()
@@ -72,6 +31,7 @@ class MatchUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'profile_picture', 
+                 'profile_picture_placeholder', 'profile_picture_color',
                  'bio', 'location', 'is_online', 'last_activity', 'interests', 
                  'age', 'distance']
     
@@ -92,7 +52,12 @@ class MatchUserSerializer(serializers.ModelSerializer):
             key = getattr(obj.profile_picture, 'name', None) or getattr(obj, 'profile_picture', None)
         except Exception:
             key = None
-        return _build_presigned_url(key)
+        return presigned_url(key, self._rendition())
+    
+    def _rendition(self):
+        """Taille de la photo : indice ?img_w= du client, sinon celle de la vue"""
+        default_width = getattr(self.context.get('view'), 'default_image_width', None)
+        return requested_rendition(self.context.get('request'), default_width)
     
     def get_age(self, obj):
         """Calcule l'âge de l'utilisateur à partir de sa date de naissance"""
@@ -106,33 +71,23 @@ class MatchUserSerializer(serializers.ModelSerializer):
     
     def get_distance(self, obj):
         """Calcule la distance entre l'utilisateur courant et cet utilisateur"""
+        # Distance déjà calculée en SQL par le filtre géographique (matching/geo.py)
+        annotated = getattr(obj, 'distance', None)
+        if annotated is not None:
+            return round(annotated, 1)
+        
         request = self.context.get('request')
-        if not request or not obj.latitude or not obj.longitude:
+        if not request or obj.latitude is None or obj.longitude is None:
             return None
         
         # Get current user from Django authentication
         current_user = request.user if request.user.is_authenticated else None
-        if not current_user or not current_user.latitude or not current_user.longitude:
+        if not current_user or current_user.latitude is None or current_user.longitude is None:
             return None
         
-        # Calcul de la distance en km en utilisant la formule de Haversine
-        from math import radians, cos, sin, asin, sqrt
-        
-        def haversine(lon1, lat1, lon2, lat2):
-            # Convert decimal degrees to radians
-            lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-            
-            # Haversine formula
-            dlon = lon2 - lon1
-            dlat = lat2 - lat1
-            a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-            c = 2 * asin(sqrt(a))
-            r = 6371  # Radius of Earth in kilometers
-            return c * r
-        
-        distance = haversine(
-            current_user.longitude, current_user.latitude,
-            obj.longitude, obj.latitude
+        distance = haversine_km(
+            current_user.latitude, current_user.longitude,
+            obj.latitude, obj.longitude
         )
         
         return round(distance, 1)
@@ -168,6 +123,10 @@ class MatchSerializer(serializers.ModelSerializer):
         except User.DoesNotExist:
             return None
 
+class IncomingLikeSerializer(serializers.Serializer):
+    """Like reçu (ligne de la table des likes) et profil de son auteur"""
+    user = MatchUserSerializer(source='from_user', read_only=True)
+
 class LikeUserSerializer(serializers.Serializer):
     """Serializer pour l'action de liker un utilisateur"""
     user_id = serializers.IntegerField(required=True)
@@ -186,4 +145,28 @@ class LikeUserSerializer(serializers.Serializer):
             if current_user.id == value:
                 raise serializers.ValidationError("Vous ne pouvez pas vous liker vous-même.")
         
-        return value
\ No newline at end of file
+        return value
+
+class SwipeSerializer(serializers.Serializer):
+    """Une décision d'un lot de swipes"""
+    user_id = serializers.IntegerField(required=True)
+    action = serializers.ChoiceField(choices=['like', 'skip', 'block'])
+    swiped_at = serializers.DateTimeField(required=True)
+
+class SwipeBatchSerializer(serializers.Serializer):
+    """
+    Lot ordonné de swipes (pas de requête par élément : les profils sont vérifiés par le lot).
+    
+    `max_likes` (contexte) borne le nombre de likes d'un lot : au-delà du
+    budget du throttle des likes, le lot ne passerait jamais.
+    """
+    swipes = SwipeSerializer(many=True, allow_empty=False)
+    
+    def validate_swipes(self, value):
+        max_size = getattr(settings, 'MATCHING_SWIPE_BATCH_MAX_SIZE', 100)
+        if len(value) > max_size:
+            raise serializers.ValidationError(f"Un lot contient au plus {max_size} swipes.")
+        max_likes = self.context.get('max_likes')
+        if max_likes is not None and sum(swipe['action'] == 'like' for swipe in value) > max_likes:
+            raise serializers.ValidationError(f"Un lot contient au plus {max_likes} likes.")
+        return value
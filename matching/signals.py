@@ -0,0 +1,45 @@
+# matching/signals.py
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .interests import interest_sync_suppressed, invalidate_interest_catalog, sync_interest_bits
+from .match_edges import sync_match_edges
+from .models import Match, UserInterest, UserInterestRelation
+from .user_index import forget_user, sync_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def update_user_index(sender, instance, **kwargs):
+    """Reporte la sauvegarde dans l'index en mémoire une fois la transaction validée"""
+    transaction.on_commit(lambda: sync_user(instance))
+
+
+@receiver(post_delete, sender=User)
+def remove_from_user_index(sender, instance, **kwargs):
+    user_id = instance.id
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver(post_save, sender=UserInterestRelation)
+@receiver(post_delete, sender=UserInterestRelation)
+def update_interest_bits(sender, instance, **kwargs):
+    """Garde User.interest_bits synchronisé avec les relations d'intérêts"""
+    if not interest_sync_suppressed():
+        sync_interest_bits(instance.user_id)
+
+
+@receiver(post_save, sender=UserInterest)
+@receiver(post_delete, sender=UserInterest)
+def update_interest_catalog(sender, **kwargs):
+    invalidate_interest_catalog()
+
+
+@receiver(post_save, sender=Match)
+def update_match_edges(sender, instance, created, **kwargs):
+    """Garde les deux MatchEdge d'un match à jour après un save()"""
+    sync_match_edges(instance, created)
@@ -0,0 +1,213 @@
+# matching/swipes.py
+
+"""
+Lots de swipes.
+
+Le client envoie une liste ordonnée de décisions (like, skip, block) avec
+l'heure du swipe côté client, par exemple les swipes hors ligne rejoués à la
+reconnexion. Le lot est traité dans une seule transaction par des écritures
+groupées : un verrou sur les lignes concernées, une insertion par table, une
+détection groupée des likes réciproques et des matchs. Les conversations et
+toutes les notifications partent après validation en une seule publication.
+
+Pour un même profil, seule la dernière décision (dans l'ordre des heures
+client) est appliquée ; les précédentes sont marquées `superseded`.
+"""
+
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from conversations.notifications import send_notifications
+from .deck import discard_from_deck
+from .generations import bump_generation
+from .incoming import adjust_incoming_counts, pending_pairs
+from .match_edges import create_match_edges, deactivate_matches_with, set_matches_active
+from .likes import (
+    ALREADY_LIKED, BLOCKED, LIKED, NOT_FOUND,
+    create_conversation_for_match, dispatch_side_effects, like_notifications
+)
+from .models import Match, MatchEdge, UserSkip
+from .seen import record_seen
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+LIKE = 'like'
+SKIP = 'skip'
+BLOCK = 'block'
+ACTIONS = (LIKE, SKIP, BLOCK)
+
+SKIPPED = 'skipped'
+ALREADY_BLOCKED = 'already_blocked'
+SUPERSEDED = 'superseded'
+INVALID = 'invalid'
+
+
+def _pair_filter(user_id, other_ids):
+    return Q(user1_id=user_id, user2_id__in=other_ids) | Q(user2_id=user_id, user1_id__in=other_ids)
+
+
+def submit_swipes(user, swipes):
+    """
+    Applique un lot de swipes.
+
+    Args:
+        swipes: liste de dicts {'user_id', 'action', 'swiped_at'}
+
+    Returns:
+        list: un résultat par swipe, dans l'ordre reçu :
+            {'user_id', 'action', 'status', 'match', 'created'}
+            Le statut se lit avec l'action : `blocked` pour un like signifie
+            que le profil est bloqué, pour un block que le blocage est fait.
+    """
+    Like = User.liked_users.through
+    Block = User.blocked_users.through
+    results = [
+        {'user_id': swipe['user_id'], 'action': swipe['action'], 'status': None, 'match': None, 'created': False}
+        for swipe in swipes
+    ]
+
+    # Dernière décision par profil, dans l'ordre des heures client (tri stable)
+    order = sorted(range(len(swipes)), key=lambda i: swipes[i]['swiped_at'])
+    decisions = {}
+    for i in order:
+        previous = decisions.get(swipes[i]['user_id'])
+        if previous is not None:
+            results[previous]['status'] = SUPERSEDED
+        decisions[swipes[i]['user_id']] = i
+
+    target_ids = sorted(target_id for target_id in decisions if target_id != user.id)
+    for target_id, i in decisions.items():
+        if target_id == user.id:
+            results[i]['status'] = INVALID
+
+    liked, skipped, blocked = [], [], []
+    matches = {}
+    with transaction.atomic():
+        rows = (
+            User.objects.select_for_update()
+            .filter(id__in=target_ids + [user.id])
+            .order_by('id')
+            .annotate(
+                already_liked=Exists(Like.objects.filter(from_user_id=user.id, to_user_id=OuterRef('pk'))),
+                is_blocked=Exists(Block.objects.filter(from_user_id=user.id, to_user_id=OuterRef('pk'))),
+            )
+        )
+        targets = {row.id: row for row in rows if row.id != user.id}
+
+        for target_id in target_ids:
+            i = decisions[target_id]
+            target = targets.get(target_id)
+            action = swipes[i]['action']
+            if target is None:
+                results[i]['status'] = NOT_FOUND
+            elif action == LIKE:
+                if target.already_liked:
+                    results[i]['status'] = ALREADY_LIKED
+                elif target.is_blocked:
+                    results[i]['status'] = BLOCKED
+                else:
+                    results[i]['status'] = LIKED
+                    liked.append(target_id)
+            elif action == SKIP:
+                results[i]['status'] = SKIPPED
+                skipped.append(target_id)
+            elif target.is_blocked:
+                results[i]['status'] = ALREADY_BLOCKED
+            else:
+                results[i]['status'] = BLOCKED
+                blocked.append(target_id)
+
+        pending_before = pending_pairs(user.id, list(targets))
+        if liked:
+            Like.objects.bulk_create(
+                [Like(from_user_id=user.id, to_user_id=target_id) for target_id in liked], ignore_conflicts=True
+            )
+        if skipped:
+            UserSkip.objects.bulk_create(
+                [UserSkip(user_id=user.id, skipped_user_id=target_id) for target_id in skipped],
+                ignore_conflicts=True
+            )
+        if blocked:
+            Block.objects.bulk_create(
+                [Block(from_user_id=user.id, to_user_id=target_id) for target_id in blocked], ignore_conflicts=True
+            )
+            Like.objects.filter(from_user_id__in=blocked, to_user_id=user.id).delete()
+        if skipped or blocked:
+            Like.objects.filter(from_user_id=user.id, to_user_id__in=skipped + blocked).delete()
+            deactivate_matches_with(user.id, skipped + blocked)
+
+        if liked:
+            matches = _upsert_matches(user, liked, targets)
+            for target_id, (match, created) in matches.items():
+                results[decisions[target_id]].update(match=match, created=created)
+        adjust_incoming_counts(pending_before, pending_pairs(user.id, list(targets)))
+
+    # Caches du matching, puis conversations et notifications après validation
+    record_seen(user.id, liked + skipped + blocked)
+    bump_generation(user.id, *matches, *skipped, *blocked)
+    discard_from_deck(user.id, liked + skipped + blocked)
+    for target_id in blocked:
+        discard_from_deck(target_id, [user.id])
+
+    if liked:
+        notified = [(targets[target_id],) + matches.get(target_id, (None, False)) for target_id in liked]
+        transaction.on_commit(lambda: dispatch_side_effects(_notify_swipes, user, notified))
+    return results
+
+
+def _upsert_matches(user, liked_ids, targets):
+    """
+    Détection groupée des likes réciproques, réactivation et création des matchs.
+
+    Returns:
+        dict: {id du profil: (match, créé)}
+    """
+    Like = User.liked_users.through
+    mutual = list(
+        Like.objects.filter(from_user_id__in=liked_ids, to_user_id=user.id).values_list('from_user_id', flat=True)
+    )
+    if not mutual:
+        return {}
+
+    existing = {
+        edge.other_user_id: edge.match
+        for edge in MatchEdge.objects.filter(owner_id=user.id, other_user_id__in=mutual).select_related('match')
+    }
+
+    set_matches_active([match.id for match in existing.values() if not match.is_active], True)
+
+    missing = [target_id for target_id in mutual if target_id not in existing]
+    created = Match.objects.bulk_create([
+        Match(user1_id=min(user.id, target_id), user2_id=max(user.id, target_id), is_active=True)
+        for target_id in missing
+    ])
+    if any(match.pk is None for match in created):
+        # Bases sans RETURNING sur les insertions groupées
+        created = list(Match.objects.filter(_pair_filter(user.id, missing)))
+    create_match_edges(created)
+
+    result = {}
+    for match, is_new in [(m, False) for m in existing.values()] + [(m, True) for m in created]:
+        target_id = match.user2_id if match.user1_id == user.id else match.user1_id
+        match.is_active = True
+        match.user1, match.user2 = (user, targets[target_id]) if match.user1_id == user.id else (targets[target_id], user)
+        result[target_id] = (match, is_new)
+    return result
+
+
+def _notify_swipes(user, notified):
+    """Conversations des nouveaux matchs puis toutes les notifications du lot en une publication"""
+    messages = []
+    for liked_user, match, created in notified:
+        if match is not None:
+            try:
+                create_conversation_for_match(user, liked_user)
+            except Exception as e:
+                logger.error(f"Conversation creation failed for match {match.id}: {e}")
+        messages.extend(like_notifications(user, liked_user, match, created))
+    send_notifications(messages)
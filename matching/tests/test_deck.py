@@ -0,0 +1,134 @@
+# matching/tests/test_deck.py
+
+from datetime import date
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from rest_framework.test import APIClient
+from matching.deck import (
+    InMemoryDeckStore, build_deck, deck_key, get_deck_store, invalidate_deck, served_key
+)
+from matching.user_index import reset_user_index
+from matching.models import UserPreference
+
+User = get_user_model()
+
+class InMemoryDeckStoreTest(TestCase):
+    """Tests for the in-memory sorted set stand-in"""
+
+    def test_pop_returns_highest_scores_first(self):
+        store = InMemoryDeckStore()
+        store.replace('deck', [(1, 0.2), (2, 0.9), (3, 0.5)], ttl=60)
+        self.assertEqual(store.pop('deck', 2), [(2, 0.9), (3, 0.5)])
+        self.assertEqual(store.size('deck'), 1)
+
+    def test_discard_and_expiry(self):
+        store = InMemoryDeckStore()
+        store.replace('deck', [(1, 0.2), (2, 0.9)], ttl=60)
+        store.discard('deck', [2])
+        self.assertEqual(store.pop('deck', 5), [(1, 0.2)])
+
+        store.replace('expired', [(1, 0.2)], ttl=-1)
+        self.assertEqual(store.size('expired'), 0)
+
+    def test_page_cursor_replays_the_same_page(self):
+        store = InMemoryDeckStore()
+        store.replace('deck', [(1, 0.2), (2, 0.9), (3, 0.5)], ttl=60)
+        self.assertEqual(store.pop_page('deck', 'served', 1, 60, cursor='abc'), [(2, 0.9)])
+        self.assertEqual(store.pop_page('deck', 'served', 1, 60, cursor='abc'), [(2, 0.9)])
+        self.assertEqual(store.pop_page('deck', 'served', 1, 60, cursor='def'), [(3, 0.5)])
+        self.assertEqual(store.served('served'), {2, 3})
+
+    def test_replace_skips_candidates_served_meanwhile(self):
+        store = InMemoryDeckStore()
+        store.replace('deck', [(1, 0.2), (2, 0.9)], ttl=60)
+        store.pop_page('deck', 'served', 1, 60)
+        self.assertEqual(store.replace('deck', [(1, 0.2), (2, 0.9)], 60, served_key='served'), 1)
+        self.assertEqual(store.pop('deck', 5), [(1, 0.2)])
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False, MATCHING_DECK_LOW_WATERMARK=0)
+class CandidateDeckViewTest(TestCase):
+    """Tests for serving potential matches from the materialized deck"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        now = timezone.now()
+        birthdate = date(1995, 6, 1)
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123',
+            last_activity=now, date_of_birth=birthdate
+        )
+        UserPreference.objects.create(user=self.user)
+        invalidate_deck(self.user.id)
+        self.candidates = [
+            User.objects.create_user(
+                username=f'candidate{i}', email=f'c{i}@example.com', password='testpass123',
+                last_activity=now, date_of_birth=birthdate
+            )
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_pages_are_popped_without_repeats(self):
+        first = self.client.get('/api/v1/matching/potential-matches/', {'page_size': 2})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['count'], 5)
+        self.assertEqual(len(first.data['results']), 2)
+
+        second = self.client.get('/api/v1/matching/potential-matches/', {'page_size': 2})
+        self.assertEqual(second.data['count'], 3)
+
+        seen = [u['id'] for u in first.data['results'] + second.data['results']]
+        self.assertEqual(len(set(seen)), 4)
+        self.assertEqual(get_deck_store().served(served_key(self.user.id)), set(seen))
+
+    def test_next_link_is_safe_to_retry(self):
+        first = self.client.get('/api/v1/matching/potential-matches/', {'page_size': 2})
+        self.assertIn('cursor=', first.data['next'])
+
+        second = self.client.get(first.data['next'])
+        retry = self.client.get(first.data['next'])
+        self.assertEqual(retry.data['results'], second.data['results'])
+        self.assertEqual(get_deck_store().size(deck_key(self.user.id)), 1)
+
+        third = self.client.get(second.data['next'])
+        self.assertEqual(len(third.data['results']), 1)
+        self.assertIsNone(third.data['next'])
+        ids = [u['id'] for u in first.data['results'] + second.data['results'] + third.data['results']]
+        self.assertEqual(sorted(ids), sorted(c.id for c in self.candidates))
+
+    def test_rebuild_does_not_restore_candidates_popped_meanwhile(self):
+        first = self.client.get('/api/v1/matching/potential-matches/', {'page_size': 2})
+        popped = {u['id'] for u in first.data['results']}
+        store = get_deck_store()
+        # Lecture de `served` antérieure au dépilement concurrent
+        with mock.patch.object(store, 'served', return_value=set()):
+            self.assertEqual(build_deck(self.user), 3)
+        response = self.client.get('/api/v1/matching/potential-matches/', {'page_size': 10})
+        self.assertFalse(popped & {u['id'] for u in response.data['results']})
+
+    def test_like_removes_candidate_from_deck(self):
+        first = self.client.get('/api/v1/matching/potential-matches/', {'page_size': 1})
+        served = {u['id'] for u in first.data['results']}
+        liked = next(c for c in self.candidates if c.id not in served)
+
+        response = self.client.post('/api/v1/matching/like/', {'user_id': liked.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_deck_store().size(deck_key(self.user.id)), 3)
+
+        response = self.client.get('/api/v1/matching/potential-matches/', {'page_size': 10})
+        ids = [u['id'] for u in response.data['results']]
+        self.assertNotIn(liked.id, ids)
+        self.assertEqual(len(ids), 3)
+
+    def test_build_candidate_decks_command(self):
+        out = StringIO()
+        call_command('build_candidate_decks', user_id=self.user.id, stdout=out)
+        self.assertEqual(get_deck_store().size(deck_key(self.user.id)), 5)
+        self.assertIn('Built 1 deck(s)', out.getvalue())
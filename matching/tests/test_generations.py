@@ -0,0 +1,87 @@
+# matching/tests/test_generations.py
+
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from matching.deck import invalidate_deck
+from matching.generations import bump_generation, generation_key, get_generation, versioned_key
+from matching.user_index import reset_user_index
+from matching.models import UserPreference
+
+User = get_user_model()
+
+class GenerationCounterTest(TestCase):
+    """Tests for the per-user generation counter"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_versioned_keys(self):
+        before = versioned_key('potential_matches', 1)
+        bump_generation(1)
+        self.assertNotEqual(versioned_key('potential_matches', 1), before)
+        self.assertEqual(get_generation(2), get_generation(2))
+
+    def test_params_are_part_of_the_key(self):
+        self.assertNotEqual(
+            versioned_key('potential_matches', 1, {'search': 'a'}),
+            versioned_key('potential_matches', 1, {'search': 'b'})
+        )
+        self.assertEqual(
+            versioned_key('potential_matches', 1, {'a': 1, 'b': 2}),
+            versioned_key('potential_matches', 1, {'b': 2, 'a': 1})
+        )
+
+    def test_evicted_counter_never_reuses_a_generation(self):
+        generation = get_generation(1)
+        cache.delete(generation_key(1))
+        bump_generation(1)
+        self.assertNotEqual(get_generation(1), generation)
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False)
+class MatchingCacheInvalidationTest(TestCase):
+    """Writes that affect matching invalidate the cached candidates of both users"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        now = timezone.now()
+        birthdate = date(1995, 6, 1)
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123',
+            last_activity=now, date_of_birth=birthdate
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123',
+            last_activity=now, date_of_birth=birthdate
+        )
+        UserPreference.objects.create(user=self.user)
+        invalidate_deck(self.user.id)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_skip_invalidates_both_sides(self):
+        user_generation = get_generation(self.user.id)
+        other_generation = get_generation(self.other.id)
+        response = self.client.post('/api/v1/matching/skip/', {'user_id': self.other.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(get_generation(self.user.id), user_generation)
+        self.assertNotEqual(get_generation(self.other.id), other_generation)
+
+    def test_like_is_not_served_from_stale_cache(self):
+        params = {'ordering': '-last_activity'}
+        response = self.client.get('/api/v1/matching/potential-matches/', params)
+        self.assertEqual([u['username'] for u in response.data['results']], ['other'])
+
+        self.client.post('/api/v1/matching/like/', {'user_id': self.other.id})
+        response = self.client.get('/api/v1/matching/potential-matches/', params)
+        self.assertEqual(response.data['results'], [])
+
+    def test_preference_update_invalidates(self):
+        generation = get_generation(self.user.id)
+        response = self.client.patch('/api/v1/matching/preferences/', {'gender_preference': 'F'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(get_generation(self.user.id), generation)
@@ -0,0 +1,92 @@
+# matching/tests/test_geo.py
+
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from matching.geo import bounding_box, filter_by_distance, haversine_km
+from matching.deck import invalidate_deck
+from matching.user_index import reset_user_index
+from matching.models import UserPreference
+
+User = get_user_model()
+
+# Paris et quelques villes de référence
+PARIS = (48.8566, 2.3522)
+VERSAILLES = (48.8049, 2.1204)
+ORLEANS = (47.9030, 1.9093)
+LYON = (45.7640, 4.8357)
+
+class GeoHelpersTest(TestCase):
+    """Tests for the distance helpers"""
+
+    def test_haversine_known_distance(self):
+        self.assertAlmostEqual(haversine_km(*PARIS, *LYON), 392, delta=2)
+
+    def test_bounding_box_contains_circle(self):
+        min_lat, max_lat, lon_ranges = bounding_box(*PARIS, 150)
+        self.assertLess(min_lat, ORLEANS[0])
+        self.assertEqual(len(lon_ranges), 1)
+        self.assertLess(lon_ranges[0][0], ORLEANS[1])
+
+    def test_bounding_box_crosses_antimeridian(self):
+        _, _, lon_ranges = bounding_box(0.0, 179.9, 50)
+        self.assertEqual(len(lon_ranges), 2)
+
+    def test_bounding_box_near_pole(self):
+        _, max_lat, lon_ranges = bounding_box(89.9, 0.0, 50)
+        self.assertEqual(max_lat, 90.0)
+        self.assertIsNone(lon_ranges)
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False)
+class DistanceFilterTest(TestCase):
+    """Tests for the SQL distance prefilter of PotentialMatchesView"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        now = timezone.now()
+        birthdate = date(1995, 6, 1)
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123',
+            latitude=PARIS[0], longitude=PARIS[1], last_activity=now, date_of_birth=birthdate
+        )
+        UserPreference.objects.create(user=self.user, max_distance=150)
+        invalidate_deck(self.user.id)
+        self.orleans = User.objects.create_user(
+            username='orleans', email='o@example.com', password='testpass123',
+            latitude=ORLEANS[0], longitude=ORLEANS[1], last_activity=now, date_of_birth=birthdate
+        )
+        self.versailles = User.objects.create_user(
+            username='versailles', email='v@example.com', password='testpass123',
+            latitude=VERSAILLES[0], longitude=VERSAILLES[1], last_activity=now, date_of_birth=birthdate
+        )
+        self.lyon = User.objects.create_user(
+            username='lyon', email='l@example.com', password='testpass123',
+            latitude=LYON[0], longitude=LYON[1], last_activity=now, date_of_birth=birthdate
+        )
+        User.objects.create_user(
+            username='nowhere', email='n@example.com', password='testpass123', last_activity=now, date_of_birth=birthdate
+        )
+
+    def test_filter_by_distance_is_exact_and_annotated(self):
+        queryset = filter_by_distance(User.objects.exclude(id=self.user.id), *PARIS, 150).order_by('distance')
+        users = list(queryset)
+        self.assertEqual([u.username for u in users], ['versailles', 'orleans'])
+        self.assertAlmostEqual(users[0].distance, haversine_km(*PARIS, *VERSAILLES), places=3)
+
+    def test_potential_matches_ordered_by_distance(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/matching/potential-matches/')
+        self.assertEqual(response.status_code, 200)
+        usernames = [u['username'] for u in response.data['results']]
+        self.assertEqual(usernames, ['versailles', 'orleans'])
+        self.assertAlmostEqual(response.data['results'][0]['distance'], 17.7, delta=0.5)
+
+        cache.clear()
+        response = client.get('/api/v1/matching/potential-matches/', {'max_distance': '500'})
+        usernames = [u['username'] for u in response.data['results']]
+        self.assertEqual(usernames, ['versailles', 'orleans', 'lyon'])
@@ -0,0 +1,102 @@
+# matching/tests/test_incoming_likes.py
+
+from datetime import date
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from rest_framework.test import APIClient
+from matching.incoming import get_incoming_like_count, pending_likes, recount_incoming_likes
+from matching.likes import like_user
+from matching.throttling import reset_throttle_store
+from matching.user_index import reset_user_index
+
+User = get_user_model()
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False)
+class IncomingLikesTest(TestCase):
+    """The pending incoming-like counter follows every write and matches the list"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        reset_throttle_store()
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+        )
+        self.others = [
+            User.objects.create_user(
+                username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123',
+                date_of_birth=date(1995, 6, 1)
+            )
+            for i in range(5)
+        ]
+        for other in self.others:
+            like_user(other, self.user.id)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertCountConsistent(self, expected):
+        self.assertEqual(get_incoming_like_count(self.user.id), expected)
+        self.assertEqual(pending_likes(self.user.id).count(), expected)
+        recount_incoming_likes([self.user.id])
+        self.assertEqual(get_incoming_like_count(self.user.id), expected)
+
+    def test_counter_follows_likes_matches_skips_and_blocks(self):
+        self.assertCountConsistent(5)
+        fan0, fan1, fan2, fan3, fan4 = self.others
+
+        self.client.post('/api/v1/matching/like/', {'user_id': fan0.id})  # match
+        self.client.post('/api/v1/matching/skip/', {'user_id': fan1.id})
+        self.client.post('/api/v1/matching/block/', {'user_id': fan2.id})
+        self.assertCountConsistent(2)
+
+        self.client.post('/api/v1/matching/unlike/', {'user_id': fan0.id})  # le like de fan0 redevient en attente
+        self.assertCountConsistent(3)
+
+        client = APIClient()
+        client.force_authenticate(user=fan3)
+        client.post('/api/v1/matching/unlike/', {'user_id': self.user.id})
+        self.assertCountConsistent(2)
+
+        self.client.post('/api/v1/matching/swipes/', {'swipes': [
+            {'user_id': fan4.id, 'action': 'like', 'swiped_at': timezone.now().isoformat()},
+        ]}, format='json')
+        self.assertCountConsistent(1)
+
+    def test_pair_rows_are_locked_before_the_diff(self):
+        fan0, fan1, fan2, _, _ = self.others
+        self.client.post('/api/v1/matching/block/', {'user_id': fan2.id})
+        for path, fan in (('skip/', fan0), ('unlike/', fan0), ('block/', fan1), ('unblock/', fan2)):
+            self.user.liked_users.add(fan0)
+            with mock.patch.object(User.objects, 'select_for_update', wraps=User.objects.select_for_update) as lock:
+                response = self.client.post(f'/api/v1/matching/{path}', {'user_id': fan.id})
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(lock.call_count, 1, path)
+
+    def test_list_is_keyset_paginated(self):
+        self.client.post('/api/v1/matching/block/', {'user_id': self.others[0].id})
+
+        response = self.client.get('/api/v1/matching/likes/received/', {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([item['user']['username'] for item in response.data['results']], ['fan4', 'fan3', 'fan2'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['user']['username'] for item in response.data['results']], ['fan1'])
+        self.assertIsNone(response.data['next'])
+
+    def test_badge_count_is_a_single_read(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/matching/likes/received/count/')
+        self.assertEqual(response.data, {'count': 5})
+
+    def test_recount_command_repairs_drift(self):
+        User.objects.filter(id=self.user.id).update(incoming_like_count=42)
+        out = StringIO()
+        call_command('recount_incoming_likes', stdout=out)
+        self.assertIn('Recounted incoming likes of 6 user(s)', out.getvalue())
+        self.assertEqual(get_incoming_like_count(self.user.id), 5)
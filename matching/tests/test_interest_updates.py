@@ -0,0 +1,67 @@
+# matching/tests/test_interest_updates.py
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from matching.interests import bitset_interest_ids, bytes_to_bitset, get_interest_catalog
+from matching.models import UserInterest, UserInterestRelation
+
+User = get_user_model()
+
+class UserInterestsViewTest(TestCase):
+    """Tests for the diff-based interest update and the cached catalog"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='me', email='me@example.com', password='testpass123')
+        self.interests = [
+            UserInterest.objects.create(name=name) for name in ('Musique', 'Sport', 'Cuisine', 'Voyage')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def selected(self):
+        return set(UserInterestRelation.objects.filter(user=self.user).values_list('interest_id', flat=True))
+
+    def test_update_applies_only_the_difference(self):
+        musique, sport, cuisine, voyage = self.interests
+        self.client.post('/api/v1/matching/interests/', {'interest_ids': [musique.id, sport.id]}, format='json')
+        kept = UserInterestRelation.objects.get(user=self.user, interest=musique)
+
+        get_interest_catalog()  # catalogue déjà en cache
+        with self.assertNumQueries(7):
+            # SAVEPOINT, lecture, DELETE (sélection + suppression), INSERT, UPDATE du bitset, RELEASE
+            response = self.client.post(
+                '/api/v1/matching/interests/',
+                {'interest_ids': [musique.id, cuisine.id, voyage.id, 999, 'x']}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.selected(), {musique.id, cuisine.id, voyage.id})
+        self.assertTrue(UserInterestRelation.objects.filter(id=kept.id).exists())
+
+        bits = User.objects.values_list('interest_bits', flat=True).get(id=self.user.id)
+        self.assertEqual(bitset_interest_ids(bytes_to_bitset(bits)), sorted([musique.id, cuisine.id, voyage.id]))
+
+    def test_unchanged_update_writes_nothing(self):
+        ids = [self.interests[0].id]
+        self.client.post('/api/v1/matching/interests/', {'interest_ids': ids}, format='json')
+        get_interest_catalog()
+        with self.assertNumQueries(3):
+            self.client.post('/api/v1/matching/interests/', {'interest_ids': ids}, format='json')
+
+    def test_list_is_built_in_one_query(self):
+        UserInterestRelation.objects.create(user=self.user, interest=self.interests[1])
+        get_interest_catalog()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/matching/interests/')
+        self.assertEqual(
+            [(item['name'], item['is_selected']) for item in response.data],
+            [('Musique', False), ('Sport', True), ('Cuisine', False), ('Voyage', False)]
+        )
+
+    def test_catalog_is_reloaded_after_a_change(self):
+        self.assertEqual(len(get_interest_catalog()), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserInterest.objects.create(name='Lecture')
+        self.assertEqual([name for _, name in get_interest_catalog()][-1], 'Lecture')
@@ -0,0 +1,132 @@
+# matching/tests/test_interests.py
+
+import random
+from datetime import date
+from unittest import mock
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import Max
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from matching.deck import invalidate_deck
+from matching.interests import (
+    bitset_interest_ids, bitset_positions, bitset_to_bytes, bytes_to_bitset, interest_bitset,
+    jaccard_scores, pack_bitsets, popcount, positions_bitset, shared_interest_counts
+)
+from matching.models import UserInterest, UserInterestRelation, UserPreference
+from matching.user_index import get_user_index, reset_user_index
+
+User = get_user_model()
+
+class InterestBitsetTest(TestCase):
+    """Tests for the interest bitset helpers"""
+
+    def test_round_trip(self):
+        positions = [1, 5, 63, 64, 130]
+        data = bitset_to_bytes(positions_bitset(positions))
+        self.assertEqual(bitset_positions(bytes_to_bitset(data)), positions)
+        self.assertEqual(bitset_to_bytes(0), b'')
+
+    def test_bits_are_dense_ordinals_not_ids(self):
+        with self.captureOnCommitCallbacks(execute=True):  # invalide le catalogue en cache
+            interests = [UserInterest.objects.create(id=100000 + 1000 * i, name=f'Intérêt {i}') for i in range(3)]
+        self.assertEqual([interest.bit for interest in interests], [0, 1, 2])
+        ids = [interests[0].id, interests[2].id]
+        data = bitset_to_bytes(interest_bitset(ids + [999]))
+        self.assertEqual(data, bytes([0b101]))
+        self.assertEqual(bitset_interest_ids(bytes_to_bitset(data)), ids)
+
+    def test_bit_taken_by_a_concurrent_create_is_reallocated(self):
+        UserInterest.objects.create(name='Cinéma')
+        UserInterest.objects.create(name='Escalade')
+        aggregate = UserInterest.objects.aggregate
+        # Le premier maximum lu est périmé, comme si Escalade avait été créé entre-temps
+        with mock.patch.object(UserInterest.objects, 'aggregate', side_effect=[{'last': 0}, aggregate(last=Max('bit'))]):
+            interest = UserInterest.objects.create(name='Jazz')
+        self.assertEqual(interest.bit, 2)
+
+        with self.assertRaises(IntegrityError):
+            UserInterest.objects.create(name='Jazz')
+
+    def test_vectorized_overlap_matches_sets(self):
+        rng = random.Random(3)
+        viewer = set(rng.sample(range(1, 200), 12))
+        candidates = [set(rng.sample(range(1, 200), rng.randrange(0, 20))) for _ in range(300)]
+        words = pack_bitsets([bitset_to_bytes(positions_bitset(c)) for c in candidates])
+
+        shared = shared_interest_counts(positions_bitset(viewer), words)
+        self.assertEqual(shared.tolist(), [len(viewer & c) for c in candidates])
+        self.assertEqual(popcount(words).tolist(), [len(c) for c in candidates])
+
+        scores = jaccard_scores(shared, len(viewer), popcount(words))
+        expected = [len(viewer & c) / len(viewer | c) for c in candidates]
+        np.testing.assert_allclose(scores, expected)
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False)
+class InterestBitsSyncTest(TestCase):
+    """User.interest_bits follows UserInterestRelation and feeds matching"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        now = timezone.now()
+        birthdate = date(1995, 6, 1)
+        self.interests = [UserInterest.objects.create(name=name) for name in ('Musique', 'Sport', 'Cuisine')]
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123',
+            last_activity=now, date_of_birth=birthdate
+        )
+        UserPreference.objects.create(user=self.user)
+        invalidate_deck(self.user.id)
+        self.twin = User.objects.create_user(
+            username='twin', email='twin@example.com', password='testpass123',
+            last_activity=now, date_of_birth=birthdate
+        )
+        self.partial = User.objects.create_user(
+            username='partial', email='partial@example.com', password='testpass123',
+            last_activity=now, date_of_birth=birthdate
+        )
+        for interest in self.interests:
+            UserInterestRelation.objects.create(user=self.user, interest=interest)
+            UserInterestRelation.objects.create(user=self.twin, interest=interest)
+        UserInterestRelation.objects.create(user=self.partial, interest=self.interests[0])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def bits_of(self, user):
+        return bytes_to_bitset(User.objects.values_list('interest_bits', flat=True).get(id=user.id))
+
+    def test_relations_keep_bits_in_sync(self):
+        self.assertEqual(bitset_interest_ids(self.bits_of(self.partial)), [self.interests[0].id])
+        UserInterestRelation.objects.filter(user=self.twin, interest=self.interests[1]).delete()
+        self.assertEqual(
+            bitset_interest_ids(self.bits_of(self.twin)), [self.interests[0].id, self.interests[2].id]
+        )
+
+    def test_stale_instance_save_keeps_bits(self):
+        stale = User.objects.get(id=self.partial.id)
+        UserInterestRelation.objects.create(user=self.partial, interest=self.interests[1])
+        stale.bio = 'Nouvelle bio'
+        stale.save()
+        self.assertEqual(
+            bitset_interest_ids(self.bits_of(self.partial)), [self.interests[0].id, self.interests[1].id]
+        )
+
+    def test_ranking_prefers_shared_interests_and_filters_minimum(self):
+        response = self.client.get('/api/v1/matching/potential-matches/')
+        self.assertEqual([u['username'] for u in response.data['results']], ['twin', 'partial'])
+
+        for params in ({'min_shared_interests': 2}, {'min_shared_interests': 2, 'ordering': 'date_joined'}):
+            response = self.client.get('/api/v1/matching/potential-matches/', params)
+            self.assertEqual([u['username'] for u in response.data['results']], ['twin'], params)
+
+    def test_index_receives_interest_updates_on_commit(self):
+        index = get_user_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            UserInterestRelation.objects.create(user=self.partial, interest=self.interests[2])
+        ids, features = index.query(self.user, UserPreference(min_age=18, max_age=99, max_distance=0))
+        row = ids.tolist().index(self.partial.id)
+        self.assertEqual(int(popcount(features['interest_words'][row:row + 1])[0]), 2)
@@ -0,0 +1,135 @@
+# matching/tests/test_like_pipeline.py
+
+import os
+import time
+from datetime import date
+from unittest import skipUnless
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from conversations.models import Conversation
+from matching.deck import invalidate_deck
+from matching.likes import ALREADY_LIKED, BLOCKED, LIKED, like_user
+from matching.models import Match
+from matching.seen import rebuild_seen_filter
+from matching.user_index import reset_user_index
+
+User = get_user_model()
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False, MATCHING_LIKE_SIDE_EFFECTS_ASYNC=False)
+class LikePipelineTest(TestCase):
+    """The like pipeline runs a constant number of queries and notifies after commit"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+        )
+        invalidate_deck(self.user.id)
+        for user in (self.user, self.other):
+            rebuild_seen_filter(user.id)
+
+    def listen(self, user):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'user_{user.id}_notifications', channel)
+        return lambda: async_to_sync(layer.receive)(channel)
+
+    def test_like_runs_constant_queries(self):
+        # SAVEPOINT, verrou + contrôles, INSERT du like, réciprocité + match,
+        # likes en attente avant/après + compteur, RELEASE, puis le filtre des
+        # profils vus dans sa propre transaction (4 requêtes)
+        with self.assertNumQueries(12):
+            result = like_user(self.user, self.other.id)
+        self.assertEqual(result.status, LIKED)
+        self.assertFalse(result.is_match)
+        self.assertTrue(self.user.liked_users.filter(id=self.other.id).exists())
+
+        self.assertEqual(like_user(self.user, self.other.id).status, ALREADY_LIKED)
+
+    def test_mutual_like_creates_match_and_notifies_after_commit(self):
+        like_user(self.other, self.user.id)
+        receive = self.listen(self.other)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertNumQueries(14):  # + INSERT du match et de ses deux arêtes
+                result = like_user(self.user, self.other.id)
+            self.assertEqual(Conversation.objects.count(), 0)
+
+        self.assertTrue(result.is_match)
+        self.assertTrue(result.created)
+        self.assertTrue(Match.objects.filter(id=result.match.id, is_active=True).exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Conversation.objects.filter(participants=self.user).filter(participants=self.other).count(), 1)
+        self.assertEqual(receive()['notification']['type'], 'new_like')
+        self.assertEqual(receive()['notification']['match']['id'], result.match.id)
+
+    def test_inactive_match_is_reactivated(self):
+        user1, user2 = sorted((self.user, self.other), key=lambda u: u.id)
+        match = Match.objects.create(user1=user1, user2=user2, is_active=False)
+        like_user(self.other, self.user.id)
+
+        result = like_user(self.user, self.other.id)
+        self.assertEqual(result.match.id, match.id)
+        self.assertFalse(result.created)
+        match.refresh_from_db()
+        self.assertTrue(match.is_active)
+
+    def test_blocked_user_cannot_be_liked(self):
+        self.user.blocked_users.add(self.other)
+        self.assertEqual(like_user(self.user, self.other.id).status, BLOCKED)
+        self.assertFalse(self.user.liked_users.exists())
+
+    def test_view_response(self):
+        client = APIClient()
+        client.force_authenticate(user=self.other)
+        client.post('/api/v1/matching/like/', {'user_id': self.user.id})
+
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/v1/matching/like/', {'user_id': self.other.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['is_match'])
+        self.assertEqual(response.data['match']['matched_user']['username'], 'other')
+
+        response = client.post('/api/v1/matching/like/', {'user_id': self.other.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Utilisateur déjà liké')
+
+    def test_sequential_likes_through_one_worker(self):
+        """Each like of a run resolves its own mutual match"""
+        User.objects.bulk_create([
+            User(username=f'target{i}', email=f'target{i}@example.com') for i in range(20)
+        ])
+        targets = list(User.objects.filter(username__startswith='target').values_list('id', flat=True))
+        for target_id in targets[::2]:
+            like_user(User(id=target_id), self.user.id)  # la moitié des likes donne un match
+
+        matches = sum(like_user(self.user, target_id).is_match for target_id in targets)
+        self.assertEqual(matches, len(targets) // 2)
+        self.assertEqual(Match.objects.filter(Q(user1=self.user) | Q(user2=self.user)).count(), len(targets) // 2)
+
+    @skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+    def test_benchmark_likes_per_second(self):
+        """Sequential likes through one worker"""
+        User.objects.bulk_create([
+            User(username=f'target{i}', email=f'target{i}@example.com') for i in range(300)
+        ])
+        targets = list(User.objects.filter(username__startswith='target').values_list('id', flat=True))
+        for target_id in targets[::2]:
+            like_user(User(id=target_id), self.user.id)
+
+        start = time.perf_counter()
+        matches = sum(like_user(self.user, target_id).is_match for target_id in targets)
+        elapsed = time.perf_counter() - start
+        print(f"\nLike pipeline: {len(targets) / elapsed:.0f} likes/s per worker ({matches} matches)")
+        self.assertEqual(matches, len(targets) // 2)
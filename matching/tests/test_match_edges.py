@@ -0,0 +1,76 @@
+# matching/tests/test_match_edges.py
+
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from matching.likes import like_user
+from matching.match_edges import is_matched, match_edges, rebuild_match_edges
+from matching.models import Match, MatchEdge
+from matching.user_index import reset_user_index
+
+User = get_user_model()
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False)
+class MatchEdgeTest(TestCase):
+    """Every match write keeps its two edges in step"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        self.user, self.other, self.third = [
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+            )
+            for name in ('me', 'other', 'third')
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def edge_states(self):
+        return sorted(MatchEdge.objects.values_list('owner_id', 'other_user_id', 'is_active'))
+
+    def match(self, a, b):
+        like_user(a, b.id)
+        return like_user(b, a.id).match
+
+    def test_like_creates_two_edges(self):
+        match = self.match(self.other, self.user)
+        self.assertEqual(self.edge_states(), sorted([(self.user.id, self.other.id, True), (self.other.id, self.user.id, True)]))
+        self.assertTrue(is_matched(self.user.id, self.other.id))
+        self.assertEqual(list(match_edges(self.other.id).values_list('match_id', flat=True)), [match.id])
+
+    def test_skip_unlike_and_block_deactivate_both_edges(self):
+        for action, target in (('skip', self.other), ('block', self.third)):
+            self.match(target, self.user)
+            self.client.post(f'/api/v1/matching/{action}/', {'user_id': target.id})
+            self.assertFalse(is_matched(self.user.id, target.id), action)
+            self.assertFalse(is_matched(target.id, self.user.id), action)
+        self.assertFalse(Match.objects.filter(is_active=True).exists())
+
+        # Un nouveau like réciproque réactive le match et ses arêtes
+        like_user(self.other, self.user.id)
+        like_user(self.user, self.other.id)
+        self.assertTrue(is_matched(self.other.id, self.user.id))
+
+    def test_match_lists_read_edges(self):
+        self.match(self.other, self.user)
+        self.match(self.third, self.user)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/matching/recent-matches/')
+        self.assertEqual([item['username'] for item in response.data], ['third', 'other'])
+
+        response = self.client.get('/api/v1/matching/matches/')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_saves_and_rebuild(self):
+        match = Match.objects.create(user1=self.user, user2=self.other)
+        match.is_active = False
+        match.save()
+        self.assertEqual(MatchEdge.objects.filter(match=match, is_active=False).count(), 2)
+
+        MatchEdge.objects.all().delete()
+        self.assertEqual(rebuild_match_edges(), 2)
+        match.delete()
+        self.assertFalse(MatchEdge.objects.exists())
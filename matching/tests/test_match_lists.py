@@ -0,0 +1,114 @@
+# matching/tests/test_match_lists.py
+
+import os
+import time
+from datetime import date
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from matching.models import Match, UserInterest, UserInterestRelation
+from matching.match_edges import create_match_edges, match_edges
+from matching.projections import EDGE_FIELDS, build_match_list
+from matching.serializers import MatchSerializer
+
+User = get_user_model()
+
+class MatchListProjectionTest(TestCase):
+    """The compact match list matches MatchSerializer with a constant query count"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123',
+            latitude=48.85, longitude=2.35, date_of_birth=date(1995, 6, 1)
+        )
+        interests = [UserInterest.objects.create(name=name) for name in ('Musique', 'Sport', 'Cuisine')]
+        now = timezone.now()
+        User.objects.bulk_create([
+            User(
+                username=f'match{i}', email=f'match{i}@example.com', first_name=f'Prénom{i}',
+                bio='Bio', location='Paris', latitude=48.80 + i * 0.001, longitude=2.30,
+                date_of_birth=date(1990, 1 + i % 12, 1), last_activity=now, is_online=i % 2 == 0
+            )
+            for i in range(100)
+        ])
+        users = list(User.objects.filter(username__startswith='match').order_by('id'))
+        UserInterestRelation.objects.bulk_create([
+            UserInterestRelation(user=other, interest=interest)
+            for i, other in enumerate(users) for interest in interests[:i % 4]
+        ])
+        create_match_edges(Match.objects.bulk_create([
+            Match(user1=self.user, user2=other) if self.user.id < other.id else Match(user1=other, user2=self.user)
+            for other in users
+        ]))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def matches(self):
+        return Match.objects.filter(Q(user1=self.user) | Q(user2=self.user), is_active=True).order_by('-created_at', 'id')
+
+    def serializer_data(self, matches):
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        return MatchSerializer(matches, many=True, context={'request': request}).data
+
+    def test_same_output_as_match_serializer(self):
+        matches = self.matches()
+        expected = self.serializer_data(matches.select_related('user1', 'user2').prefetch_related(
+            'user1__interests__interest', 'user2__interests__interest'
+        ))
+        edges = match_edges(self.user.id).order_by('-created_at', 'match_id').values(*EDGE_FIELDS)
+        self.assertEqual(build_match_list(self.user, edges), [dict(item) for item in expected])
+
+    def test_list_views_use_constant_queries(self):
+        with self.assertNumQueries(4):  # COUNT, matchs, profils, intérêts
+            response = self.client.get('/api/v1/matching/matches/', {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertEqual(
+            {len(item['matched_user']['interests']) for item in response.data['results']}, {0, 1, 2, 3}
+        )
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/matching/recent-matches/')
+        self.assertEqual(len(response.data), 100)
+        self.assertEqual(response.data[1]['distance'], 0.0)
+
+    def test_projection_needs_fewer_queries_than_serializer(self):
+        """Serializer path vs projection path for 100 matches"""
+        with CaptureQueriesContext(connection) as serializer_queries:
+            old = self.serializer_data(
+                self.matches().select_related('user1', 'user2').prefetch_related(
+                    'user1__interests__interest', 'user2__interests__interest'
+                )
+            )
+        with CaptureQueriesContext(connection) as projection_queries:
+            new = build_match_list(self.user, match_edges(self.user.id).values(*EDGE_FIELDS))
+        self.assertEqual(len(new), len(old))
+        self.assertLess(len(projection_queries), len(serializer_queries))
+
+    @skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+    def test_benchmark_100_matches(self):
+        """Serializer path vs projection path for 100 matches"""
+        def timed(build):
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                data = build()
+                timings.append(time.perf_counter() - start)
+            return min(timings) * 1000, data
+
+        serializer_ms, old = timed(lambda: self.serializer_data(
+            self.matches().select_related('user1', 'user2').prefetch_related(
+                'user1__interests__interest', 'user2__interests__interest'
+            )
+        ))
+        projection_ms, new = timed(lambda: build_match_list(self.user, match_edges(self.user.id).values(*EDGE_FIELDS)))
+        print(f"\n100 matches: MatchSerializer {serializer_ms:.1f} ms, projection {projection_ms:.1f} ms")
+        self.assertEqual(len(new), len(old))
+        self.assertLess(projection_ms, serializer_ms)
@@ -0,0 +1,131 @@
+# matching/tests/test_presign.py
+
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from unittest import mock
+from rest_framework.test import APIClient, APIRequestFactory
+from accounts.renditions import rendition_key
+from matching import presign
+from matching.match_edges import create_match_edges
+from matching.models import Match
+from matching.presign import PresignedURLSigner
+from matching.serializers import MatchUserSerializer
+
+User = get_user_model()
+
+class FakeClock:
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='test-bucket', AWS_S3_REGION_NAME='us-west-2')
+class PresignedURLSignerTest(TestCase):
+    """Tests for the shared S3 signer and its signed URL cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        self.signer = self.make_signer()
+
+    def make_signer(self):
+        signer = PresignedURLSigner(ttl=3600, refresh_margin=600, access_key='AKIATEST', secret_key='secret')
+        signer.timer = self.clock
+        return signer
+
+    def test_urls_are_stable_until_refresh_margin(self):
+        url = self.signer.sign('profile_pictures/a.jpg')
+        self.assertIn('/test-bucket/profile_pictures/a.jpg', url)
+        self.assertIn('/test-bucket/profil/b.jpg', self.signer.sign('b.jpg'))
+        self.assertEqual(parse_qs(urlparse(url).query)['X-Amz-Expires'], ['3600'])
+
+        self.clock.now += 2999
+        self.assertEqual(self.signer.sign('profile_pictures/a.jpg'), url)
+
+        # Moins de 10 minutes de validité restante : nouvelle signature
+        self.clock.now += 2
+        self.signer.sign('profile_pictures/a.jpg')
+        self.assertEqual(self.signer._urls['profile_pictures/a.jpg'][1], self.clock.now + 3600)
+
+    def test_one_client_per_signer_and_passthrough_keys(self):
+        urls = self.signer.sign_many(['a.jpg', 'b.jpg', None, 'https://cdn.example.com/c.jpg'])
+        client = self.signer.client
+        self.signer.sign_many(['c.jpg'])
+        self.assertIs(self.signer.client, client)
+        self.assertIsNone(urls[None])
+        self.assertEqual(urls['https://cdn.example.com/c.jpg'], 'https://cdn.example.com/c.jpg')
+        self.assertNotEqual(urls['a.jpg'], urls['b.jpg'])
+
+    def test_workers_share_signed_urls_through_cache(self):
+        url = self.signer.sign('a.jpg')
+        other_worker = self.make_signer()
+        self.assertEqual(other_worker.sign('a.jpg'), url)
+        self.assertIsNone(other_worker._client)  # rien à signer
+
+    def test_lru_is_bounded(self):
+        signer = PresignedURLSigner(cache_size=2, access_key='AKIATEST', secret_key='secret')
+        signer.sign_many(['a.jpg', 'b.jpg', 'c.jpg'])
+        self.assertEqual(list(signer._urls), ['b.jpg', 'c.jpg'])
+
+        # Une URL servie depuis le cache n'est pas la prochaine évincée
+        signer.sign('b.jpg')
+        signer.sign('d.jpg')
+        self.assertEqual(list(signer._urls), ['b.jpg', 'd.jpg'])
+
+    def test_page_of_20_is_signed_once(self):
+        keys = [f'user{i}.jpg' for i in range(20)]
+        with mock.patch.object(self.signer, '_sign', wraps=self.signer._sign) as sign:
+            first = self.signer.sign_many(keys)
+            second = self.signer.sign_many(keys)
+        self.assertEqual(sign.call_count, 20)
+        self.assertEqual(second, first)
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='test-bucket')
+class RenditionSelectionTest(TestCase):
+    """Serializers and list views pick the rendition that fits the client hint"""
+
+    def setUp(self):
+        cache.clear()
+        self.previous_signer = presign._signer
+        presign._signer = PresignedURLSigner(access_key='AKIATEST', secret_key='secret')
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+        )
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', date_of_birth=date(1995, 6, 1),
+            profile_picture='profile_pictures/r/abc/1024.jpg'
+        )
+        create_match_edges([Match.objects.create(user1=self.user, user2=other)])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        presign._signer = self.previous_signer
+
+    def picture(self, path, **params):
+        response = self.client.get(path, params)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        item = results[0]
+        return urlparse((item.get('matched_user') or item)['profile_picture']).path
+
+    def test_rendition_keys(self):
+        self.assertEqual(rendition_key('profile_pictures/r/abc/1024.jpg', 300, 'webp'), 'profile_pictures/r/abc/320.webp')
+        self.assertEqual(rendition_key('profile_pictures/r/abc/1024.jpg', 5000), 'profile_pictures/r/abc/1024.jpg')
+        self.assertEqual(rendition_key('profil/legacy.jpg', 128), 'profil/legacy.jpg')
+
+    def test_views_use_hint_or_endpoint_default(self):
+        self.assertEqual(self.picture('/api/v1/matching/matches/'), '/test-bucket/profile_pictures/r/abc/320.jpg')
+        self.assertEqual(
+            self.picture('/api/v1/matching/matches/', img_w=600, img_fmt='webp'),
+            '/test-bucket/profile_pictures/r/abc/640.webp'
+        )
+        self.assertEqual(self.picture('/api/v1/matching/recent-matches/'), '/test-bucket/profile_pictures/r/abc/128.jpg')
+
+        request = APIRequestFactory().get('/', {'img_w': '1000'})
+        request.user = self.user
+        data = MatchUserSerializer(User.objects.get(username='other'), context={'request': request}).data
+        self.assertTrue(data['profile_picture'].split('?')[0].endswith('/1024.jpg'))
@@ -0,0 +1,143 @@
+# matching/tests/test_ranking.py
+
+import os
+import time
+from unittest import mock, skipUnless
+from datetime import date, timedelta
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from matching.deck import invalidate_deck
+from matching.user_index import reset_user_index
+from matching.models import UserInterest, UserInterestRelation, UserPreference
+from matching.ranking import load_candidate_features, score_candidates
+from matching.seen import BloomFilter
+
+User = get_user_model()
+
+def synthetic_candidates(n, seed=42):
+    """Random candidate features around Paris"""
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    features = {
+        'latitude': 48.85 + rng.normal(0, 1.0, n),
+        'longitude': 2.35 + rng.normal(0, 1.0, n),
+        'shared_interests': rng.integers(0, 6, n).astype(float),
+        'last_activity': now - rng.uniform(0, 7 * 86400, n),
+        'age': rng.uniform(18, 60, n),
+        'is_online': rng.random(n) < 0.2,
+    }
+    features['latitude'][::50] = np.nan
+    features['age'][::70] = np.nan
+    viewer = {
+        'latitude': 48.85, 'longitude': 2.35, 'interest_count': 5,
+        'min_age': 25, 'max_age': 35, 'max_distance': 50, 'now': now,
+    }
+    return features, viewer
+
+class ScoreCandidatesTest(TestCase):
+    """Tests for the vectorized scoring stage"""
+
+    def test_signals_move_scores_in_expected_direction(self):
+        now = time.time()
+        features = {
+            'latitude': np.array([48.86, 45.76, np.nan]),
+            'longitude': np.array([2.35, 4.83, np.nan]),
+            'shared_interests': np.array([3.0, 0.0, 0.0]),
+            'last_activity': np.array([now - 3600, now - 6 * 86400, np.nan]),
+            'age': np.array([30.0, 50.0, np.nan]),
+            'is_online': np.array([True, False, False]),
+        }
+        viewer = {
+            'latitude': 48.85, 'longitude': 2.35, 'interest_count': 3,
+            'min_age': 25, 'max_age': 35, 'max_distance': 50, 'now': now,
+        }
+        scores, distances = score_candidates(features, viewer)
+        self.assertGreater(scores[0], scores[1])
+        self.assertLess(distances[0], 2)
+        self.assertTrue(np.isnan(distances[2]))
+        self.assertFalse(np.isnan(scores).any())
+
+    def test_weights_are_configurable(self):
+        features, viewer = synthetic_candidates(100)
+        online_only = dict.fromkeys(['distance', 'interests', 'recency', 'age_fit'], 0.0)
+        online_only['online'] = 1.0
+        scores, _ = score_candidates(features, viewer, online_only)
+        np.testing.assert_array_equal(scores, features['is_online'].astype(float))
+
+    @skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+    def test_benchmark_10k_candidates(self):
+        """Ranking 10k candidates stays within a few milliseconds"""
+        features, viewer = synthetic_candidates(10000)
+        score_candidates(features, viewer)  # échauffement
+
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            scores, _ = score_candidates(features, viewer)
+            np.argsort(-scores, kind='stable')
+            timings.append(time.perf_counter() - start)
+
+        median_ms = sorted(timings)[len(timings) // 2] * 1000
+        self.assertLess(median_ms, 5.0, f"Ranking 10k candidates: median {median_ms:.2f} ms")
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False)
+class RankedPotentialMatchesTest(TestCase):
+    """Tests for the ranked potential matches endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        now = timezone.now()
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123',
+            latitude=48.85, longitude=2.35, last_activity=now, date_of_birth=date(1994, 1, 1)
+        )
+        UserPreference.objects.create(user=self.user, min_age=25, max_age=35, max_distance=500)
+        invalidate_deck(self.user.id)
+        music = UserInterest.objects.create(name='Musique')
+        UserInterestRelation.objects.create(user=self.user, interest=music)
+
+        self.stale = User.objects.create_user(
+            username='stale', email='s@example.com', password='testpass123',
+            latitude=45.76, longitude=4.83, last_activity=now - timedelta(days=6),
+            date_of_birth=date(1994, 1, 1)
+        )
+        self.best = User.objects.create_user(
+            username='best', email='b@example.com', password='testpass123',
+            latitude=48.86, longitude=2.34, last_activity=now, is_online=True,
+            date_of_birth=date(1994, 1, 1)
+        )
+        UserInterestRelation.objects.create(user=self.best, interest=music)
+
+    def test_results_ordered_by_score(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/matching/potential-matches/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([u['username'] for u in response.data['results']], ['best', 'stale'])
+        self.assertEqual(response.data['results'][0]['interests'], ['Musique'])
+        self.assertIsNotNone(response.data['results'][1]['distance'])
+
+    def test_explicit_ordering_bypasses_ranking(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/matching/potential-matches/', {'ordering': 'last_activity'})
+        self.assertEqual([u['username'] for u in response.data['results']], ['stale', 'best'])
+
+class LoadCandidateFeaturesTest(TestCase):
+    """Seen candidates are excluded before the max_candidates cap"""
+
+    def test_seen_rows_do_not_use_up_the_cap(self):
+        users = [User.objects.create_user(username=f'c{i}', email=f'c{i}@example.com') for i in range(30)]
+        seen = BloomFilter.for_capacity(1000, 0.001)
+        for user in users[:20]:
+            seen.add(user.id)
+        queryset = User.objects.filter(id__in=[user.id for user in users]).order_by('id')
+        with mock.patch('matching.ranking.FETCH_CHUNK_SIZE', 4):
+            ids, _ = load_candidate_features(queryset, max_candidates=5, exclude=seen)
+        self.assertEqual(list(ids), [user.id for user in users[20:25]])
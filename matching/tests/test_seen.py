@@ -0,0 +1,102 @@
+# matching/tests/test_seen.py
+
+import random
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from matching.deck import invalidate_deck
+from matching.models import UserPreference, UserSeenFilter, UserSkip
+from matching.user_index import reset_user_index
+from matching.seen import BloomFilter, get_seen_filter, record_seen
+
+User = get_user_model()
+
+class BloomFilterTest(TestCase):
+    """Tests for the Bloom filter"""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter.for_capacity(1000)
+        ids = random.Random(1).sample(range(1, 10 ** 7), 1000)
+        bloom.add_many(ids)
+        self.assertTrue(all(i in bloom for i in ids))
+        self.assertTrue(all(bloom.contains_many(ids)))
+
+    def test_false_positive_rate_within_limit(self):
+        """At capacity, the measured false positive rate stays close to the target"""
+        for rate in (0.01, 0.001):
+            bloom = BloomFilter.for_capacity(10000, rate)
+            bloom.add_many(range(1, 10001))
+            probes = list(range(10 ** 6, 10 ** 6 + 100000))
+            measured = sum(bloom.contains_many(probes)) / len(probes)
+            self.assertLess(measured, rate * 1.5, f"target {rate}, measured {measured}")
+
+    def test_vectorized_lookup_matches_scalar(self):
+        bloom = BloomFilter.for_capacity(50, 0.2)
+        bloom.add_many(range(0, 500, 7))
+        probes = list(range(600))
+        self.assertEqual(list(bloom.contains_many(probes)), [p in bloom for p in probes])
+
+    def test_size_per_item(self):
+        """About 1.2 bytes per recorded profile at a 1% rate"""
+        bloom = BloomFilter.for_capacity(10000, 0.01)
+        self.assertLess(len(bloom.bits), 10000 * 1.25)
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False, MATCHING_SEEN_INITIAL_CAPACITY=4)
+class SeenFilterTest(TestCase):
+    """Tests for the persisted seen filter and its use by candidate generation"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        now = timezone.now()
+        birthdate = date(1995, 6, 1)
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123',
+            last_activity=now, date_of_birth=birthdate
+        )
+        UserPreference.objects.create(user=self.user)
+        invalidate_deck(self.user.id)
+        self.others = [
+            User.objects.create_user(
+                username=f'other{i}', email=f'o{i}@example.com', password='testpass123',
+                last_activity=now, date_of_birth=birthdate
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_skipped_profile_does_not_come_back(self):
+        skipped = self.others[0]
+        response = self.client.post('/api/v1/matching/skip/', {'user_id': skipped.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(UserSkip.objects.filter(user=self.user, skipped_user=skipped).exists())
+        self.assertIn(skipped.id, get_seen_filter(self.user.id))
+
+        for params in ({}, {'search': 'other'}, {'ordering': 'date_joined'}):
+            cache.clear()
+            invalidate_deck(self.user.id)
+            response = self.client.get('/api/v1/matching/potential-matches/', params)
+            self.assertNotIn(skipped.id, [u['id'] for u in response.data['results']], params)
+
+    def test_filter_grows_when_full(self):
+        for other in self.others:
+            self.user.liked_users.add(other)
+            record_seen(self.user.id, [other.id])
+        for _ in range(3):
+            record_seen(self.user.id, [10 ** 6 + _])
+
+        record = UserSeenFilter.objects.get(user=self.user)
+        self.assertGreaterEqual(record.capacity, 8)
+        self.assertTrue(all(other.id in get_seen_filter(self.user.id) for other in self.others))
+
+    def test_unblock_rebuilds_filter(self):
+        blocked = self.others[1]
+        self.client.post('/api/v1/matching/block/', {'user_id': blocked.id})
+        self.assertIn(blocked.id, get_seen_filter(self.user.id))
+
+        self.client.post('/api/v1/matching/unblock/', {'user_id': blocked.id})
+        self.assertNotIn(blocked.id, get_seen_filter(self.user.id))
@@ -0,0 +1,120 @@
+# matching/tests/test_swipes.py
+
+from datetime import date, timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from conversations.models import Conversation
+from matching.deck import invalidate_deck
+from matching.models import Match, UserSkip
+from matching.seen import get_seen_filter, rebuild_seen_filter
+from matching.throttling import reset_throttle_store
+from matching.user_index import reset_user_index
+
+User = get_user_model()
+
+@override_settings(MATCHING_DECK_REFILL_ASYNC=False, MATCHING_LIKE_SIDE_EFFECTS_ASYNC=False)
+class SwipeBatchTest(TestCase):
+    """Tests for the swipes/ batch endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        reset_user_index()
+        reset_throttle_store()
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+        )
+        self.others = [
+            User.objects.create_user(
+                username=f'other{i}', email=f'other{i}@example.com', password='testpass123',
+                date_of_birth=date(1995, 6, 1)
+            )
+            for i in range(4)
+        ]
+        invalidate_deck(self.user.id)
+        rebuild_seen_filter(self.user.id)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.now = timezone.now()
+
+    def swipe(self, user, action, seconds=0):
+        return {'user_id': user.id, 'action': action, 'swiped_at': (self.now + timedelta(seconds=seconds)).isoformat()}
+
+    def post(self, swipes):
+        return self.client.post('/api/v1/matching/swipes/', {'swipes': swipes}, format='json')
+
+    def test_batch_applies_each_decision(self):
+        liker, skipped, blocked, plain = self.others
+        liker.liked_users.add(self.user)
+        blocked.liked_users.add(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([
+                self.swipe(liker, 'like'), self.swipe(skipped, 'skip', 1),
+                self.swipe(blocked, 'block', 2), self.swipe(plain, 'like', 3),
+            ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['status'], item['is_match']) for item in response.data['results']],
+            [('liked', True), ('skipped', False), ('blocked', False), ('liked', False)]
+        )
+        self.assertEqual(response.data['matches'], 1)
+        self.assertEqual(response.data['results'][0]['match']['matched_user']['username'], 'other0')
+
+        self.assertEqual(Match.objects.filter(is_active=True).count(), 1)
+        self.assertTrue(UserSkip.objects.filter(user=self.user, skipped_user=skipped).exists())
+        self.assertTrue(self.user.blocked_users.filter(id=blocked.id).exists())
+        self.assertFalse(blocked.liked_users.filter(id=self.user.id).exists())
+        self.assertEqual(Conversation.objects.filter(participants=self.user).count(), 1)
+        self.assertTrue(all(other.id in get_seen_filter(self.user.id) for other in self.others))
+
+    def test_latest_client_decision_wins(self):
+        target = self.others[0]
+        response = self.post([self.swipe(target, 'skip', 5), self.swipe(target, 'like', 1)])
+        self.assertEqual([item['status'] for item in response.data['results']], ['skipped', 'superseded'])
+        self.assertFalse(self.user.liked_users.exists())
+
+    def test_invalid_targets_are_reported_per_item(self):
+        self.user.blocked_users.add(self.others[1])
+        response = self.post([
+            self.swipe(self.user, 'like'), {'user_id': 999999, 'action': 'like', 'swiped_at': self.now.isoformat()},
+            self.swipe(self.others[1], 'like'), self.swipe(self.others[1], 'block', 1),
+        ])
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['invalid', 'not_found', 'superseded', 'already_blocked']
+        )
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        User.objects.bulk_create([User(username=f'bulk{i}', email=f'bulk{i}@example.com') for i in range(40)])
+        bulk = list(User.objects.filter(username__startswith='bulk').order_by('id'))
+        for other in bulk[1::2]:
+            other.liked_users.add(self.user)  # un like sur deux est réciproque
+
+        def count_queries(users, offset):
+            swipes = [self.swipe(u, 'like' if i % 2 else 'skip', offset + i) for i, u in enumerate(users)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(swipes)
+            self.assertEqual(response.data['matches'], len(users) // 2)
+            return len(queries.captured_queries)
+
+        self.assertEqual(count_queries(bulk[:4], 0), count_queries(bulk[4:], 100))
+
+    def test_notifications_are_published_after_commit(self):
+        liker = self.others[0]
+        liker.liked_users.add(self.user)
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'user_{self.user.id}_notifications', channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post([self.swipe(liker, 'like'), self.swipe(self.others[1], 'like', 1)])
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message['type'], 'match_notification')
+        self.assertEqual(message['data']['match']['user']['username'], 'other0')
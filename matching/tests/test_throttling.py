@@ -0,0 +1,125 @@
+# matching/tests/test_throttling.py
+
+from datetime import date
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from matching.throttling import CacheGCRAStore, GCRARateThrottle, get_throttle_store, reset_throttle_store
+from matching.views import LikeRateThrottle
+
+User = get_user_model()
+
+class FakeClock:
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class GCRARateThrottleTest(TestCase):
+    """Tests for the GCRA throttle and its in-process store"""
+
+    def setUp(self):
+        cache.clear()
+        reset_throttle_store()
+        self.clock = FakeClock()
+        self.user = User.objects.create_user(
+            username='me', email='me@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', date_of_birth=date(1995, 6, 1)
+        )
+
+    def throttle(self, rate='5/min'):
+        throttle_class = type('TestThrottle', (GCRARateThrottle,), {'scope': 'test', 'rate': rate, 'timer': self.clock})
+        return throttle_class()
+
+    def request(self, user):
+        request = APIRequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_burst_then_one_request_per_interval(self):
+        throttle = self.throttle()
+        self.assertEqual([throttle.allow_request(self.request(self.user), None) for _ in range(6)], [True] * 5 + [False])
+        self.assertAlmostEqual(throttle.wait(), 12.0)
+
+        self.clock.now += 11.9
+        self.assertFalse(throttle.allow_request(self.request(self.user), None))
+        self.clock.now += 0.1
+        self.assertTrue(throttle.allow_request(self.request(self.user), None))
+        self.assertFalse(throttle.allow_request(self.request(self.user), None))
+
+        self.clock.now += 60
+        self.assertEqual([throttle.allow_request(self.request(self.user), None) for _ in range(6)], [True] * 5 + [False])
+
+    def test_one_integer_per_key(self):
+        throttle = self.throttle()
+        for _ in range(5):
+            throttle.allow_request(self.request(self.user), None)
+        throttle.allow_request(self.request(self.other), None)
+
+        tat = get_throttle_store().get(throttle.key)
+        self.assertIsInstance(tat, int)
+        self.assertEqual(tat, int(self.clock.now * 1000000) + 12000000)
+        self.assertFalse(throttle.allow_request(self.request(self.user), None))
+
+    def test_cache_store_retries_when_another_worker_wrote_first(self):
+        store = CacheGCRAStore()
+        period, interval = 60 * 1000000, 1000000
+        store.update('k', 0, interval, period)
+
+        # Lecture périmée (clé pas encore créée) : add échoue, on relit et on recommence
+        real_get = store.cache.get
+        with mock.patch.object(store.cache, 'get', side_effect=[None, real_get('k')]):
+            self.assertEqual(store.update('k', 0, interval, period), 0)
+        self.assertEqual(store.get('k'), 2 * interval)
+
+        # Deux stores sur le même cache (deux workers) consomment le même budget
+        other = CacheGCRAStore(store.cache)
+        self.assertEqual(other.update('k', 0, interval, period), 0)
+        self.assertEqual(store.get('k'), 3 * interval)
+
+    def test_like_view_returns_429_with_retry_after(self):
+        throttle = LikeRateThrottle()
+        for _ in range(50):
+            self.assertTrue(throttle.allow_request(self.request(self.user), None))
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/v1/matching/like/', {'user_id': self.other.id})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 72)
+        self.assertFalse(self.user.liked_users.exists())
+
+    def test_swipe_batch_is_charged_per_like(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        def post(likes, skips=0):
+            swiped_at = timezone.now().isoformat()
+            swipes = [{'user_id': self.other.id, 'action': 'like', 'swiped_at': swiped_at}] * likes
+            swipes += [{'user_id': self.other.id, 'action': 'skip', 'swiped_at': swiped_at}] * skips
+            return client.post('/api/v1/matching/swipes/', {'swipes': swipes}, format='json')
+
+        self.assertEqual(post(40, skips=20).status_code, 200)
+        response = post(11)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 72)
+        self.assertEqual(post(10).status_code, 200)
+        self.assertEqual(post(0, skips=1).status_code, 429)  # un lot sans like coûte une unité
+
+    def test_swipe_batch_above_the_like_budget_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        swiped_at = timezone.now().isoformat()
+        swipes = [{'user_id': self.other.id, 'action': 'like', 'swiped_at': swiped_at}] * 51
+        response = client.post('/api/v1/matching/swipes/', {'swipes': swipes}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('50 likes', str(response.data['swipes']))
+        # Le refus n'a consommé qu'une unité
+        response = client.post('/api/v1/matching/swipes/', {'swipes': swipes[:49]}, format='json')
+        self.assertEqual(response.status_code, 200)
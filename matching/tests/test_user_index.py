@@ -0,0 +1,161 @@
+# matching/tests/test_user_index.py
+
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import skipUnless
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from matching.candidates import candidate_queryset
+from matching.models import UserPreference
+from matching.user_index import UserIndex, get_user_index, load_user_index, reset_user_index
+
+User = get_user_model()
+
+def synthetic_rows(n, seed=7):
+    """Random index rows around Paris"""
+    rng = random.Random(seed)
+    now = timezone.now()
+    rows = []
+    for user_id in range(1, n + 1):
+        rows.append((
+            user_id,
+            date(1960, 1, 1) + timedelta(days=rng.randrange(0, 45 * 365)) if rng.random() > 0.05 else None,
+            rng.choice(['M', 'F', 'O', None]),
+            48.85 + rng.gauss(0, 1.0) if rng.random() > 0.1 else None,
+            2.35 + rng.gauss(0, 1.0),
+            now - timedelta(seconds=rng.randrange(0, 14 * 86400)) if rng.random() > 0.05 else None,
+            rng.random() < 0.2,
+            bytes([rng.randrange(0, 256)]),
+        ))
+    return rows
+
+class UserIndexTest(TestCase):
+    """Tests for the columnar index structure"""
+
+    def setUp(self):
+        self.viewer = SimpleNamespace(id=1, latitude=48.85, longitude=2.35)
+        self.preferences = SimpleNamespace(min_age=25, max_age=35, gender_preference='F', max_distance=50)
+
+    def test_upsert_keeps_rows_sorted(self):
+        index = UserIndex(capacity=2)
+        now = timezone.now()
+        for user_id in (5, 9, 2, 7):
+            index.upsert((user_id, date(1995, 1, 1), 'F', 48.85, 2.35, now, False))
+        self.assertEqual(index._columns['ids'][:len(index)].tolist(), [2, 5, 7, 9])
+
+        index.upsert((7, date(1995, 1, 1), 'M', 48.85, 2.35, now, False))
+        index.remove(5)
+        ids, _ = index.query(self.viewer, self.preferences)
+        self.assertEqual(ids.tolist(), [2, 9])
+
+    def test_query_applies_preferences(self):
+        now = timezone.now()
+        index = UserIndex()
+        index.load([
+            (2, date(1995, 1, 1), 'F', 48.86, 2.34, now, False, b''),
+            (3, date(1995, 1, 1), 'M', 48.86, 2.34, now, False, b''),             # genre
+            (4, date(1960, 1, 1), 'F', 48.86, 2.34, now, False, b''),             # âge
+            (5, date(1995, 1, 1), 'F', 45.76, 4.83, now, False, b''),             # distance
+            (6, date(1995, 1, 1), 'F', 48.86, 2.34, now - timedelta(days=30), False, b''),  # inactif
+            (7, date(1995, 1, 1), 'F', 48.86, 2.34, None, True, b''),             # en ligne
+            (8, None, 'F', 48.86, 2.34, now, False, b''),                          # âge inconnu
+        ])
+        ids, features = index.query(self.viewer, self.preferences)
+        self.assertEqual(ids.tolist(), [2, 7])
+        self.assertAlmostEqual(features['age'][0], (date.today() - date(1995, 1, 1)).days / 365.25, places=3)
+
+    def test_memory_per_user(self):
+        index = UserIndex()
+        index.load(synthetic_rows(10000))
+        self.assertEqual(index.nbytes / len(index._columns['ids']), 39)
+
+    @skipUnless(os.getenv('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+    def test_benchmark_1m_users(self):
+        """Filtering 1M indexed users takes a few milliseconds"""
+        n = 1000000
+        rng = np.random.default_rng(3)
+        index = UserIndex(capacity=n)
+        columns = index._columns
+        columns['ids'][:] = np.arange(1, n + 1)
+        columns['birth'][:] = date(1970, 1, 1).toordinal() + rng.integers(0, 40 * 365, n)
+        columns['gender'][:] = rng.integers(1, 4, n)
+        columns['latitude'][:] = 46.5 + rng.normal(0, 2.0, n)
+        columns['longitude'][:] = 2.5 + rng.normal(0, 2.0, n)
+        columns['last_activity'][:] = time.time() - rng.uniform(0, 14 * 86400, n)
+        columns['online'][:] = rng.random(n) < 0.1
+        columns['alive'][:] = True
+        index._size = n
+
+        index.query(self.viewer, self.preferences)  # échauffement
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            ids, _ = index.query(self.viewer, self.preferences)
+            timings.append(time.perf_counter() - start)
+        median_ms = sorted(timings)[len(timings) // 2] * 1000
+        self.assertLess(median_ms, 100.0, f"Index query over 1M users: median {median_ms:.1f} ms, "
+                                          f"{len(ids)} candidates, {index.nbytes / 1e6:.0f} MB")
+
+class UserIndexDatabaseTest(TestCase):
+    """The index returns the same candidates as the SQL filters and follows saves"""
+
+    def setUp(self):
+        reset_user_index()
+        rng = random.Random(11)
+        now = timezone.now()
+        self.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='testpass123',
+            latitude=48.85, longitude=2.35, last_activity=now, date_of_birth=date(1990, 1, 1)
+        )
+        User.objects.bulk_create([
+            User(
+                username=f'user{i}', email=f'user{i}@example.com',
+                date_of_birth=date_of_birth, gender=gender or '', latitude=latitude,
+                longitude=longitude if latitude is not None else None,
+                last_activity=last_activity, is_online=is_online, is_active=rng.random() > 0.05
+            )
+            for i, (_, date_of_birth, gender, latitude, longitude, last_activity, is_online, _)
+            in enumerate(synthetic_rows(120, seed=5))
+        ])
+
+    def test_matches_sql_filters(self):
+        index = load_user_index()
+        for min_age, max_age, gender, max_distance in [
+            (18, 99, 'A', 50), (25, 35, 'F', 100), (30, 60, 'M', 0), (18, 40, 'O', 500),
+        ]:
+            preferences = UserPreference(
+                user=self.viewer, min_age=min_age, max_age=max_age,
+                gender_preference=gender, max_distance=max_distance
+            )
+            expected = set(
+                candidate_queryset(self.viewer, preferences).filter(is_active=True).values_list('id', flat=True)
+            )
+            ids, _ = index.query(self.viewer, preferences)
+            self.assertEqual(set(ids.tolist()), expected, (min_age, max_age, gender, max_distance))
+
+    def test_saves_are_applied_on_commit(self):
+        index = get_user_index()
+        preferences = UserPreference(user=self.viewer, min_age=18, max_age=99, gender_preference='A', max_distance=0)
+        newcomer_birthdate = date(1992, 5, 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = User.objects.create_user(
+                username='newcomer', email='new@example.com', password='testpass123',
+                date_of_birth=newcomer_birthdate, last_activity=timezone.now()
+            )
+        self.assertIn(newcomer.id, index.query(self.viewer, preferences)[0].tolist())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.last_activity = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+            newcomer.save()
+        self.assertNotIn(newcomer.id, index.query(self.viewer, preferences)[0].tolist())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.delete()
+        self.assertEqual(len(get_user_index()), User.objects.filter(is_active=True).count())
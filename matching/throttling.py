@@ -0,0 +1,172 @@
+# matching/throttling.py
+
+"""
+Limitation de débit par GCRA (generic cell rate algorithm).
+
+Pour un débit de N requêtes par période P, chaque requête « coûte »
+T = P / N. On ne garde qu'un entier par clé : le TAT (theoretical arrival
+time, en microsecondes). Une requête est acceptée si max(TAT, now) + T - now
+<= P ; le TAT devient alors max(TAT, now) + T. Le comportement est celui de
+SimpleRateThrottle (N requêtes d'affilée, puis une toutes les T), sans la
+liste d'horodatages que DRF relit et réécrit à chaque requête.
+
+Une requête peut coûter plusieurs unités (get_cost) : elle avance alors le
+TAT de cost × T, et n'est acceptée que si le budget restant la couvre en
+entier.
+
+La mise à jour est atomique : script Lua côté Redis quand
+MATCHING_THROTTLE_REDIS_URL est configuré, sinon lecture puis écriture
+conditionnelle (cache.add) dans le cache Django, recommencée en cas de
+conflit. Avec LocMemCache, ce cache est propre à chaque processus : la
+limite s'applique alors par worker.
+"""
+
+import logging
+import math
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import UserRateThrottle
+
+logger = logging.getLogger(__name__)
+
+MICROSECONDS = 1000000
+
+# KEYS[1] = clé ; ARGV = now, intervalle T, période P (µs).
+# Retourne 0 si la requête passe, sinon l'attente en µs.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+if new_tat - now > period then
+    return new_tat - now - period
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) / 1000))
+return 0
+"""
+
+
+class CacheGCRAStore:
+    """
+    TAT par clé dans le cache Django (LocMemCache en développement, cache
+    partagé entre workers sinon), sans verrou : lecture, puis écriture
+    conditionnelle, recommencée si un autre worker a écrit entre-temps.
+    """
+
+    # Au-delà, la requête passe (comme une erreur du magasin) plutôt que d'attendre
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, cache=None):
+        self.cache = cache or caches[getattr(settings, 'MATCHING_THROTTLE_CACHE', 'default')]
+
+    def update(self, key, now, interval, period):
+        for _ in range(self.MAX_ATTEMPTS):
+            stored = self.cache.get(key)
+            tat = max(stored or now, now)
+            new_tat = tat + interval
+            if new_tat - now > period:
+                return new_tat - now - period
+            timeout = math.ceil((new_tat - now) / MICROSECONDS)
+            if stored is None:
+                # add échoue si un autre worker a créé la clé entre-temps
+                if self.cache.add(key, new_tat, timeout):
+                    return 0
+            # Le TAT ne fait que croître : un seul worker peut réserver le passage
+            # depuis la valeur lue, les autres relisent la nouvelle
+            elif self.cache.add(f'{key}:from:{stored}', 1, timeout):
+                self.cache.set(key, new_tat, timeout)
+                return 0
+        logger.warning(f"Throttle update contention for {key}, request allowed")
+        return 0
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class RedisGCRAStore:
+    """TAT par clé dans Redis, mis à jour par un script Lua (un aller-retour, EVALSHA)"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(GCRA_SCRIPT)
+
+    def update(self, key, now, interval, period):
+        return int(self._script(keys=[key], args=[now, interval, period]))
+
+    def get(self, key):
+        value = self._client.get(key)
+        return int(value) if value is not None else None
+
+    def clear(self):
+        pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    """Redis quand MATCHING_THROTTLE_REDIS_URL est configuré, sinon le cache Django"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                redis_url = getattr(settings, 'MATCHING_THROTTLE_REDIS_URL', None)
+                if redis_url:
+                    try:
+                        _store = RedisGCRAStore(redis_url)
+                    except Exception as e:
+                        logger.error(f"Redis throttle store unavailable, using cache store: {e}")
+                if _store is None:
+                    _store = CacheGCRAStore()
+    return _store
+
+
+def reset_throttle_store():
+    """Vide le magasin (tests)"""
+    get_throttle_store().clear()
+
+
+class GCRARateThrottle(UserRateThrottle):
+    """
+    Remplace UserRateThrottle : même syntaxe de débit ('100/hour'), mêmes
+    clés (utilisateur, ou IP pour les anonymes), un entier par clé.
+    """
+
+    cache_format = 'throttle_gcra_%(scope)s_%(ident)s'
+
+    def get_cost(self, request, view):
+        """Nombre d'unités du débit consommées par la requête"""
+        return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        period = self.duration * MICROSECONDS
+        interval = period // self.num_requests * self.get_cost(request, view)
+        self.now = int(self.timer() * MICROSECONDS)
+        try:
+            self.retry_after = get_throttle_store().update(self.key, self.now, interval, period)
+        except Exception as e:
+            # Le throttle ne doit pas rendre l'API indisponible
+            logger.error(f"Throttle store error for {self.key}: {e}")
+            return True
+        return self.retry_after == 0
+
+    def wait(self):
+        return getattr(self, 'retry_after', 0) / MICROSECONDS or None
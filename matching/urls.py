@@ -5,7 +5,7 @@ from .views import (
     UserPreferenceView, PotentialMatchesView, MatchViewSet,
     LikeView, UnlikeView, BlockUserView, UnblockUserView,
     MatchesListView, UserInterestsView, SkipUserView,
-    RecentMatchesView
+    RecentMatchesView, SwipeBatchView, IncomingLikesView, IncomingLikesCountView
 )
 
 urlpatterns = [
@@ -17,11 +17,14 @@ urlpatterns = [
     path('potential-matches/', PotentialMatchesView.as_view(), name='potential-matches'),
     path('matches/', MatchesListView.as_view(), name='matches-list'),
     path('recent-matches/', RecentMatchesView.as_view(), name='recent-matches'),
+    path('likes/received/', IncomingLikesView.as_view(), name='incoming-likes'),
+    path('likes/received/count/', IncomingLikesCountView.as_view(), name='incoming-likes-count'),
     
     # User interactions
     path('like/', LikeView.as_view(), name='like-user'),
     path('unlike/', UnlikeView.as_view(), name='unlike-user'),
     path('skip/', SkipUserView.as_view(), name='skip-user'),
+    path('swipes/', SwipeBatchView.as_view(), name='swipe-batch'),
     path('block/', BlockUserView.as_view(), name='block-user'),
     path('unblock/', UnblockUserView.as_view(), name='unblock-user'),
     
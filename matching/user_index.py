@@ -0,0 +1,432 @@
+# matching/user_index.py
+
+"""
+Per-process columnar index of discoverable users.
+
+Candidate filtering for the default preference combinations (age range,
+gender, recent activity, distance) runs as vectorized masks over NumPy
+columns instead of a SQL query. The index is loaded lazily from the
+database, kept up to date in this process by the User save/delete signals
+(applied on commit) and fully reloaded after MATCHING_USER_INDEX_MAX_AGE
+seconds so that writes made by other processes are picked up.
+
+Memory: rows are sorted by id (ids are looked up with a binary search, no
+Python dict per user) and take 39 bytes each while there are at most 64 interests (bitset positions
+are the dense ordinals UserInterest.bit, not ids):
+
+    id (int64) 8 + birth ordinal (int32) 4 + gender (int8) 1
+    + latitude/longitude (float32) 8 + last_activity (float64) 8
+    + online (bool) 1 + alive (bool) 1
+    + interest bitset (uint64 words) 8 per 64 interests
+
+i.e. about 39 MB per 1M users, up to 78 MB right after the arrays double.
+A query allocates a few temporary masks (about 1 MB each per 1M users).
+"""
+
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .candidates import ACTIVE_WINDOW_DAYS
+from .geo import bounding_box
+from .interests import pack_bitsets, word_count
+from .ranking import haversine_km_array
+
+try:
+    import numpy as np
+    USER_INDEX_AVAILABLE = True
+except ImportError:  # pragma: no cover - numpy est listé dans requirements.txt
+    np = None
+    USER_INDEX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Codes de genre stockés dans la colonne int8 (0 = inconnu)
+GENDER_CODES = {'M': 1, 'F': 2, 'O': 3}
+
+# Durée de vie d'un index avant rechargement complet (secondes)
+DEFAULT_MAX_AGE = 300
+
+LOAD_CHUNK_SIZE = 10000
+
+# Champs de User lus par l'index, dans l'ordre des lignes
+INDEX_FIELDS = ('id', 'date_of_birth', 'gender', 'latitude', 'longitude', 'last_activity', 'is_online')
+
+_COLUMNS = (
+    ('ids', 'int64'),
+    ('birth', 'int32'),
+    ('gender', 'int8'),
+    ('latitude', 'float32'),
+    ('longitude', 'float32'),
+    ('last_activity', 'float64'),
+    ('online', 'bool'),
+    ('alive', 'bool'),
+)
+
+
+def _encode(row):
+    """(id, date_of_birth, gender, latitude, longitude, last_activity, is_online) -> valeurs de colonnes"""
+    user_id, date_of_birth, gender, latitude, longitude, last_activity, is_online = row
+    return {
+        'ids': user_id,
+        'birth': date_of_birth.toordinal() if date_of_birth else 0,
+        'gender': GENDER_CODES.get(gender, 0),
+        'latitude': latitude if latitude is not None else np.nan,
+        'longitude': longitude if longitude is not None else np.nan,
+        'last_activity': last_activity.timestamp() if last_activity else np.nan,
+        'online': bool(is_online),
+        'alive': True,
+    }
+
+
+class UserIndex:
+    """Sorted columnar arrays of discoverable users"""
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.RLock()
+        self._size = 0
+        self._tombstones = 0
+        self._columns = self._allocate(capacity)
+        self.loaded_at = None
+
+    @staticmethod
+    def _allocate(capacity, width=1):
+        columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in _COLUMNS}
+        # Bitsets d'intérêts : une ligne de `width` mots uint64 par utilisateur
+        columns['interests'] = np.zeros((capacity, width), dtype=np.uint64)
+        columns['latitude'].fill(np.nan)
+        columns['longitude'].fill(np.nan)
+        columns['last_activity'].fill(np.nan)
+        return columns
+
+    def __len__(self):
+        return self._size - self._tombstones
+
+    @property
+    def nbytes(self):
+        """Mémoire occupée par les colonnes (capacité allouée comprise)"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    @property
+    def width(self):
+        return self._columns['interests'].shape[1]
+
+    def load(self, rows):
+        """Remplace le contenu de l'index par `rows` (INDEX_FIELDS puis interest_bits)"""
+        chunks = {name: [] for name, _ in _COLUMNS}
+        chunks['interests'] = []
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == LOAD_CHUNK_SIZE:
+                self._encode_chunk(batch, chunks)
+                batch = []
+        self._encode_chunk(batch, chunks)
+
+        loaded = {name: np.concatenate(chunks[name]).astype(dtype) for name, dtype in _COLUMNS}
+        loaded['interests'] = pack_bitsets(chunks['interests'])
+        size = len(loaded['ids'])
+        if size and not np.all(np.diff(loaded['ids']) > 0):
+            order = np.argsort(loaded['ids'], kind='stable')
+            loaded = {name: column[order] for name, column in loaded.items()}
+
+        columns = self._allocate(max(1024, size), loaded['interests'].shape[1])
+        for name, column in loaded.items():
+            columns[name][:size] = column
+        with self._lock:
+            self._columns = columns
+            self._size = size
+            self._tombstones = 0
+            self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _encode_chunk(rows, chunks):
+        """Encode un bloc de lignes en colonnes (une liste par colonne, pas d'objet par ligne)"""
+        user_ids, births, genders, latitudes, longitudes, activities, online, interests = (
+            zip(*rows) if rows else ((),) * (len(INDEX_FIELDS) + 1)
+        )
+        chunks['ids'].append(np.array(user_ids, dtype=np.int64))
+        chunks['birth'].append(np.array([d.toordinal() if d else 0 for d in births], dtype=np.int32))
+        chunks['gender'].append(np.array([GENDER_CODES.get(g, 0) for g in genders], dtype=np.int8))
+        chunks['latitude'].append(np.array([np.nan if v is None else v for v in latitudes], dtype=np.float32))
+        chunks['longitude'].append(np.array([np.nan if v is None else v for v in longitudes], dtype=np.float32))
+        chunks['last_activity'].append(
+            np.array([a.timestamp() if a else np.nan for a in activities], dtype=np.float64)
+        )
+        chunks['online'].append(np.array([bool(o) for o in online], dtype=bool))
+        chunks['alive'].append(np.ones(len(rows), dtype=bool))
+        chunks['interests'].extend(bytes(data or b'') for data in interests)
+
+    def _grow(self):
+        capacity = len(self._columns['ids'])
+        columns = self._allocate(capacity * 2, self.width)
+        for name, column in self._columns.items():
+            columns[name][:self._size] = column[:self._size]
+        self._columns = columns
+
+    def _widen(self, width):
+        interests = np.zeros((len(self._columns['ids']), width), dtype=np.uint64)
+        interests[:, :self.width] = self._columns['interests']
+        self._columns['interests'] = interests
+
+    def _find(self, user_id):
+        position = int(np.searchsorted(self._columns['ids'][:self._size], user_id))
+        found = position < self._size and self._columns['ids'][position] == user_id
+        return position, found
+
+    def upsert(self, row, interest_bits=None):
+        """
+        Ajoute ou met à jour un utilisateur.
+
+        Sans `interest_bits`, le bitset d'une ligne existante est conservé
+        (il est tenu à jour par set_interests).
+        """
+        values = _encode(row)
+        with self._lock:
+            position, found = self._find(values['ids'])
+            if found:
+                if not self._columns['alive'][position]:
+                    self._tombstones -= 1
+            else:
+                if self._size == len(self._columns['ids']):
+                    self._grow()
+                if position < self._size:
+                    # Identifiant plus petit que le dernier : décalage des lignes suivantes
+                    for column in self._columns.values():
+                        column[position + 1:self._size + 1] = column[position:self._size]
+                self._columns['interests'][position] = 0
+                self._size += 1
+            for name, value in values.items():
+                self._columns[name][position] = value
+            if interest_bits is not None:
+                self._set_interests(position, interest_bits)
+
+    def _set_interests(self, position, data):
+        if word_count(data) > self.width:
+            self._widen(word_count(data))
+        self._columns['interests'][position] = pack_bitsets([data], self.width)[0]
+
+    def set_interests(self, user_id, data):
+        """Remplace le bitset d'intérêts d'un utilisateur indexé"""
+        with self._lock:
+            position, found = self._find(user_id)
+            if found:
+                self._set_interests(position, data)
+
+    def remove(self, user_id):
+        """Retire un utilisateur (pierre tombale, compactage différé)"""
+        with self._lock:
+            position, found = self._find(user_id)
+            if not found or not self._columns['alive'][position]:
+                return
+            self._columns['alive'][position] = False
+            self._tombstones += 1
+            if self._tombstones > max(1024, self._size // 4):
+                self._compact()
+
+    def _compact(self):
+        keep = np.flatnonzero(self._columns['alive'][:self._size])
+        columns = self._allocate(max(1024, len(keep) * 2), self.width)
+        for name, column in self._columns.items():
+            columns[name][:len(keep)] = column[keep]
+        self._columns = columns
+        self._size = len(keep)
+        self._tombstones = 0
+
+    def query(self, user, preferences, now=None, today=None):
+        """
+        Candidates of `user` matching their preferences.
+
+        Same semantics as matching.candidates.candidate_queryset without the
+        like/skip/block exclusions, which the caller applies.
+
+        Returns:
+            tuple: (ids array, features dict in the matching.ranking format,
+            with the candidates' interest bitsets as `interest_words`)
+        """
+        now = (now or timezone.now()).timestamp()
+        today = today or date.today()
+
+        with self._lock:
+            n = self._size
+            columns = {name: column[:n] for name, column in self._columns.items()}
+            mask = columns['alive'] & (columns['ids'] != user.id)
+
+            birth = columns['birth']
+            if preferences.min_age:
+                max_birth = (today - timedelta(days=preferences.min_age * 365)).toordinal()
+                mask &= (birth > 0) & (birth <= max_birth)
+            if preferences.max_age:
+                min_birth = (today - timedelta(days=preferences.max_age * 365)).toordinal()
+                mask &= (birth > 0) & (birth >= min_birth)
+
+            if preferences.gender_preference and preferences.gender_preference != 'A':
+                mask &= columns['gender'] == GENDER_CODES.get(preferences.gender_preference, -1)
+
+            active_threshold = now - ACTIVE_WINDOW_DAYS * 86400
+            mask &= (columns['last_activity'] >= active_threshold) | columns['online']
+
+            if preferences.max_distance and user.latitude is not None and user.longitude is not None:
+                # Préfiltre rectangulaire puis distance exacte sur les lignes restantes
+                min_lat, max_lat, lon_ranges = bounding_box(user.latitude, user.longitude, preferences.max_distance)
+                latitude, longitude = columns['latitude'], columns['longitude']
+                mask &= (latitude >= min_lat) & (latitude <= max_lat)
+                if lon_ranges:
+                    in_lon = np.zeros(n, dtype=bool)
+                    for min_lon, max_lon in lon_ranges:
+                        in_lon |= (longitude >= min_lon) & (longitude <= max_lon)
+                    mask &= in_lon
+
+                positions = np.flatnonzero(mask)
+                distances = haversine_km_array(
+                    user.latitude, user.longitude,
+                    latitude[positions].astype(float), longitude[positions].astype(float)
+                )
+                positions = positions[distances <= preferences.max_distance]
+            else:
+                positions = np.flatnonzero(mask)
+
+            ids = columns['ids'][positions]
+            birth = columns['birth'][positions]
+            features = {
+                'latitude': columns['latitude'][positions].astype(float),
+                'longitude': columns['longitude'][positions].astype(float),
+                'last_activity': columns['last_activity'][positions],
+                'age': np.where(birth > 0, (today.toordinal() - birth) / 365.25, np.nan),
+                'is_online': columns['online'][positions],
+                'interest_words': columns['interests'][positions],
+            }
+        return ids, features
+
+
+def discoverable_users():
+    """Utilisateurs indexés : comptes actifs"""
+    return get_user_model().objects.filter(is_active=True)
+
+
+def load_user_index(index=None):
+    """Charge (ou recharge) l'index depuis la base, par blocs"""
+    index = index or UserIndex()
+    started = time.perf_counter()
+    rows = discoverable_users().order_by('id').values_list(
+        *INDEX_FIELDS, 'interest_bits'
+    ).iterator(chunk_size=LOAD_CHUNK_SIZE)
+    index.load(rows)
+    logger.info(
+        f"User index loaded: {len(index)} users, {index.nbytes / 1e6:.1f} MB "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+_reloading = False
+
+
+def user_index_enabled():
+    return USER_INDEX_AVAILABLE and getattr(settings, 'MATCHING_USER_INDEX_ENABLED', True)
+
+
+def _reload_in_background():
+    global _index, _reloading
+    try:
+        index = load_user_index()
+        with _index_lock:
+            _index = index
+    except Exception as e:
+        logger.error(f"User index reload failed: {e}")
+    finally:
+        close_old_connections()
+        _reloading = False
+
+
+def get_user_index():
+    """
+    Index du processus.
+
+    Le premier appel charge l'index ; une fois expiré, il est rechargé en
+    arrière-plan pendant que l'ancien continue de servir.
+    """
+    global _index, _reloading
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_user_index()
+            return _index
+
+    max_age = getattr(settings, 'MATCHING_USER_INDEX_MAX_AGE', DEFAULT_MAX_AGE)
+    if time.monotonic() - index.loaded_at > max_age and not _reloading:
+        with _index_lock:
+            if not _reloading:
+                _reloading = True
+                threading.Thread(target=_reload_in_background, name='user-index-reload', daemon=True).start()
+    return index
+
+
+def reset_user_index():
+    """Oublie l'index du processus (rechargé au prochain appel)"""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def sync_user(user):
+    """Reporte l'état d'un utilisateur dans l'index chargé (sans effet s'il n'est pas chargé)"""
+    index = _index
+    if index is None:
+        return
+    if user.is_active:
+        index.upsert(tuple(getattr(user, field) for field in INDEX_FIELDS))
+    else:
+        index.remove(user.id)
+
+
+def sync_user_interests(user_id, data):
+    """Reporte un nouveau bitset d'intérêts dans l'index chargé, après validation"""
+    def apply():
+        index = _index
+        if index is not None:
+            index.set_interests(user_id, data)
+    transaction.on_commit(apply)
+
+
+def forget_user(user_id):
+    index = _index
+    if index is not None:
+        index.remove(user_id)
+
+
+def indexed_candidates(user, preferences, exclude=None, max_candidates=None):
+    """
+    Candidats de `user` servis par l'index, sans requête SQL de filtrage.
+
+    Les utilisateurs bloqués sont retirés, ainsi que ceux présents dans
+    `exclude` (matching.seen.BloomFilter). Au-delà de `max_candidates`, on
+    garde les plus récemment actifs.
+
+    Returns:
+        tuple: (ids array, features dict)
+    """
+    ids, features = get_user_index().query(user, preferences)
+
+    keep = ~np.isin(ids, list(user.blocked_users.values_list('id', flat=True)))
+    if exclude is not None and len(ids):
+        keep &= ~np.asarray(exclude.contains_many(ids), dtype=bool)
+    if not keep.all():
+        ids = ids[keep]
+        features = {name: column[keep] for name, column in features.items()}
+
+    if max_candidates and len(ids) > max_candidates:
+        recent = np.argpartition(-np.nan_to_num(features['last_activity'], nan=0.0), max_candidates - 1)
+        recent = np.sort(recent[:max_candidates])
+        ids = ids[recent]
+        features = {name: column[recent] for name, column in features.items()}
+    return ids, features
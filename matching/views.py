@@ -3,24 +3,36 @@
 from rest_framework import status, generics, permissions, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Count, F, Prefetch
+from django.db import transaction
+from django.db.models import Q, Count, F, Prefetch, Exists, OuterRef, prefetch_related_objects
 from django.utils import timezone
 from django.core.cache import cache
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from datetime import timedelta, date
-from .models import UserPreference, UserInterest, Match
+import secrets
+from .models import UserPreference, UserInterest, UserInterestRelation, Match, MatchEdge, UserSkip
+from .candidates import apply_distance_filter, apply_preference_filters, base_candidate_queryset
+from .ranking import RANKING_AVAILABLE, rank_candidates
+from .deck import discard_from_deck, invalidate_deck, pop_deck_page
+from .generations import DEFAULT_VERSIONED_TTL, bump_generation, versioned_key
+from .seen import get_seen_filter, rebuild_seen_filter, record_seen
+from .incoming import get_incoming_like_count, pending_likes, tracking_incoming_likes
+from .interests import get_interest_catalog, set_user_interests
+from .match_edges import deactivate_matches_with, match_edges
+from .presign import requested_rendition
+from .projections import EDGE_FIELDS, build_match_list, build_recent_match_list
+from .likes import ALREADY_LIKED, BLOCKED, NOT_FOUND, like_user
+from .swipes import submit_swipes
+from .throttling import GCRARateThrottle
 from .serializers import (
     UserPreferenceSerializer, MatchUserSerializer,
-    MatchSerializer, LikeUserSerializer
+    MatchSerializer, LikeUserSerializer, SwipeBatchSerializer, IncomingLikeSerializer
 )
-from conversations.notifications import notify_new_match, notify_like
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 
 User = get_user_model()
 
@@ -28,62 +40,42 @@ def get_current_user(request):
     """Helper function to get current user from Django authentication"""
     return getattr(request, 'user', None) if hasattr(request, 'user') and request.user.is_authenticated else None
 
-def send_match_notification(user_id, match_data):
-    """Send WebSocket notification for new match"""
-    channel_layer = get_channel_layer()
-    if channel_layer:
-        async_to_sync(channel_layer.group_send)(
-            f'user_{user_id}_notifications',
-            {
-                'type': 'match_notification',
-                'data': {
-                    'type': 'new_match',
-                    'match': match_data
-                }
-            }
-        )
-
-def create_conversation_for_match(user1, user2):
-    """Create a conversation when users match"""
-    from conversations.models import Conversation, Message
-    
-    # Check if conversation already exists
-    existing_conversation = Conversation.objects.filter(
-        participants=user1
-    ).filter(
-        participants=user2
-    ).first()
-    
-    if existing_conversation:
-        return existing_conversation
-    
-    # Create new conversation
-    conversation = Conversation.objects.create()
-    conversation.participants.add(user1, user2)
-    
-    # Create initial welcome message
-    welcome_message = Message.objects.create(
-        conversation=conversation,
-        sender=user1,  # Or could be system user
-        content="Vous avez matché! Commencez la conversation."
-    )
-    
-    return conversation
-
 class CustomPagination(PageNumberPagination):
     """Pagination personnalisée pour les listes"""
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class MatchingRateThrottle(UserRateThrottle):
+class IncomingLikesPagination(CursorPagination):
+    """Pagination par curseur (keyset) sur l'id des likes, du plus récent au plus ancien"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+class MatchingRateThrottle(GCRARateThrottle):
     """Rate limiting spécifique pour les actions de matching"""
+    scope = 'matching'
     rate = '100/hour'  # 100 actions par heure par utilisateur
 
-class LikeRateThrottle(UserRateThrottle):
+class LikeRateThrottle(GCRARateThrottle):
     """Rate limiting pour les likes"""
+    scope = 'likes'
     rate = '50/hour'  # 50 likes par heure par utilisateur
 
+class SwipeLikeRateThrottle(LikeRateThrottle):
+    """Budget des likes appliqué aux lots : un lot coûte un like par swipe 'like' (au moins un)"""
+    
+    def get_cost(self, request, view):
+        swipes = request.data.get('swipes') if hasattr(request.data, 'get') else None
+        if not isinstance(swipes, list):
+            return 1
+        likes = sum(1 for swipe in swipes if isinstance(swipe, dict) and swipe.get('action') == 'like')
+        if likes > self.num_requests:
+            # Lot refusé en 400 par SwipeBatchSerializer : il ne consomme pas tout le budget
+            return 1
+        return max(likes, 1)
+
 class UserPreferenceView(generics.RetrieveUpdateAPIView):
     """Vue pour récupérer et mettre à jour les préférences de l'utilisateur"""
     serializer_class = UserPreferenceSerializer
@@ -98,6 +90,12 @@ class UserPreferenceView(generics.RetrieveUpdateAPIView):
         # Récupère ou crée les préférences de l'utilisateur
         obj, created = UserPreference.objects.get_or_create(user=current_user)
         return obj
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # Les préférences changent les filtres : caches et deck sont à reconstruire
+        bump_generation(serializer.instance.user_id)
+        invalidate_deck(serializer.instance.user_id)
 
 class UserInterestsView(generics.ListCreateAPIView):
     """Vue pour gérer les intérêts de l'utilisateur"""
@@ -122,16 +120,18 @@ class UserInterestsView(generics.ListCreateAPIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        all_interests = self.get_queryset()
-        user_interests = current_user.interests.all()
-        
-        interests_data = []
-        for interest in all_interests:
-            interests_data.append({
-                'id': interest.id,
-                'name': interest.name,
-                'is_selected': interest in user_interests
-            })
+        # Catalogue en cache du processus + une seule requête pour les intérêts de l'utilisateur
+        selected_ids = set(
+            UserInterestRelation.objects.filter(user=current_user).values_list('interest_id', flat=True)
+        )
+        interests_data = [
+            {
+                'id': interest_id,
+                'name': name,
+                'is_selected': interest_id in selected_ids
+            }
+            for interest_id, name in get_interest_catalog()
+        ]
         
         return Response(interests_data)
     
@@ -146,20 +146,11 @@ class UserInterestsView(generics.ListCreateAPIView):
         
         interest_ids = request.data.get('interest_ids', [])
         
-        # Supprime tous les intérêts actuels
-        current_user.interests.all().delete()
-        
-        # Ajoute les nouveaux intérêts
-        for interest_id in interest_ids:
-            try:
-                interest = UserInterest.objects.get(id=interest_id)
-                current_user.interests.create(interest=interest)
-            except UserInterest.DoesNotExist:
-                continue
-        
-        # Invalide le cache des matches potentiels
-        cache_key = f"potential_matches_{current_user.id}"
-        cache.delete(cache_key)
+        # Applique uniquement la différence avec les intérêts actuels
+        if set_user_interests(current_user.id, interest_ids):
+            # Invalide les caches de matching
+            bump_generation(current_user.id)
+            invalidate_deck(current_user.id)
         
         return Response({
             'detail': 'Intérêts mis à jour avec succès'
@@ -176,6 +167,7 @@ class PotentialMatchesView(generics.ListAPIView):
     ordering_fields = ['last_activity', 'is_online', 'date_joined']
     ordering = ['-is_online', '-last_activity']
     throttle_classes = [MatchingRateThrottle]
+    default_image_width = 640  # cartes du deck
     
     def get_queryset(self):
         current_user = get_current_user(self.request)
@@ -187,11 +179,12 @@ class PotentialMatchesView(generics.ListAPIView):
         
         user = current_user
         
-        # Vérifie le cache d'abord
-        cache_key = f"potential_matches_{user.id}"
+        # Vérifie le cache d'abord (clé versionnée par la génération de l'utilisateur)
+        cache_key = versioned_key('potential_matches', user.id, self._cache_params())
         cached_queryset = cache.get(cache_key)
         
         if cached_queryset is not None:
+            self._use_distance_ordering(cached_queryset)
             return cached_queryset
         
         # Récupère les préférences de l'utilisateur
@@ -200,16 +193,9 @@ class PotentialMatchesView(generics.ListAPIView):
         except UserPreference.DoesNotExist:
             preferences = UserPreference.objects.create(user=user)
         
-        # Utilisateurs déjà likés ou bloqués
-        liked_users = user.liked_users.all()
-        blocked_users = user.blocked_users.all()
-        
-        # Filtre de base : exclure l'utilisateur courant, les utilisateurs likés et bloqués
-        queryset = User.objects.exclude(
-            Q(id=user.id) | Q(id__in=liked_users) | Q(id__in=blocked_users)
-        ).prefetch_related(
-            'interests__interest'
-        )
+        # Filtre de base : exclure l'utilisateur courant, les utilisateurs bloqués et,
+        # hors classement (filtre de profils vus appliqué ensuite), likés ou passés
+        queryset = base_candidate_queryset(user, exclude_seen=not self._ranks(self.request))
         
         # Filtres avancés
         queryset = self._apply_advanced_filters(queryset, preferences)
@@ -217,54 +203,141 @@ class PotentialMatchesView(generics.ListAPIView):
         # Applique les filtres de recherche personnalisés
         queryset = self._apply_custom_filters(queryset)
         
+        # Filtre géographique (préfiltre bounding box puis haversine exact)
+        queryset = self._apply_distance_filter(queryset, preferences)
+        
         # Cache le résultat pour 5 minutes
-        cache.set(cache_key, queryset, 300)
+        cache.set(cache_key, queryset, DEFAULT_VERSIONED_TTL)
         
+        self._use_distance_ordering(queryset)
         return queryset
     
-    def _apply_advanced_filters(self, queryset, preferences):
-        """Applique les filtres avancés basés sur les préférences"""
+    def list(self, request, *args, **kwargs):
+        """
+        Classe les candidats filtrés en SQL avec le moteur vectorisé
+        (matching/ranking.py) puis ne sérialise que la page demandée.
         
-        # Filtre par âge si la date de naissance est disponible
-        if preferences.min_age or preferences.max_age:
-            today = date.today()
-            
-            if preferences.min_age:
-                max_birthdate = today - timedelta(days=preferences.min_age * 365)
-                queryset = queryset.filter(Q(date_of_birth__isnull=False) & Q(date_of_birth__lte=max_birthdate))
-            
-            if preferences.max_age:
-                min_birthdate = today - timedelta(days=preferences.max_age * 365)
-                queryset = queryset.filter(Q(date_of_birth__isnull=False) & Q(date_of_birth__gte=min_birthdate))
-        
-        # Filtre par genre si spécifié
-        if preferences.gender_preference and preferences.gender_preference != 'A':
-            if hasattr(User, 'gender'):
-                queryset = queryset.filter(gender=preferences.gender_preference)
-        
-        # Filtre par distance si les coordonnées sont disponibles
-        current_user = get_current_user(self.request)
-        if preferences.max_distance and current_user and current_user.latitude and current_user.longitude:
-            # Note: Pour une implémentation complète, utilisez PostGIS ou une solution géospatiale
-            pass
-        
-        # Filtre par activité récente (utilisateurs actifs dans les 7 derniers jours)
-        active_threshold = timezone.now() - timedelta(days=7)
-        queryset = queryset.filter(
-            Q(last_activity__gte=active_threshold) | Q(is_online=True)
+        Un tri explicite (?ordering=...) désactive le classement.
+        """
+        current_user = get_current_user(request)
+        if current_user and self._uses_deck(request):
+            return self._list_from_deck(request, current_user)
+        
+        if not self._ranks(request):
+            return super().list(request, *args, **kwargs)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        preferences, _ = UserPreference.objects.get_or_create(user=current_user)
+        ranked = rank_candidates(
+            current_user, queryset, preferences, exclude=get_seen_filter(current_user.id),
+            min_shared_interests=self._min_shared_interests()
         )
         
-        return queryset
+        page = self.paginate_queryset(ranked)
+        entries = page if page is not None else ranked
+        users = self._hydrate_ranked_users(entries)
+        serializer = self.get_serializer(users, many=True)
+        
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
+    def _min_shared_interests(self):
+        value = self.request.GET.get('min_shared_interests', '')
+        return int(value) if value.isdigit() else 0
+    
+    def _ranks(self, request):
+        """Classement vectorisé, sauf sans utilisateur ou avec un tri explicite"""
+        return bool(get_current_user(request)) and RANKING_AVAILABLE and not request.GET.get('ordering')
+    
+    def _uses_deck(self, request):
+        """Le deck matérialisé ne sert que la navigation par défaut (sans recherche ni filtre)"""
+        return set(request.GET.keys()) <= {'page_size', 'cursor'}
+    
+    def _list_from_deck(self, request, user):
+        """
+        Dépile la page suivante du deck de l'utilisateur et ne charge que ces profils.
+        
+        Le lien `next` porte un curseur neuf : rejouer la même URL renvoie la
+        même page au lieu d'en dépiler une autre.
+        """
+        page_size = self.paginator.get_page_size(request)
+        entries, remaining = pop_deck_page(user, page_size, request.GET.get('cursor'))
+        
+        # Un candidat liké, passé ou bloqué depuis la construction du deck est ignoré
+        seen = get_seen_filter(user.id).contains_many([candidate_id for candidate_id, _ in entries])
+        users = self._hydrate_ranked_users([
+            (candidate_id, score, None) for (candidate_id, score), is_seen in zip(entries, seen)
+            if not is_seen
+        ])
+        serializer = self.get_serializer(users, many=True)
+        
+        return Response({
+            'count': len(users) + remaining,
+            'next': replace_query_param(
+                request.build_absolute_uri(), 'cursor', secrets.token_urlsafe(12)
+            ) if remaining else None,
+            'previous': None,
+            'results': serializer.data,
+        })
+    
+    def _hydrate_ranked_users(self, entries):
+        """Charge les utilisateurs d'une page classée en conservant l'ordre du classement"""
+        users = User.objects.filter(
+            id__in=[user_id for user_id, _, _ in entries]
+        ).prefetch_related('interests__interest').in_bulk()
+        
+        hydrated = []
+        for user_id, score, distance in entries:
+            user = users.get(user_id)
+            if user is None:
+                continue
+            if distance is not None:
+                user.distance = distance
+            user.match_score = score
+            hydrated.append(user)
+        return hydrated
+    
+    def _cache_params(self):
+        """Paramètres de requête qui font varier le queryset mis en cache"""
+        return {
+            key: value for key, value in self.request.GET.items()
+            if key not in ('page', 'page_size')
+        }
+    
+    def _use_distance_ordering(self, queryset):
+        """Trie par distance (tri par défaut) lorsque le filtre géographique est actif"""
+        if 'distance' in queryset.query.annotations:
+            self.ordering = ['distance'] + list(PotentialMatchesView.ordering)
+    
+    def _apply_advanced_filters(self, queryset, preferences):
+        """Applique les filtres avancés basés sur les préférences"""
+        return apply_preference_filters(queryset, preferences)
     
     def _apply_custom_filters(self, queryset):
         """Applique les filtres personnalisés depuis les paramètres de requête"""
         
-        # Filtre par intérêts communs
+        # Filtre par intérêts communs (sous-requête EXISTS : ni jointure ni DISTINCT)
         common_interests = self.request.GET.get('common_interests')
         if common_interests:
             interest_ids = [int(x) for x in common_interests.split(',') if x.isdigit()]
             if interest_ids:
-                queryset = queryset.filter(interests__interest_id__in=interest_ids).distinct()
+                queryset = queryset.filter(Exists(
+                    UserInterestRelation.objects.filter(user=OuterRef('pk'), interest_id__in=interest_ids)
+                ))
+        
+        # Nombre minimum d'intérêts partagés : appliqué sur les bitsets par le classement,
+        # en SQL uniquement pour un tri explicite
+        min_shared = self._min_shared_interests()
+        if min_shared and not self._ranks(self.request):
+            current_user = get_current_user(self.request)
+            queryset = queryset.annotate(
+                shared_interests=Count('interests', filter=Q(
+                    interests__interest_id__in=UserInterestRelation.objects.filter(
+                        user=current_user
+                    ).values('interest_id')
+                ))
+            ).filter(shared_interests__gte=min_shared)
         
         # Filtre par statut en ligne
         online_only = self.request.GET.get('online_only')
@@ -276,13 +349,24 @@ class PotentialMatchesView(generics.ListAPIView):
         if with_photo == 'true':
             queryset = queryset.exclude(profile_picture__isnull=True).exclude(profile_picture='')
         
-        # Filtre par distance maximale
+        return queryset
+    
+    def _apply_distance_filter(self, queryset, preferences):
+        """
+        Filtre par distance maximale (paramètre `max_distance` ou préférence)
+        et trie les résultats du plus proche au plus lointain.
+        """
+        current_user = get_current_user(self.request)
+        if not current_user:
+            return queryset
+        
         max_distance = self.request.GET.get('max_distance')
         if max_distance and max_distance.isdigit():
-            # Implémentation de filtre par distance
-            pass
+            max_distance = int(max_distance)
+        else:
+            max_distance = preferences.max_distance
         
-        return queryset
+        return apply_distance_filter(queryset, current_user, max_distance)
 
 class MatchesListView(generics.ListAPIView):
     """Vue pour lister les matchs de l'utilisateur"""
@@ -293,17 +377,23 @@ class MatchesListView(generics.ListAPIView):
     ordering_fields = ['created_at', 'is_active']
     ordering = ['-created_at']
     throttle_classes = [MatchingRateThrottle]
+    default_image_width = 320
     
     def get_queryset(self):
         current_user = get_current_user(self.request)
         if not current_user:
-            return Match.objects.none()
+            return MatchEdge.objects.none()
         
-        user = current_user
-        return Match.objects.filter(
-            Q(user1=user) | Q(user2=user),
-            is_active=True
-        ).select_related('user1', 'user2').order_by('-created_at')
+        return match_edges(current_user.id)
+    
+    def list(self, request, *args, **kwargs):
+        """Projection values() et construction directe des dicts (format de MatchSerializer)"""
+        queryset = self.filter_queryset(self.get_queryset()).values(*EDGE_FIELDS)
+        rendition = requested_rendition(request, self.default_image_width)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(build_match_list(request.user, page, rendition))
+        return Response(build_match_list(request.user, queryset, rendition))
 
 class MatchViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet pour les matchs"""
@@ -311,17 +401,14 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (permissions.IsAuthenticated,)
     pagination_class = CustomPagination
     throttle_classes = [MatchingRateThrottle]
+    default_image_width = 320
     
     def get_queryset(self):
         current_user = get_current_user(self.request)
         if not current_user:
             return Match.objects.none()
         
-        user = current_user
-        return Match.objects.filter(
-            Q(user1=user) | Q(user2=user),
-            is_active=True
-        )
+        return Match.objects.filter(edges__owner=current_user, edges__is_active=True)
 
 class LikeView(generics.CreateAPIView):
     """Vue pour liker un utilisateur"""
@@ -329,6 +416,7 @@ class LikeView(generics.CreateAPIView):
     permission_classes = ()  # Temporarily bypass authentication for testing
     authentication_classes = ()  # Temporarily bypass authentication for testing
     throttle_classes = [LikeRateThrottle]
+    default_image_width = 320
     
     def create(self, request, *args, **kwargs):
         current_user = get_current_user(request)
@@ -344,94 +432,29 @@ class LikeView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        user = current_user
         liked_user_id = serializer.validated_data['user_id']
-        liked_user = User.objects.get(id=liked_user_id)
+        result = like_user(current_user, liked_user_id)
         
-        # Vérifie si l'utilisateur n'est pas déjà liké
-        if user.liked_users.filter(id=liked_user_id).exists():
+        if result.status == ALREADY_LIKED:
             return Response({
                 'detail': 'Utilisateur déjà liké'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Vérifie si l'utilisateur n'est pas bloqué
-        if user.blocked_users.filter(id=liked_user_id).exists():
+        if result.status == BLOCKED:
             return Response({
                 'detail': 'Impossible de liker un utilisateur bloqué'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Ajoute l'utilisateur liké
-        user.liked_users.add(liked_user)
-        
-        # Prépare les données du like pour la notification
-        liker_data = {
-            'id': user.id,
-            'username': user.username,
-            'profile_picture': user.get_profile_picture_url()
-        }
+        if result.status == NOT_FOUND:
+            return Response({
+                'detail': "L'utilisateur spécifié n'existe pas."
+            }, status=status.HTTP_404_NOT_FOUND)
         
-        # Notifie l'utilisateur liké (si la fonctionnalité est activée dans les préférences)
-        notify_like(liked_user.id, liker_data)
-        
-        # Vérifie s'il y a un match (like mutuel)
-        is_match = liked_user.liked_users.filter(id=user.id).exists()
-        
-        if is_match:
-            # Crée un match dans la base de données
-            # Nous ordonnons les utilisateurs par ID pour éviter les doublons
-            if user.id < liked_user.id:
-                user1, user2 = user, liked_user
-            else:
-                user1, user2 = liked_user, user
-            
-            match, created = Match.objects.get_or_create(
-                user1=user1, 
-                user2=user2,
-                defaults={'is_active': True}
-            )
-            
-            if not created and not match.is_active:
-                match.is_active = True
-                match.save()
-            
-            # Prépare les données du match pour la notification
-            match_data = {
-                'id': match.id,
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'profile_picture': user.get_profile_picture_url()
-                },
-                'created_at': match.created_at.isoformat() if created else timezone.now().isoformat()
-            }
-            
-            # Notifie l'autre utilisateur du match
-            notify_new_match(liked_user.id, match_data)
-            
-            # Create conversation for the match
-            conversation = create_conversation_for_match(user, liked_user)
-            
-            # Send WebSocket notification to both users
-            send_match_notification(liked_user.id, match_data)
-            
-            # Modifie les données du match pour la réponse à l'utilisateur actuel
-            match_data['user'] = {
-                'id': liked_user.id,
-                'username': liked_user.username,
-                'profile_picture': liked_user.profile_picture.url if liked_user.profile_picture else None
-            }
-            
-            # Send WebSocket notification to current user
-            send_match_notification(user.id, match_data)
-            
-            # Invalide le cache des matches
-            cache.delete(f"potential_matches_{user.id}")
-            cache.delete(f"potential_matches_{liked_user.id}")
-            
+        if result.is_match:
             return Response({
                 'detail': 'Like enregistré avec succès',
                 'is_match': True,
-                'match': MatchSerializer(match, context={'request': request}).data
+                'match': MatchSerializer(result.match, context=self.get_serializer_context()).data
             }, status=status.HTTP_201_CREATED)
         
         return Response({
@@ -463,29 +486,65 @@ class SkipUserView(generics.CreateAPIView):
         skipped_user_id = serializer.validated_data['user_id']
         skipped_user = User.objects.get(id=skipped_user_id)
         
-        # Supprime l'utilisateur des likes s'il était liké
-        user.liked_users.remove(skipped_user)
-        
-        # Désactive le match s'il existait
-        if user.id < skipped_user.id:
-            user1, user2 = user, skipped_user
-        else:
-            user1, user2 = skipped_user, user
-        
-        try:
-            match = Match.objects.get(user1=user1, user2=user2)
-            match.is_active = False
-            match.save()
-        except Match.DoesNotExist:
-            pass
+        with transaction.atomic(), tracking_incoming_likes(user.id, [skipped_user.id]):
+            # Supprime l'utilisateur des likes s'il était liké
+            user.liked_users.remove(skipped_user)
+
+            # Enregistre le passage pour ne plus proposer ce profil
+            UserSkip.objects.get_or_create(user=user, skipped_user=skipped_user)
+            record_seen(user.id, [skipped_user.id])
+
+            # Désactive le match s'il existait
+            deactivate_matches_with(user.id, [skipped_user.id])
         
         # Invalide le cache
-        cache.delete(f"potential_matches_{user.id}")
+        bump_generation(user.id, skipped_user.id)
+        discard_from_deck(user.id, [skipped_user.id])
         
         return Response({
             'detail': 'Utilisateur passé avec succès'
         }, status=status.HTTP_200_OK)
 
+class SwipeBatchView(generics.CreateAPIView):
+    """Vue pour soumettre un lot de swipes (like, skip, block) en une requête"""
+    serializer_class = SwipeBatchSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_classes = [SwipeLikeRateThrottle]
+    default_image_width = 320
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['max_likes'] = SwipeLikeRateThrottle().num_requests
+        return context
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = submit_swipes(request.user, serializer.validated_data['swipes'])
+        
+        # Une requête pour les intérêts de tous les profils matchés
+        matched_users = [
+            item['match'].user2 if item['match'].user1_id == request.user.id else item['match'].user1
+            for item in results if item['match'] is not None
+        ]
+        prefetch_related_objects(matched_users, 'interests__interest')
+        
+        context = self.get_serializer_context()
+        return Response({
+            'results': [
+                {
+                    'user_id': item['user_id'],
+                    'action': item['action'],
+                    'status': item['status'],
+                    'is_match': item['match'] is not None,
+                    'match': MatchSerializer(item['match'], context=context).data if item['match'] else None
+                }
+                for item in results
+            ],
+            'matches': len(matched_users)
+        }, status=status.HTTP_200_OK)
+
 class UnlikeView(generics.CreateAPIView):
     """Vue pour annuler un like"""
     serializer_class = LikeUserSerializer
@@ -513,25 +572,17 @@ class UnlikeView(generics.CreateAPIView):
                 'detail': 'Utilisateur non liké'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Supprime l'utilisateur des likes
-        user.liked_users.remove(unliked_user)
-        
-        # Désactive le match s'il existait
-        if user.id < unliked_user.id:
-            user1, user2 = user, unliked_user
-        else:
-            user1, user2 = unliked_user, user
-        
-        try:
-            match = Match.objects.get(user1=user1, user2=user2)
-            match.is_active = False
-            match.save()
-        except Match.DoesNotExist:
-            pass
+        with transaction.atomic(), tracking_incoming_likes(user.id, [unliked_user.id]):
+            # Supprime l'utilisateur des likes
+            user.liked_users.remove(unliked_user)
+
+            # Désactive le match s'il existait
+            deactivate_matches_with(user.id, [unliked_user.id])
         
         # Invalide le cache
-        cache.delete(f"potential_matches_{user.id}")
-        cache.delete(f"potential_matches_{unliked_user.id}")
+        bump_generation(user.id, unliked_user.id)
+        rebuild_seen_filter(user.id)
+        invalidate_deck(user.id)
         
         return Response({
             'detail': 'Like annulé avec succès'
@@ -564,29 +615,22 @@ class BlockUserView(generics.CreateAPIView):
                 'detail': 'Utilisateur déjà bloqué'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Ajoute l'utilisateur à la liste des bloqués
-        user.blocked_users.add(blocked_user)
-        
-        # Supprime des likes mutuels si existants
-        user.liked_users.remove(blocked_user)
-        user.liked_by.remove(blocked_user)
-        
-        # Désactive le match s'il existait
-        if user.id < blocked_user.id:
-            user1, user2 = user, blocked_user
-        else:
-            user1, user2 = blocked_user, user
-        
-        try:
-            match = Match.objects.get(user1=user1, user2=user2)
-            match.is_active = False
-            match.save()
-        except Match.DoesNotExist:
-            pass
+        with transaction.atomic(), tracking_incoming_likes(user.id, [blocked_user.id]):
+            # Ajoute l'utilisateur à la liste des bloqués
+            user.blocked_users.add(blocked_user)
+            record_seen(user.id, [blocked_user.id])
+
+            # Supprime des likes mutuels si existants
+            user.liked_users.remove(blocked_user)
+            user.liked_by.remove(blocked_user)
+
+            # Désactive le match s'il existait
+            deactivate_matches_with(user.id, [blocked_user.id])
         
         # Invalide le cache
-        cache.delete(f"potential_matches_{user.id}")
-        cache.delete(f"potential_matches_{blocked_user.id}")
+        bump_generation(user.id, blocked_user.id)
+        discard_from_deck(user.id, [blocked_user.id])
+        discard_from_deck(blocked_user.id, [user.id])
         
         return Response({
             'detail': 'Utilisateur bloqué avec succès'
@@ -619,63 +663,71 @@ class UnblockUserView(generics.CreateAPIView):
                 'detail': 'Utilisateur non bloqué'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Supprime l'utilisateur de la liste des bloqués
-        user.blocked_users.remove(unblocked_user)
+        with transaction.atomic(), tracking_incoming_likes(user.id, [unblocked_user.id]):
+            # Supprime l'utilisateur de la liste des bloqués
+            user.blocked_users.remove(unblocked_user)
         
         # Invalide le cache
-        cache.delete(f"potential_matches_{user.id}")
-        cache.delete(f"potential_matches_{unblocked_user.id}")
+        bump_generation(user.id, unblocked_user.id)
+        rebuild_seen_filter(user.id)
+        invalidate_deck(user.id)
+        invalidate_deck(unblocked_user.id)
         
         return Response({
             'detail': 'Utilisateur débloqué avec succès'
         }, status=status.HTTP_200_OK)
 
+class IncomingLikesView(generics.ListAPIView):
+    """Vue pour lister les likes reçus en attente de réponse (« qui m'a liké »)"""
+    serializer_class = IncomingLikeSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = IncomingLikesPagination
+    throttle_classes = [MatchingRateThrottle]
+    default_image_width = 320
+    
+    def get_queryset(self):
+        # Exclut les matchs (like réciproque), les profils passés et les blocages
+        return pending_likes(self.request.user.id).select_related('from_user').prefetch_related(
+            'from_user__interests__interest'
+        )
+    
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count'] = get_incoming_like_count(self.request.user.id)
+        return response
+
+class IncomingLikesCountView(generics.GenericAPIView):
+    """Vue pour le badge des likes reçus (lecture du compteur, sans COUNT)"""
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_classes = [MatchingRateThrottle]
+    
+    def get(self, request, *args, **kwargs):
+        return Response({'count': get_incoming_like_count(request.user.id)})
+
 class RecentMatchesView(generics.ListAPIView):
     """View to get recent matches for chat integration"""
     serializer_class = MatchSerializer
     permission_classes = (permissions.IsAuthenticated,)
     pagination_class = CustomPagination
     throttle_classes = [MatchingRateThrottle]
+    default_image_width = 128  # avatars de la messagerie
     
     def get_queryset(self):
         current_user = get_current_user(self.request)
         if not current_user:
-            return Match.objects.none()
+            return MatchEdge.objects.none()
         
-        user = current_user
-        return Match.objects.filter(
-            Q(user1=user) | Q(user2=user),
-            is_active=True
-        ).select_related('user1', 'user2').order_by('-created_at')
+        return match_edges(current_user.id)
     
     def list(self, request, *args, **kwargs):
         """Return recent matches with additional data for chat integration"""
         queryset = self.get_queryset()
         
         # Get matches from last 30 days
-        from datetime import timedelta
         thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_matches = queryset.filter(created_at__gte=thirty_days_ago)
-        
-        matches_data = []
-        for match in recent_matches:
-            # Get the other user in the match
-            other_user = match.user2 if match.user1 == request.user else match.user1
-            
-            match_data = {
-                'id': other_user.id,
-                'username': other_user.username,
-                'first_name': other_user.first_name,
-                'last_name': other_user.last_name,
-                'profile_picture': other_user.profile_picture.url if other_user.profile_picture else None,
-                'bio': other_user.bio,
-                'location': other_user.location,
-                'is_online': other_user.is_online,
-                'last_activity': other_user.last_activity.isoformat() if other_user.last_activity else None,
-                'interests': [interest.interest.name for interest in other_user.interests.all()],
-                'distance': 0.0,  # Would need geolocation calculation
-                'match_created_at': match.created_at.isoformat()
-            }
-            matches_data.append(match_data)
+        recent_matches = queryset.filter(created_at__gte=thirty_days_ago).values(*EDGE_FIELDS)
+        
+        rendition = requested_rendition(request, self.default_image_width)
+        matches_data = build_recent_match_list(request.user, recent_matches, rendition)
         
         return Response(matches_data)
\ No newline at end of file